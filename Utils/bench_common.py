@@ -0,0 +1,26 @@
+# Setup shared by the benchmarks: ShotBoard modules importable from Utils, QApplication, and the video given as first argument (or picked in a file dialog)
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from shotboard_vid import *
+
+from PyQt5.QtWidgets import QApplication, QFileDialog
+
+
+def open_benchmark_video():
+    """Creates the QApplication and opens the video of the first argument (the following ones are the benchmark's).
+    Returns (app, video_info), video_info being None if no video was selected."""
+    app = QApplication(sys.argv)
+
+    if len(sys.argv) > 1:
+        video_path = sys.argv[1]
+    else:
+        video_path, _ = QFileDialog.getOpenFileName(None, "Select a Video File", "", "Video files (*.mp4 *.avi *.mkv)")
+    if not video_path:
+        print("No video file selected. Exiting.")
+        return app, None
+
+    video_info = VideoInfo()
+    video_info.set_from_video(video_path)
+    return app, video_info
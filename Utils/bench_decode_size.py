@@ -0,0 +1,65 @@
+# Benchmark: video player frames decoded at full size then scaled in Python vs decoded by FFmpeg at the display size
+# Usage: python bench_decode_size.py [video_path] [frame_count] [target_width ...]
+import os
+import sys
+import time
+
+from bench_common import *  # ShotBoard modules importable from Utils
+from shotboard_vid import *
+
+
+def benchmark(name, video_info, frame_count, target_size, decode_size):
+    width, height = decode_size or (video_info.display_width, video_info.frame_height)
+    ffmpeg_cmd = VideoPlayer.make_ffmpeg_cmd(video_info, 0, frame_count, decode_size, False, 0)
+    process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **FFMPEG_NOWINDOW_KWARGS)
+
+    ring = FrameRing(width, height)
+    decoded_count = 0
+    scale_s = 0.0
+    start = time.perf_counter()
+    while decoded_count < frame_count:
+        slot = ring.acquire()
+        if not read_exactly_into(process.stdout, ring.get_buffer(slot)):
+            break
+        image = ring.get_image(slot)
+        if (image.width(), image.height()) != video_info.fit_size(*target_size):  # Like VideoPlayer.scale_image()
+            scale_start = time.perf_counter()
+            image = scale_image_smooth(image, *target_size)
+            scale_s += time.perf_counter() - scale_start
+        ring.release(slot)
+        decoded_count += 1
+    elapsed = time.perf_counter() - start
+
+    process.stdout.close()
+    process.kill()
+    process.wait()
+
+    frame_bytes = width * height * 3
+    print(f"{name:28} {width:5}x{height:<5} {frame_bytes / 1e6:6.2f} MB per frame   {frame_bytes * decoded_count / elapsed / 1e6:7.1f} MB/s through the pipe   "
+          f"scaling {1000 * scale_s / max(1, decoded_count):5.2f} ms   total {1000 * elapsed / max(1, decoded_count):5.2f} ms per frame")
+    return frame_bytes, scale_s, elapsed
+
+
+def main():
+    app, video_info = open_benchmark_video()
+    if video_info is None:
+        return
+    frame_count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    target_widths = [int(arg) for arg in sys.argv[3:]] or [300, 960]
+    frame_count = min(frame_count, video_info.frame_count)
+
+    print(f"{os.path.basename(video_info.video_path)}: {video_info.display_width}x{video_info.frame_height}, {frame_count} frames")
+    for target_width in target_widths:
+        target_size = (target_width, target_width)
+        decode_size = VideoPlayer.get_decode_size(video_info, target_size)
+        print(f"Target width {target_width}:")
+        full_bytes, _, full_elapsed = benchmark("Full size, scaled in Python", video_info, frame_count, target_size, None)
+        if decode_size is None:
+            print("Not smaller than the video: decoded at full size.")
+            continue
+        decoded_bytes, _, elapsed = benchmark("Decoded at display size", video_info, frame_count, target_size, decode_size)
+        print(f"{'':28} {full_bytes / decoded_bytes:.1f}x less pipe bandwidth, {full_elapsed / elapsed:.1f}x faster overall")
+
+
+if __name__ == "__main__":
+    main()
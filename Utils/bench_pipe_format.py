@@ -0,0 +1,59 @@
+# Benchmark: video player frames crossing the FFmpeg pipe as rgb24 vs yuv420p (converted by NumPy) vs gray ("Lines" mode)
+# Usage: python bench_pipe_format.py [video_path] [frame_count] [target_width]
+import os
+import sys
+import time
+
+from bench_common import *  # ShotBoard modules importable from Utils
+from shotboard_vid import *
+
+
+def benchmark(name, video_info, frame_count, decode_size, detect_edges, pixel_format):
+    width, height = decode_size or (video_info.display_width, video_info.frame_height)
+    ffmpeg_cmd = VideoPlayer.make_ffmpeg_cmd(video_info, 0, frame_count, decode_size, detect_edges, 1.0)
+    ffmpeg_cmd[ffmpeg_cmd.index("-pix_fmt") + 1] = pixel_format
+    process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **FFMPEG_NOWINDOW_KWARGS)
+
+    ring = FrameRing(width, height, pixel_format)
+    frame_bytes = ring.get_buffer(0).nbytes
+    decoded_count = 0
+    convert_s = 0.0
+    start = time.perf_counter()
+    while decoded_count < frame_count:
+        slot = ring.acquire()
+        if not read_exactly_into(process.stdout, ring.get_buffer(slot)):
+            break
+        convert_start = time.perf_counter()
+        ring.convert(slot)
+        convert_s += time.perf_counter() - convert_start
+        ring.release(slot)
+        decoded_count += 1
+    elapsed = time.perf_counter() - start
+
+    process.stdout.close()
+    process.kill()
+    process.wait()
+
+    print(f"{name:24} {frame_bytes / 1e6:6.2f} MB per frame   {frame_bytes * decoded_count / elapsed / 1e6:7.1f} MB/s through the pipe   "
+          f"conversion {1000 * convert_s / max(1, decoded_count):6.2f} ms   total {1000 * elapsed / max(1, decoded_count):6.2f} ms per frame ({decoded_count} frames)")
+
+
+def main():
+    app, video_info = open_benchmark_video()
+    if video_info is None:
+        return
+    frame_count = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    target_width = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+    frame_count = min(frame_count, video_info.frame_count)
+    decode_size = VideoPlayer.get_decode_size(video_info, (target_width, target_width)) if target_width > 0 else None
+
+    width, height = decode_size or (video_info.display_width, video_info.frame_height)
+    print(f"{os.path.basename(video_info.video_path)}: {video_info.display_width}x{video_info.frame_height} decoded at {width}x{height}, {frame_count} frames")
+    benchmark("rgb24", video_info, frame_count, decode_size, False, "rgb24")
+    benchmark("yuv420p + NumPy", video_info, frame_count, decode_size, False, "yuv420p")
+    benchmark("Lines, rgb24", video_info, frame_count, decode_size, True, "rgb24")
+    benchmark("Lines, gray", video_info, frame_count, decode_size, True, "gray")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+# Benchmark: per-thumbnail latency of the raw rgb24 pipe vs the MJPEG round-trip
+# Usage: python bench_thumbnails.py [video_path] [sample_count]
+import os
+import sys
+import random
+import statistics
+import time
+
+from bench_common import *  # ShotBoard modules importable from Utils
+from shotboard_ui import *
+
+from PyQt5.QtGui import QPixmap
+
+
+def benchmark(video_info, frame_indexes, extract):
+    timings_ms = []
+    for frame_index in frame_indexes:
+        start = time.perf_counter()
+        image = extract(video_info, frame_index)
+        if image is not None:
+            pixmap = QPixmap.fromImage(image)  # What the loader hands over to the ThumbnailManager
+        timings_ms.append((time.perf_counter() - start) * 1000)
+    return timings_ms
+
+
+def main():
+    app, video_info = open_benchmark_video()
+    if video_info is None:
+        return
+    sample_count = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+
+    random.seed(0)
+    frame_indexes = sorted(random.sample(range(video_info.frame_count), min(sample_count, video_info.frame_count)))
+
+    print(f"{os.path.basename(video_info.video_path)}: {video_info.display_width}x{video_info.frame_height}, {len(frame_indexes)} thumbnails at {STORED_IMAGE_SIZE[0]}x{STORED_IMAGE_SIZE[1]}")
+    for name, extract in (("MJPEG round-trip", ThumbnailLoader.extract_mjpeg_image), (f"Raw rgb24 ({THUMBNAIL_SCALER})", ThumbnailLoader.extract_raw_image)):
+        timings_ms = benchmark(video_info, frame_indexes, extract)
+        print(f"{name:24} mean {statistics.mean(timings_ms):7.1f} ms   median {statistics.median(timings_ms):7.1f} ms   max {max(timings_ms):7.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -11,10 +11,12 @@
 
 from shotboard_db import *
 from shotboard_ui import *
+from shotboard_det import *
 from shotboard_cmd import *
 from shotboard_med import *
 
 import subprocess
+import multiprocessing
 import numpy as np
 from skimage.metrics import structural_similarity as ssim
 import matplotlib.pyplot as plt
@@ -24,12 +26,12 @@ import datetime
 import math
 from functools import wraps
 from inspect import signature
-from PyQt5.QtCore import Qt, pyqtSignal, QRect, QTime, QElapsedTimer
+from PyQt5.QtCore import Qt, pyqtSignal, QRect, QTime, QElapsedTimer, QSettings
 from PyQt5.QtWidgets import QApplication, QMainWindow, QWidget, QMessageBox, QDialog, QFileDialog, QProgressDialog
 from PyQt5.QtWidgets import QSplitter, QHBoxLayout, QVBoxLayout, QGridLayout, QScrollArea
 from PyQt5.QtWidgets import QLabel, QPushButton, QToolButton, QCheckBox, QSlider, QSpinBox, QDoubleSpinBox
 from PyQt5.QtWidgets import QAction, QStyle
-from PyQt5.QtGui import QKeySequence, QColor, QPalette
+from PyQt5.QtGui import QKeySequence, QColor, QPalette, QCursor
 
 
 APP_VERSION = "0.9.9"
@@ -38,10 +40,14 @@ APP_VERSION = "0.9.9"
 DEFAULT_GEOMETRY = QRect(0, 0, 1280, 720)
 DEFAULT_TITLE = "𝗦𝗵𝗼𝘁𝗯𝗼𝗮𝗿𝗱"
 
+# User settings (persisted between sessions)
+SETTINGS_ORGANIZATION = "madjyc"
+SETTINGS_APPLICATION = "ShotBoard"
+
 # SSIM shot detection
-SIM_DROP_THRESHOLD_MIN = 0.05
-SIM_DROP_THRESHOLD_MAX = 0.30
-SIM_DROP_THRESHOLD_DEFAULT = 0.20
+DEFAULT_QUICK_LOOK = False  # Build a provisional board from the keyframes when a video is opened, then refine it in the background (changes the shot list before the user does)
+DETECTION_THUMBNAILS = os.name == "posix"  # Extract the thumbnails of detected shots from the detection decoder (needs a second output pipe)
+DETECTION_THUMBNAIL_SCENE_THRESHOLD = 0.05  # FFmpeg scene change score above which a frame is sent down the thumbnail pipe (well below cuts: the thumbnails of the cuts it misses are extracted by a regular loader)
 
 # Detection slider
 DETECTION_SLIDER_STEPS = int((SIM_DROP_THRESHOLD_MAX - SIM_DROP_THRESHOLD_MIN) / 0.01)
@@ -71,6 +77,9 @@ PRINT_CYAN_COLOR = '\033[96m'  # cyan
 # Use save extra-shortcut - or not
 RIGHT_CLICK_SAVE = True
 
+# Standby decoders
+STANDBY_PREDICTION_DELAY_MS = 150  # Delay after the last mouse move before the standby decoders are moved to the shots near the cursor
+
 
 ##
 ## DECORATORS
@@ -178,11 +187,14 @@ class ShotBoard(QMainWindow):
 
         self._db = ShotBoardDb()
         self._db_path = None
+        self._settings = QSettings(SETTINGS_ORGANIZATION, SETTINGS_APPLICATION)
         self._history = CommandHistory()
         self._shot_widget_mgr = ShotWidgetManager()
         self._shot_widget_mgr.thumbnail_loaded.connect(self.on_thumbnail_loaded)
         self._shot_widget_mgr.hovered.connect(self.on_shot_widget_hovered)
         self._shot_widget_mgr.clicked.connect(self.on_shot_widget_clicked)
+        self._thumbnail_prefetcher = ThumbnailPrefetcher(ShotWidget.thumbnail_manager)
+        AudioMixer.open_shared()  # Owns the audio output stream until the window is closed
 
         self._selection_first_index = None
         self._selection_last_index = None
@@ -190,6 +202,9 @@ class ShotBoard(QMainWindow):
         self._ui_enabled = True
         self._hovered_shot_widget = None
         self._old_zoom_value = DEFAULT_SHOT_IMAGE_SIZE_INDEX
+        self._keyframe_scanner = None
+        self._candidate_refiner = None
+        self._pending_refinements = []  # (candidate frame index, detected cut frame indexes) waiting for the UI to be enabled
 
         self._clock_emojis = ["🕛", "🕐", "🕑", "🕒", "🕓", "🕔", "🕕", "🕖", "🕗", "🕘", "🕙", "🕚"]
         self._loading_step = 0  # clock_emojis
@@ -235,6 +250,11 @@ class ShotBoard(QMainWindow):
         self._resize_timer.setInterval(500)
         self._resize_timer.timeout.connect(self.delayed_update)
 
+        self._standby_timer = QTimer(self)
+        self._standby_timer.setSingleShot(True)
+        self._standby_timer.setInterval(STANDBY_PREDICTION_DELAY_MS)
+        self._standby_timer.timeout.connect(self.update_standby_decoders)
+
 
     ##
     ## MENU, STATUS BAR
@@ -388,7 +408,7 @@ class ShotBoard(QMainWindow):
         top_layout.setContentsMargins(0, margins.top(), 0, margins.bottom())
 
         # Create a media player object
-        self._mediaplayer = SBMediaPlayer()
+        self._mediaplayer = SBMediaPlayer(ShotWidget.thumbnail_manager.get_keyframe_index)  # Scrubs whole GOPs from the keyframe index of the thumbnails
         self._mediaplayer.stateChanged.connect(self.on_mediaplayer_state_changed)
         # self._mediaplayer.error.connect(self.on_mediaplayer_error)
         self._mediaplayer.frameChanged.connect(self.on_mediaplayer_frame_changed)
@@ -410,6 +430,7 @@ class ShotBoard(QMainWindow):
         self._seek_slider.setRange(0, 0)
         self._seek_slider.mousePressEvent = self.on_seek_slider_click
         self._seek_slider.sliderMoved.connect(self.on_seek_slider_moved)
+        self._seek_slider.sliderReleased.connect(self.on_seek_slider_released)
         slider_layout.addWidget(self._seek_slider)
 
         # Create a spinbox
@@ -506,6 +527,12 @@ class ShotBoard(QMainWindow):
         self._double_condition_checkbox.setChecked(True)
         self._double_condition_checkbox.setStatusTip("Check to detect shots with the frame similarity pattern: \"similar→different→similar\". Uncheck to simply use: \"similar→different\" (more error prone).")
 
+        # Create a quick look checkbox with a label
+        self._quick_look_checkbox = QCheckBox("Quick look")
+        self._quick_look_checkbox.setChecked(self._settings.value("quick_look", DEFAULT_QUICK_LOOK, type=bool))
+        self._quick_look_checkbox.toggled.connect(self.on_quick_look_toggled)
+        self._quick_look_checkbox.setStatusTip("Check to fill the board with provisional shots from the keyframes when a video is opened, then refine them in the background.")
+
         # Detection level slider
         self._detection_slider = QSlider(Qt.Horizontal)
         self._detection_slider.setRange(0, DETECTION_SLIDER_STEPS)
@@ -535,6 +562,7 @@ class ShotBoard(QMainWindow):
             detection_layout.addWidget(seek_offset_label)
             detection_layout.addWidget(self._seek_offset_spinbox)
         detection_layout.addWidget(self._double_condition_checkbox)
+        detection_layout.addWidget(self._quick_look_checkbox)
         detection_layout.addWidget(self._detection_slider)
         detection_layout.addWidget(self._detection_label)
         if ENABLE_DOWNSCALE_SPINBOX:
@@ -611,9 +639,20 @@ class ShotBoard(QMainWindow):
         self._volume_label.setAlignment(Qt.AlignRight | Qt.AlignVCenter)
         self._volume_label.setFixedWidth(28)
 
+        # Create a playback speed spinbox
+        self._speed_spinbox = QDoubleSpinBox()
+        self._speed_spinbox.setRange(PLAYER_SPEED_MIN, PLAYER_SPEED_MAX)
+        self._speed_spinbox.setSingleStep(0.25)
+        self._speed_spinbox.setDecimals(2)
+        self._speed_spinbox.setSuffix("×")
+        self._speed_spinbox.setValue(1.0)
+        self._speed_spinbox.valueChanged.connect(self.on_speed_changed)
+        self._speed_spinbox.setStatusTip("Set the playback speed of the video and the shot previews (the pitch of the sound is kept). From 2×, frames are skipped.")
+
         # Create a layout for the volume slider and label
         volume_layout = QHBoxLayout()
         volume_layout.addStretch()
+        volume_layout.addWidget(self._speed_spinbox)
         volume_layout.addWidget(self._speaker_button)
         volume_layout.addWidget(self._volume_slider)
         volume_layout.addWidget(self._volume_label)
@@ -809,6 +848,10 @@ class ShotBoard(QMainWindow):
                         self.on_menu_save()
                         return True  # Event handled
 
+            elif event.type() == QEvent.MouseMove:
+                if ShotWidget.standby_pool.is_enabled() and self._video_info.video_path:
+                    self._standby_timer.start()  # Restart the countdown
+
             # elif event.type() == QEvent.Wheel:
             #     scroll_delta = event.angleDelta().y()
             #     volume_increment = 0.05  # Volume per scroll step
@@ -921,12 +964,24 @@ class ShotBoard(QMainWindow):
     def on_edge_detection_toggled(self, checked):
         SBMediaPlayer.detect_edges = checked
         ShotWidget.detect_edges = checked
+        self.update_thumbnail_edges()
 
 
     @log_function_name(color=PRINT_GREEN_COLOR)
     def on_edge_factor_changed(self, value):
         SBMediaPlayer.edge_factor = value
         ShotWidget.edge_factor = value
+        self.update_thumbnail_edges()
+
+
+    def update_thumbnail_edges(self):
+        """Switch the board to colour or "Lines" thumbnails (variants are computed from the loaded thumbnails and cached for the current edge factor only)."""
+        edge_factor = ShotWidget.edge_factor if ShotWidget.detect_edges else 0
+        if ShotWidget.thumbnail_manager.get_edge_factor() == edge_factor:
+            return
+        ShotWidget.thumbnail_manager.set_edge_factor(edge_factor)
+        for shot_widget in self._shot_widget_mgr:
+            shot_widget.initialise_thumbnail(False)
 
 
     @log_function_name(color=PRINT_GREEN_COLOR)
@@ -942,6 +997,12 @@ class ShotBoard(QMainWindow):
     @log_function_name(color=PRINT_GREEN_COLOR)
     def on_seek_offset_spinbox_changed(self, value):
         self._video_info.seek_offset = value
+        ShotWidget.thumbnail_manager.open_atlas()  # Thumbnails stored with another offset don't match anymore
+
+
+    @log_function_name(color=PRINT_GREEN_COLOR)
+    def on_quick_look_toggled(self, checked):
+        self._settings.setValue("quick_look", checked)  # Applies to the next opened video
 
 
     @log_function_name(color=PRINT_GREEN_COLOR)
@@ -999,6 +1060,16 @@ class ShotBoard(QMainWindow):
             self._volume_label.setText(f"{volume:3}%")
             ShotWidget.volume = volume * 0.01
             self._mediaplayer.set_volume(volume * 0.01)
+        for shot_widget in self._shot_widget_mgr:
+            if shot_widget.is_playing_preview():
+                shot_widget.set_preview_volume(ShotWidget.volume)  # Attaches the audio if unmuted during the preview
+
+
+    @log_function_name(color=PRINT_GREEN_COLOR)
+    def on_speed_changed(self, speed):
+        ShotWidget.speed = speed
+        ShotWidget.standby_pool.clear()  # Started at the previous speed
+        self._mediaplayer.set_speed(speed)
 
 
     @log_function_name(color=PRINT_GREEN_COLOR)
@@ -1012,7 +1083,12 @@ class ShotBoard(QMainWindow):
 
     @log_function_name(color=PRINT_GREEN_COLOR)
     def on_seek_slider_moved(self, frame_index):
-        self.seek_video(frame_index)
+        self._mediaplayer.scrub(frame_index)  # Scrub frames until the slider is released
+
+
+    @log_function_name(color=PRINT_GREEN_COLOR)
+    def on_seek_slider_released(self):
+        self._mediaplayer.end_scrub(self._seek_slider.value())  # Full size frame, or playback restarted from it
 
 
     @log_function_name(color=PRINT_GREEN_COLOR)
@@ -1026,11 +1102,14 @@ class ShotBoard(QMainWindow):
             self._play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPause))
         else:
             self._play_button.setIcon(self.style().standardIcon(QStyle.SP_MediaPlay))
+            self.update_status_bar()  # Audio underruns
 
 
     @log_function_name()
     def on_mediaplayer_frame_changed(self, frame_index):
         self.update_slider_and_spinbox(frame_index)
+        if not self._mediaplayer.is_playing():
+            self.update_status_bar()  # Frame cache hit rate
 
 
     @log_function_name(color=PRINT_RED_COLOR)
@@ -1052,15 +1131,48 @@ class ShotBoard(QMainWindow):
         scroll_pos = self._scroll_area.verticalScrollBar().value()
         viewport_rect = QRect(0, scroll_pos, viewport.width(), viewport.height())
 
+        shot_widgets = self._shot_widget_mgr.sorted_values()
         visible_shot_widgets = []
-        for shot_widget in self._shot_widget_mgr:
+        first_visible_index, last_visible_index = None, None
+        for i, shot_widget in enumerate(shot_widgets):
             if viewport_rect.intersects(shot_widget.geometry()):
                 visible_shot_widgets.append(shot_widget)
+                if first_visible_index is None:
+                    first_visible_index = i
+                last_visible_index = i
         
         ShotWidget.thumbnail_manager.clear_priority_list()
         for shot_widget in visible_shot_widgets:
             shot_widget.request_thumbnail(True)
 
+        # Request thumbnails ahead of the viewport (lower priority)
+        self._thumbnail_prefetcher.update(shot_widgets, first_visible_index, last_visible_index, scroll_pos, viewport.height())
+
+
+    def update_standby_decoders(self):
+        """Starts decoding the shots nearest to the mouse cursor, so that hovering one of them can display its first frame right away."""
+        if not self._ui_enabled or not self._video_info.video_path:
+            return
+
+        viewport = self._scroll_area.viewport()
+        scroll_pos = self._scroll_area.verticalScrollBar().value()
+        viewport_rect = QRect(0, scroll_pos, viewport.width(), viewport.height())
+        cursor_pos = self._scroll_area.widget().mapFromGlobal(QCursor.pos())
+        if not viewport_rect.contains(cursor_pos):
+            return
+
+        nearest_shot_widgets = []
+        preview_size = None
+        for shot_widget in self._shot_widget_mgr:
+            geometry = shot_widget.geometry()
+            if viewport_rect.intersects(geometry) and not shot_widget.is_playing_preview() and not shot_widget.is_preview_cached():
+                distance = (geometry.center() - cursor_pos).manhattanLength()
+                nearest_shot_widgets.append((distance, shot_widget.get_start_frame_index(), shot_widget.get_end_frame_index()))
+                preview_size = shot_widget.get_preview_size()  # Same for all the shot widgets
+        nearest_shot_widgets.sort()
+        shot_ranges = [(start_frame_index, end_frame_index) for _, start_frame_index, end_frame_index in nearest_shot_widgets]
+        ShotWidget.standby_pool.prepare(self._video_info, shot_ranges, preview_size, ShotWidget.speed, ShotWidget.detect_edges, ShotWidget.edge_factor, ShotWidget.volume)
+
 
     @log_function_name(color=PRINT_GREEN_COLOR)
     def on_shot_widget_hovered(self, shot_widget, entering):
@@ -1073,6 +1185,7 @@ class ShotBoard(QMainWindow):
                 self.pause_video()
         else:
             self._hovered_shot_widget = None
+            self.update_status_bar()  # Preview first frame times
 
 
     @log_function_name(color=PRINT_GREEN_COLOR)
@@ -1143,13 +1256,32 @@ class ShotBoard(QMainWindow):
         duration_hms = str(datetime.timedelta(seconds=int(self._video_info.duration)))
         duration_h = self._video_info.duration / 3600 if self._video_info.duration > 0 else 1  # Prevent division by zero
         shots_per_hour = round(len(self._db) / duration_h)
+        provisional_count = len(self._db.get_provisional_shots())
+        provisional_text = f", {provisional_count} provisional" if provisional_count else ""
         info_text += (
-            f"𝗧𝗼𝘁. 𝗦𝗵𝗼𝘁𝘀 {len(self._db)} ({shots_per_hour} shots/hour)   "
+            f"𝗧𝗼𝘁. 𝗦𝗵𝗼𝘁𝘀 {len(self._db)} ({shots_per_hour} shots/hour{provisional_text})   "
             f"𝗧𝗼𝘁. 𝗗𝘂𝗿𝗮𝘁𝗶𝗼𝗻 {duration_hms}   "
             f"𝗙𝗣𝗦 {self._video_info.fps}   "
             f"𝗥𝗲𝘀. {self._video_info.display_width}x{self._video_info.frame_height} ({ratio:.2f})   "
         )
 
+        frame_cache = self._mediaplayer.get_frame_cache()
+        if frame_cache.get_lookup_count():
+            info_text += f"𝗙𝗿𝗮𝗺𝗲 𝗖𝗮𝗰𝗵𝗲 {frame_cache.get_hit_rate():.0%} hits ({frame_cache.get_frame_count()} frames)   "
+
+        prefetcher = self._thumbnail_prefetcher
+        if prefetcher.get_hit_count() + prefetcher.get_miss_count():
+            info_text += f"𝗧𝗵𝘂𝗺𝗯𝗻𝗮𝗶𝗹 𝗣𝗿𝗲𝗳𝗲𝘁𝗰𝗵 {prefetcher.get_hit_rate():.0%} hits   "
+
+        preview_cache = ShotWidget.preview_cache
+        first_frame_texts = [f"{preview_cache.get_mean_first_frame_ms(cached):.0f} ms {'cached' if cached else 'decoded'}" for cached in (False, True) if preview_cache.get_first_frame_count(cached)]
+        if first_frame_texts:
+            info_text += f"𝗣𝗿𝗲𝘃𝗶𝗲𝘄 𝗙𝗶𝗿𝘀𝘁 𝗙𝗿𝗮𝗺𝗲 {', '.join(first_frame_texts)}   "
+
+        audio_mixer = AudioMixer.get_shared()
+        if audio_mixer is not None and audio_mixer.get_underrun_count():
+            info_text += f"𝗔𝘂𝗱𝗶𝗼 𝗨𝗻𝗱𝗲𝗿𝗿𝘂𝗻𝘀 {audio_mixer.get_underrun_count()}   "
+
         self._info_label.setText(info_text)
 
 
@@ -1204,15 +1336,21 @@ class ShotBoard(QMainWindow):
 
 
     def reset_all(self):
+        self.stop_quick_look()
+        self.compact_atlas_if_dirty()
         self.stop_video()
+        self._standby_timer.stop()
+        ShotWidget.standby_pool.clear()
         self._mediaplayer.reset_frame()
         self._history.clear()
         self.clear_shot_widgets()
         self._db.clear_shots()
         self._db_path = None
         self._video_info.clear_info()
+        DecoderPool.close_shared()
         ShotWidget.thumbnail_manager.clear()
         ShotWidget.thumbnail_manager.set_video_info(self._video_info)
+        self._thumbnail_prefetcher.reset()
         self.update_ui_state()
         self.update_status_bar()
         self.update_window_title()
@@ -1229,7 +1367,7 @@ class ShotBoard(QMainWindow):
 
 
     @log_function_name()
-    def update_grid_layout(self):
+    def update_grid_layout(self, show_progress=True):
         # Disable updates to prevent tons of repaints
         # self._scroll_area.setUpdatesEnabled(False)
 
@@ -1238,6 +1376,7 @@ class ShotBoard(QMainWindow):
 
         num_img_per_row = self._zoom_spinbox.value()
         new_shot_widget_size = ShotWidget.evaluate_widget_size(num_img_per_row)
+        ShotWidget.thumbnail_manager.set_zoom(num_img_per_row)
         needs_resize_shot_widgets = (self._shot_widget_mgr.get_shot_widget_size() != new_shot_widget_size) if len(self._shot_widget_mgr) > 0 else False
 
         # Store the index of the first shot widget entirely visible in the ScrollArea
@@ -1250,7 +1389,7 @@ class ShotBoard(QMainWindow):
 
         progress_dialog = None
         if len(self._db) > 0:
-            if len(self._db) > 10:
+            if show_progress and len(self._db) > 10:
                 # Create a progress dialog
                 progress_dialog = QProgressDialog("Updating shots...", "Cancel", 0, len(self._db), self)
                 progress_dialog.setWindowModality(Qt.WindowModal)
@@ -1364,6 +1503,7 @@ class ShotBoard(QMainWindow):
         video_path = url.toLocalFile()
         seek_offset = self._seek_offset_spinbox.value()
         self._video_info.set_from_video(video_path, seek_offset)
+        DecoderPool.open_shared(self._video_info)  # Workers start in the background (FFmpeg is used until they're ready)
         
         self._mediaplayer.set_video_info(self._video_info)
         self._shot_widget_mgr.set_video_info(self._video_info)
@@ -1382,12 +1522,16 @@ class ShotBoard(QMainWindow):
         self.update_ui_state()
         self.enable_ui(True)
 
+        if self._quick_look_checkbox.isChecked():
+            self.start_quick_look()
+
 
     @log_function_name(color=PRINT_YELLOW_COLOR)
     def open_shot_list(self, json_path):
         if json_path is None or not os.path.exists(json_path):
             return
 
+        self.stop_quick_look()
         self.enable_ui(False)
         self._history.clear()
         self._db.load_from_json(json_path)
@@ -1406,6 +1550,112 @@ class ShotBoard(QMainWindow):
         self.update_grid_layout()
         self.enable_ui(True)
 
+        # Resume the refinement of a quick look saved before it was complete
+        self.start_refinement(self._db.get_provisional_shots())
+
+
+    @log_function_name(color=PRINT_YELLOW_COLOR)
+    def start_quick_look(self):
+        self._keyframe_scanner = KeyframeScanner(self._video_info, self)
+        self._keyframe_scanner.scan_finished.connect(self.on_quick_look_finished)
+        self._keyframe_scanner.start()
+        self.statusBar().showMessage("Quick look: scanning keyframes...")
+
+
+    @log_function_name(color=PRINT_YELLOW_COLOR)
+    def stop_quick_look(self):
+        for thread in (self._keyframe_scanner, self._candidate_refiner):
+            if thread is not None:
+                thread.stop()  # Kills its FFmpeg process and cancels its keyframe index build (no wait for the end of the scan)
+                thread.deleteLater()
+        self._keyframe_scanner = None
+        self._candidate_refiner = None
+        self._pending_refinements.clear()
+
+
+    @log_function_name(color=PRINT_YELLOW_COLOR)
+    def on_quick_look_finished(self, video_path, candidates):
+        # Only fill the untouched board of the video (the user may have started working on it in the meantime)
+        if video_path != self._video_info.video_path or len(self._db) != 1 or not self._ui_enabled:
+            self.statusBar().clearMessage()
+            return
+
+        self.enable_ui(False)
+        self.deselect_all()
+        for frame_index in candidates:
+            self._db.add_shot(frame_index, provisional=True)
+        self.update_status_bar()  # Display info right away as update_grid_layout() might take a long time to execute
+        self.update_grid_layout()
+        self.select_shot_widgets(0, 0)
+        self.enable_ui(True)
+        self.statusBar().showMessage(f"Quick look: {len(candidates)} provisional shots, refining...", 5000)
+
+        self.start_refinement(candidates)
+
+
+    @log_function_name(color=PRINT_YELLOW_COLOR)
+    def start_refinement(self, candidates):
+        if not candidates:
+            return
+
+        ssim_drop_threshold = self.convert_detection_slider_value_to_ssim_drop_threshold(self._detection_slider.value())
+        self._candidate_refiner = CandidateRefiner(self._video_info, candidates, self._downscale_spinbox.value(), ssim_drop_threshold, self._double_condition_checkbox.isChecked(), self)
+        self._candidate_refiner.candidate_refined.connect(self.on_candidate_refined)
+        self._candidate_refiner.finished.connect(self.update_status_bar)
+        self._candidate_refiner.start()
+
+
+    def on_candidate_refined(self, candidate, cut_frame_indexes):
+        self._pending_refinements.append((candidate, cut_frame_indexes))
+        self.apply_pending_refinements()
+
+
+    @log_function_name(color=PRINT_YELLOW_COLOR)
+    def apply_pending_refinements(self):
+        """Replaces the provisional shots refined so far by the cuts found by the detector (deferred while the UI is disabled)."""
+        if not self._ui_enabled or not self._pending_refinements:
+            return
+
+        # Keep the selection by start frame (shot indexes may change)
+        selection = None
+        if not self.is_selection_empty():
+            shot_index_min, shot_index_max = self.get_selection_index_min_max()
+            selection = (self._shot_widget_mgr[shot_index_min].get_start_frame_index(), self._shot_widget_mgr[shot_index_max].get_start_frame_index())
+
+        extended_start_frame_indexes = []  # Shots whose end changed
+        for candidate, cut_frame_indexes in self._pending_refinements:
+            if candidate not in self._db or not self._db.is_provisional(candidate):
+                continue  # Edited in the meantime
+
+            shot_index = self._db.get_shot_index(candidate)
+            previous_start_frame_index = self._db[shot_index - 1]  # Frame 0 always starts a shot
+            cut_frame_indexes = [frame_index for frame_index in cut_frame_indexes if frame_index > previous_start_frame_index and (frame_index == candidate or frame_index not in self._db)]
+            if cut_frame_indexes == [candidate]:
+                self._db.set_provisional(candidate, False)  # Confirmed
+                continue
+
+            if selection is not None:
+                self.deselect_all()
+            del self._db[shot_index]
+            ShotWidget.thumbnail_manager.mark_atlas_dirty()
+            for frame_index in cut_frame_indexes:
+                self._db.add_shot(frame_index)
+            extended_start_frame_indexes.append(previous_start_frame_index)
+        self._pending_refinements.clear()
+
+        if extended_start_frame_indexes:
+            self._history.clear()  # Undo would restore the shot lists saved before: the refined candidates would come back as confirmed shots
+            self.update_grid_layout(show_progress=False)
+            for start_frame_index in extended_start_frame_indexes:
+                shot_widget = self._shot_widget_mgr.get_by_start_frame_index(start_frame_index)
+                if shot_widget:
+                    shot_widget.initialise_thumbnail()
+            if selection is not None and selection[0] in self._db and selection[1] in self._db:
+                self.select_shot_widgets(self._db.get_shot_index(selection[0]), self._db.get_shot_index(selection[1]))
+
+        self.update_status_bar()
+        self.update_window_title()
+
 
     @log_function_name(color=PRINT_YELLOW_COLOR)
     def seek_video(self, frame_index):
@@ -1483,27 +1733,69 @@ class ShotBoard(QMainWindow):
         START_POS = offset_start_frame_index / self._video_info.fps  # frame position in seconds
 
         # FFmpeg command to extract frames as grayscale
+        FRAME_COUNT = end_frame_index - start_frame_index
+        detection_thumbnails = DETECTION_THUMBNAILS and not THUMBNAIL_REPRESENTATIVE_FRAMES  # Representative frames are chosen once the shot is complete
         ffmpeg_cmd = [
             "ffmpeg",
-            "-loglevel", "quiet",
+            "-loglevel", "info" if detection_thumbnails else "quiet",  # For showinfo (its lines are read from stderr by the thumbnail reader)
             "-ss", str(START_POS),  # Fast seek FIRST
             "-i", self._video_info.video_path,  # Input file AFTER
-            "-vframes", str(end_frame_index - start_frame_index),
-            "-vf", f"scale={TARGET_WIDTH}:{TARGET_HEIGHT}, format=gray",  # Scale and convert to grayscale (don't bother using pixel aspect ratio)
-            "-f", "rawvideo",
-            "-pix_fmt", "gray",
-            "-nostdin",
-            "-"
         ]
+        if detection_thumbnails:
+            # Second output: thumbnail-sized frames of the likely cuts on another pipe, so detected shots get their thumbnail without another seek.
+            # Scaling every frame to the thumbnail size would double the time FFmpeg takes: only the frames with a scene change score are scaled.
+            THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT = self._video_info.fit_size(*STORED_IMAGE_SIZE)
+            thumbnail_read_fd, thumbnail_write_fd = os.pipe()
+            ffmpeg_cmd += [
+                "-hide_banner",
+                "-nostats",
+                "-nostdin",
+                "-filter_complex", f"[0:v]split=2[detect][thumbnail];"
+                                   f"[detect]scale={TARGET_WIDTH}:{TARGET_HEIGHT},format=gray[detect_out];"  # Scale and convert to grayscale (don't bother using pixel aspect ratio)
+                                   f"[thumbnail]setpts=N,select='gt(scene,{DETECTION_THUMBNAIL_SCENE_THRESHOLD})',showinfo,"  # showinfo gives the number of each selected frame (its pts)
+                                   f"scale={THUMBNAIL_WIDTH}:{THUMBNAIL_HEIGHT}:flags={THUMBNAIL_SCALER},setsar=1[thumbnail_out]",  # Same as ThumbnailLoader
+                "-map", "[detect_out]",
+                "-frames:v", str(FRAME_COUNT),
+                "-f", "rawvideo",
+                "-pix_fmt", "gray",
+                "-",
+                "-map", "[thumbnail_out]",
+                "-frames:v", str(FRAME_COUNT),
+                "-vsync", "0",  # Don't duplicate frames to fill the gaps between selected frames
+                "-f", "rawvideo",
+                "-pix_fmt", "yuv420p",  # Half the size of rgb24 and much cheaper for FFmpeg: only requested frames are converted
+                f"pipe:{thumbnail_write_fd}",
+            ]
+        else:
+            ffmpeg_cmd += [
+                "-vframes", str(FRAME_COUNT),
+                "-vf", f"scale={TARGET_WIDTH}:{TARGET_HEIGHT}, format=gray",  # Scale and convert to grayscale (don't bother using pixel aspect ratio)
+                "-f", "rawvideo",
+                "-pix_fmt", "gray",
+                "-nostdin",
+                "-"
+            ]
 
         # Run FFmpeg without showing a console window
         process = subprocess.Popen(
             ffmpeg_cmd,
             stdout=subprocess.PIPE,  # Capture stdout
-            stderr=subprocess.DEVNULL,  # Discard stderr
+            stderr=subprocess.PIPE if detection_thumbnails else subprocess.DEVNULL,  # Read by the thumbnail reader, else discarded
+            pass_fds=(thumbnail_write_fd,) if detection_thumbnails else (),
             **FFMPEG_NOWINDOW_KWARGS
         )
 
+        thumbnail_reader = None
+        if detection_thumbnails:
+            os.close(thumbnail_write_fd)  # Only FFmpeg writes to the pipe
+            thumbnail_manager = ShotWidget.thumbnail_manager
+            thumbnail_reader = ThumbnailStreamReader(os.fdopen(thumbnail_read_fd, "rb"), process.stderr, start_frame_index + (1 if offset_start_frame_index < 0 else 0),
+                                                     THUMBNAIL_WIDTH, THUMBNAIL_HEIGHT, thumbnail_manager.get_mipmap_zoom(),
+                                                     thumbnail_manager.atlas if thumbnail_manager.atlas.is_open() else None, self)
+            thumbnail_reader.thumbnail_loaded.connect(thumbnail_manager.on_thumbnail_loaded)
+            thumbnail_reader.thumbnail_missed.connect(thumbnail_manager.add_frame_index_to_queue)  # Fall back to a regular loader
+            thumbnail_reader.start()
+
         # Create a progress dialog
         progress_dialog = QProgressDialog("Detecting shots... (time remaining: --:--:--)", "Cancel", start_frame_index, end_frame_index, self)
         progress_dialog.setWindowModality(Qt.WindowModal)
@@ -1572,17 +1864,14 @@ class ShotBoard(QMainWindow):
 
                 # Ensure we have 3 SSIM values before making a decision
                 if prev_ssim is not None and prev_prev_ssim is not None:
-                    # Detect a sudden drop '\' in similarity
-                    simple_condition = prev_prev_ssim - prev_ssim >= ssim_drop_threshold
-                    # Detect a 'V' spike (sudden drop followed by a rise) in similarity
-                    double_condition = ((prev_prev_ssim - prev_ssim >= SIM_DROP_THRESHOLD_MAX and current_ssim - prev_ssim >= ssim_drop_threshold) or
-                                        (prev_prev_ssim - prev_ssim >= ssim_drop_threshold and current_ssim - prev_ssim >= SIM_DROP_THRESHOLD_MAX))
-                    condition = double_condition if self._double_condition_checkbox.isChecked() else simple_condition
-                    if condition:
+                    if is_ssim_drop(prev_prev_ssim, prev_ssim, current_ssim, ssim_drop_threshold, self._double_condition_checkbox.isChecked()):
                         # Add shot at the previous frame
                         cut_frame_index = frame_index - 1
                         shot_index = self._db.add_shot(cut_frame_index)
-                        ShotWidget.thumbnail_manager.add_frame_index_to_queue(cut_frame_index)
+                        if thumbnail_reader:
+                            thumbnail_reader.request_thumbnail(cut_frame_index)
+                        else:
+                            ShotWidget.thumbnail_manager.add_frame_index_to_queue(cut_frame_index)
                         self.seek_video(cut_frame_index)
 
                 # Shift SSIM values
@@ -1607,6 +1896,9 @@ class ShotBoard(QMainWindow):
         # Close FFmpeg process
         process.stdout.close()
         process.wait()
+        if thumbnail_reader:
+            thumbnail_reader.wait()  # Ends with the process (EOF)
+            thumbnail_reader.deleteLater()  # After its pending signals
         progress_dialog.close()
 
         # Display the total time taken to detect shots
@@ -1647,6 +1939,7 @@ class ShotBoard(QMainWindow):
 
         self.deselect_all()
         del self._db[shot_index_min + 1 : shot_index_max + 1]
+        ShotWidget.thumbnail_manager.mark_atlas_dirty()
         
         # Update the grid layout
         self.update_grid_layout()
@@ -1684,6 +1977,7 @@ class ShotBoard(QMainWindow):
         self.enable_ui(False)
 
         self._db[curr_shot_index] = new_start_frame_index
+        ShotWidget.thumbnail_manager.mark_atlas_dirty()
         self._shot_widget_mgr.offset_start_frame_index(curr_start_frame_index, -1)
         prev_shot_widget.initialise_thumbnail()
 
@@ -1718,6 +2012,7 @@ class ShotBoard(QMainWindow):
         self.enable_ui(False)
 
         self._db[curr_shot_index] = new_start_frame_index
+        ShotWidget.thumbnail_manager.mark_atlas_dirty()
         self._shot_widget_mgr.offset_start_frame_index(curr_start_frame_index, 1)
 
         # Update the grid layout
@@ -1737,6 +2032,7 @@ class ShotBoard(QMainWindow):
         self.enable_ui(False)
         self._db.save_to_json(path)
         self._db_path = path
+        ShotWidget.thumbnail_manager.compact_atlas(self._db.get_shots())  # Drop the thumbnails of deleted shots
         # self.push_filename_to_recent(path)  # update 'Open Recent' menu.
         message = f"File saved successfully: {self._db_path}"
         self._status_bar.showMessage(message, 5000)  # Show message for 5 seconds
@@ -1744,6 +2040,12 @@ class ShotBoard(QMainWindow):
         self.enable_ui(True)
 
 
+    def compact_atlas_if_dirty(self):
+        """Drop the thumbnails of the shots removed or moved since the atlas was last compacted, even if the shot list isn't saved."""
+        if ShotWidget.thumbnail_manager.is_atlas_dirty():
+            ShotWidget.thumbnail_manager.compact_atlas(self._db.get_shots())
+
+
     @log_function_name(color=PRINT_GREEN_COLOR)
     def export_selection(self, ask_for_path):
         if not self._video_info.video_path:
@@ -1905,6 +2207,7 @@ class ShotBoard(QMainWindow):
         self.deselect_all()
         frame_indexes = data['frame_indexes']
         self._db.set_shots(frame_indexes)
+        ShotWidget.thumbnail_manager.mark_atlas_dirty()
         self.update_grid_layout()
         self.restore_selection(data)
 
@@ -2115,6 +2418,8 @@ class ShotBoard(QMainWindow):
     def enable_ui(self, enable):
         self._ui_enabled = enable
         self.update_ui_state()
+        if enable and self._pending_refinements:
+            QTimer.singleShot(0, self.apply_pending_refinements)  # Once the current action is complete
 
 
     def frame_index_to_ms(self, frame_index):
@@ -2164,10 +2469,19 @@ class ShotBoard(QMainWindow):
 
 
     def closeEvent(self, event):
+        self.stop_quick_look()
         if self._mediaplayer:
             self._mediaplayer.stop()
+            self._mediaplayer.stop_frame_loader()
 
         self.ask_to_save_if_dirty()
+        self.compact_atlas_if_dirty()
+        ShotWidget.thumbnail_manager.stop()
+        DecoderPool.close_shared()
+        DecoderPool.reaper.stop()  # Waits for the workers to exit and releases their shared memory
+        ShotWidget.standby_pool.close()
+        VideoPlayer.wait_for_retired_players()  # Before the mixer: their audio players are retired to it
+        AudioMixer.close_shared()
 
         event.accept()
 
@@ -2178,6 +2492,7 @@ class ShotBoard(QMainWindow):
 
 
 if __name__ == '__main__':
+    multiprocessing.freeze_support()  # Decoder workers of frozen (.exe) builds
     app = QApplication(sys.argv)
 
     # Set the application style
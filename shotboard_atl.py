@@ -0,0 +1,426 @@
+import os
+import mmap
+import struct
+import zlib
+from PyQt5.QtCore import QBuffer, QByteArray, QIODevice, QReadWriteLock, QReadLocker, QWriteLocker
+from PyQt5.QtGui import QImage
+
+
+# Atlas container (one file per video, next to it)
+ATLAS_EXTENSION = ".sbatlas"
+ATLAS_MAGIC = b"SBATLAS\0"
+ATLAS_VERSION = 1
+ATLAS_INITIAL_CAPACITY = 1024  # Number of index entries reserved when creating an atlas (doubled in place when full)
+ATLAS_GROW_SIZE = 4 * 1024 * 1024  # Bytes the file grows by when a tile doesn't fit (the mapping is only extended when a read needs it)
+ATLAS_COMPACT_RATIO = 0.25  # Compact when discarded tiles exceed this ratio of the tile data
+ATLAS_TILE_FORMAT = "zlib"  # "zlib" (lossless rgb24, deflated), "raw" (rgb24, no decoding but larger) or "jpg" (smallest, but lossy)
+ATLAS_ZLIB_LEVEL = 1  # Fastest compression: tiles are written while thumbnails are being extracted
+ATLAS_JPEG_QUALITY = 90
+
+# File layout (little-endian):
+#   header: magic, version, tile format, index capacity, index count, frame count, tile width, tile height, seek offset, video size, video mtime
+#   index:  capacity x (frame index, offset, size, width, height, flags)
+#   tiles:  tightly packed deflated rgb24, rgb24 or JPEG images, in append order
+ATLAS_HEADER = struct.Struct("<8sIIIIIHHdQd")
+ATLAS_ENTRY = struct.Struct("<iQIHHI")
+ATLAS_TILE_FORMATS = {"jpg": 0, "raw": 1, "zlib": 2}
+ATLAS_FLAG_LIVE = 1
+
+
+##
+## THUMBNAIL ATLAS
+##
+
+
+class ThumbnailAtlas():
+    """Thumbnails of a video packed into a single memory-mapped file (fixed header and index followed by the image tiles)."""
+
+
+    @staticmethod
+    def path_for_video(video_path):
+        return os.path.splitext(video_path)[0] + ATLAS_EXTENSION
+
+
+    def __init__(self):
+        self._lock = QReadWriteLock()
+        self._path = None
+        self._file = None
+        self._mmap = None
+        self._header = None  # Header fields (ATLAS_HEADER order)
+        self._entries = {}  # Frame index -> (slot, offset, size, width, height, flags)
+        self._data_end = 0  # End of the tile data (next append offset)
+        self._flushed_end = 0  # End of the tile data written to the file (the rest may still be buffered)
+        self._file_size = 0  # Grows by ATLAS_GROW_SIZE (truncated to the data end when closed)
+        self._dead_bytes = 0  # Size of the discarded tiles
+        self._generation = 0  # Incremented each time the atlas is (re)opened or closed
+
+
+    def open(self, video_info, tile_size):
+        """Open (or create) the atlas of a video. An atlas made for another video state or tile size is discarded."""
+        self.close()
+        path = ThumbnailAtlas.path_for_video(video_info.video_path)
+
+        with QWriteLocker(self._lock):
+            self._generation += 1
+            self._path = path
+            try:
+                stat = os.stat(video_info.video_path)
+                header = (ATLAS_MAGIC, ATLAS_VERSION, ATLAS_TILE_FORMATS[ATLAS_TILE_FORMAT], ATLAS_INITIAL_CAPACITY, 0,
+                          video_info.frame_count, tile_size[0], tile_size[1], video_info.seek_offset, stat.st_size, stat.st_mtime)
+                if os.path.exists(path) and self._load(header):
+                    return True
+                self._create(path, header)
+                return True
+            except OSError as e:
+                print(f"Error: Cannot open thumbnail atlas {path}: {e}")
+                self._close()
+                return False
+
+
+    def close(self):
+        with QWriteLocker(self._lock):
+            self._generation += 1
+            self._close()
+
+
+    def is_open(self):
+        with QReadLocker(self._lock):
+            return self._file is not None
+
+
+    def get_generation(self):
+        """Identifies the currently open file (tiles extracted for a previous video must not be appended)."""
+        with QReadLocker(self._lock):
+            return self._generation
+
+
+    def __contains__(self, frame_index):
+        with QReadLocker(self._lock):
+            entry = self._entries.get(frame_index, None)
+            return entry is not None and bool(entry[5] & ATLAS_FLAG_LIVE)
+
+
+    def __len__(self):
+        with QReadLocker(self._lock):
+            return sum(1 for entry in self._entries.values() if entry[5] & ATLAS_FLAG_LIVE)
+
+
+    def get_image(self, frame_index):
+        """Returns the QImage stored for a frame index, or None. Only the pages of this tile are read from disk."""
+        with QReadLocker(self._lock):
+            entry = self._entries.get(frame_index, None)
+            if self._file is None or entry is None or not entry[5] & ATLAS_FLAG_LIVE:
+                return None
+            _, offset, size, width, height, _ = entry
+            tile = self._mmap[offset:offset + size] if self._is_mapped(offset, size) else None
+            tile_format = self._header[2]
+
+        if tile is None:
+            with QWriteLocker(self._lock):  # Appended since the last flush or past the mapping
+                if self._file is None or self._entries.get(frame_index, None) != entry:
+                    return None
+                tile = self._read_tile(offset, size)
+
+        if tile_format == ATLAS_TILE_FORMATS["zlib"]:
+            try:
+                tile = zlib.decompress(tile)
+            except zlib.error:
+                return None
+        if tile_format != ATLAS_TILE_FORMATS["jpg"]:
+            if len(tile) != 3 * width * height:
+                return None
+            image = QImage(tile, width, height, 3 * width, QImage.Format_RGB888).copy()  # Detach from the bytes object
+        else:
+            image = QImage.fromData(tile, "JPG")
+        return None if image.isNull() else image
+
+
+    def add_image(self, frame_index, image, generation=None):
+        """Append the tile of a frame index (no-op if already stored, or if the atlas was reopened since 'generation')."""
+        if frame_index in self:
+            return
+
+        tile = self._encode(image)
+        if tile is None:
+            return
+
+        with QWriteLocker(self._lock):
+            if self._file is None or (generation is not None and generation != self._generation):
+                return
+            if frame_index in self._entries and self._entries[frame_index][5] & ATLAS_FLAG_LIVE:
+                return
+            try:
+                if len(self._entries) >= self._header[3]:
+                    self._grow_index(self._header[3] * 2)  # Index full: grow it
+                self._append(frame_index, tile, image.width(), image.height())
+            except OSError as e:
+                print(f"Error: Cannot write thumbnail atlas {self._path}: {e}")
+
+
+    def discard(self, frame_indexes):
+        """Mark the tiles of the given frame indexes as discarded (their space is reclaimed by compact())."""
+        with QWriteLocker(self._lock):
+            if self._file is None:
+                return
+            for frame_index in frame_indexes:
+                entry = self._entries.get(frame_index, None)
+                if entry is None or not entry[5] & ATLAS_FLAG_LIVE:
+                    continue
+                slot, offset, size, width, height, flags = entry
+                entry = (slot, offset, size, width, height, flags & ~ATLAS_FLAG_LIVE)
+                self._entries[frame_index] = entry
+                self._write_entry(frame_index, entry)
+                self._dead_bytes += size
+            self._flush()
+
+
+    def discard_all_but(self, frame_indexes):
+        """Discard the tiles of all frame indexes not in the given list (e.g. deleted shots)."""
+        keep = set(frame_indexes)
+        with QReadLocker(self._lock):
+            discarded = [frame_index for frame_index in self._entries if frame_index not in keep]
+        self.discard(discarded)
+
+
+    def compact(self, force=False):
+        """Rewrite the atlas without its discarded tiles if they waste too much space."""
+        with QWriteLocker(self._lock):
+            if self._file is None:
+                return False
+            data_size = self._data_end - self._data_start()
+            if not self._dead_bytes or (not force and self._dead_bytes < data_size * ATLAS_COMPACT_RATIO):
+                return False
+            try:
+                self._rewrite(self._header[3])
+            except OSError as e:
+                print(f"Error: Cannot compact thumbnail atlas {self._path}: {e}")
+                return False
+            return True
+
+
+    def _data_start(self):
+        return ATLAS_HEADER.size + self._header[3] * ATLAS_ENTRY.size
+
+
+    def _load(self, expected_header):
+        """Read the header and index of an existing atlas. Returns False if it doesn't match the expected header."""
+        with open(self._path, "rb") as file:
+            data = file.read(ATLAS_HEADER.size)
+            if len(data) < ATLAS_HEADER.size:
+                return False
+            header = ATLAS_HEADER.unpack(data)
+            # Everything but the capacity and count must match
+            if header[:3] != expected_header[:3] or header[5:] != expected_header[5:] or header[4] > header[3]:
+                return False
+            index = file.read(header[4] * ATLAS_ENTRY.size)
+            if len(index) < header[4] * ATLAS_ENTRY.size:
+                return False
+
+        self._header = header
+        self._entries.clear()
+        self._dead_bytes = 0
+        self._data_end = self._data_start()
+        for slot in range(header[4]):
+            frame_index, offset, size, width, height, flags = ATLAS_ENTRY.unpack_from(index, slot * ATLAS_ENTRY.size)
+            self._entries[frame_index] = (slot, offset, size, width, height, flags)
+            self._data_end = max(self._data_end, offset + size)
+            if not flags & ATLAS_FLAG_LIVE:
+                self._dead_bytes += size
+
+        self._file = open(self._path, "r+b")
+        self._file_size = os.path.getsize(self._path)
+        self._flushed_end = self._data_end
+        if self._file_size < self._data_end:
+            self._close()
+            return False  # Truncated
+        self._remap()
+        return True
+
+
+    def _create(self, path, header):
+        """Write a new empty atlas and open it. The file is replaced atomically."""
+        self._close()
+        header = header[:4] + (0,) + header[5:]
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(ATLAS_HEADER.pack(*header))
+            file.write(bytes(header[3] * ATLAS_ENTRY.size))
+        os.replace(temp_path, path)
+        self._reopen(path, header, {})
+
+
+    def _rewrite(self, capacity):
+        """Copy the live tiles into a new atlas with the given index capacity, one tile at a time (drops discarded tiles). The file is replaced atomically."""
+        live_entries = sorted((entry for entry in self._entries.items() if entry[1][5] & ATLAS_FLAG_LIVE), key=lambda entry: entry[1][1])
+        capacity = max(capacity, len(live_entries))
+        header = self._header[:3] + (capacity, len(live_entries)) + self._header[5:]
+        entries = {}
+        path = self._path
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            index = bytearray(capacity * ATLAS_ENTRY.size)
+            offset = ATLAS_HEADER.size + len(index)
+            file.seek(offset)
+            for slot, (frame_index, (_, tile_offset, size, width, height, _)) in enumerate(live_entries):
+                file.write(self._read_tile(tile_offset, size))
+                entries[frame_index] = (slot, offset, size, width, height, ATLAS_FLAG_LIVE)
+                ATLAS_ENTRY.pack_into(index, slot * ATLAS_ENTRY.size, frame_index, offset, size, width, height, ATLAS_FLAG_LIVE)
+                offset += size
+            file.seek(0)
+            file.write(ATLAS_HEADER.pack(*header))
+            file.write(index)
+        self._close()
+        os.replace(temp_path, path)
+        self._reopen(path, header, entries)
+
+
+    def _reopen(self, path, header, entries):
+        """Open a file just written by _create() or _rewrite(), with its header and index entries."""
+        self._path = path
+        self._header = header
+        self._entries = entries
+        self._dead_bytes = 0
+        self._data_end = max((offset + size for _, offset, size, _, _, _ in entries.values()), default=self._data_start())
+        self._file = open(path, "r+b")
+        self._file_size = self._data_end
+        self._flushed_end = self._data_end
+        self._remap()
+
+
+    def _grow_index(self, capacity):
+        """Enlarge the index in place. Only the tiles overlapping the enlarged index are moved (to the end of the data); the rest of the file is untouched."""
+        data_start = ATLAS_HEADER.size + capacity * ATLAS_ENTRY.size
+        self._data_end = max(self._data_end, data_start)
+        for frame_index, entry in sorted(self._entries.items(), key=lambda item: item[1][1]):
+            slot, offset, size, width, height, flags = entry
+            if offset >= data_start:
+                break
+            if flags & ATLAS_FLAG_LIVE:
+                entry = (slot, self._write_tile(self._read_tile(offset, size)), size, width, height, flags)
+            else:
+                self._dead_bytes -= size  # Nothing to move: its space becomes part of the index
+                entry = (slot, data_start, 0, width, height, flags)
+            self._entries[frame_index] = entry
+            self._write_entry(frame_index, entry)
+        self._flush()  # The moved tiles and their entries are written before the old tiles are overwritten
+
+        self._file.seek(ATLAS_HEADER.size + self._header[3] * ATLAS_ENTRY.size)
+        self._file.write(bytes((capacity - self._header[3]) * ATLAS_ENTRY.size))
+        self._header = self._header[:3] + (capacity,) + self._header[4:]
+        self._file.seek(0)
+        self._file.write(ATLAS_HEADER.pack(*self._header))
+        self._flush()
+
+
+    def _is_mapped(self, offset, size):
+        return self._mmap is not None and offset + size <= min(len(self._mmap), self._flushed_end)
+
+
+    def _read_tile(self, offset, size):
+        """Returns the bytes of a tile, flushing the appended tiles and extending the mapping if needed (write lock)."""
+        if not self._is_mapped(offset, size):
+            self._flush()
+            if self._mmap is None or offset + size > len(self._mmap):
+                self._remap()
+        return self._mmap[offset:offset + size]
+
+
+    def _append(self, frame_index, tile, width, height):
+        """Append a tile at the end of the data and record it in the next free index slot."""
+        entry = self._entries.get(frame_index, None)
+        slot = entry[0] if entry is not None else self._header[4]  # Reuse the slot of a discarded tile (its data stays dead until compaction)
+
+        entry = (slot, self._write_tile(tile), len(tile), width, height, ATLAS_FLAG_LIVE)
+        self._entries[frame_index] = entry
+        self._write_entry(frame_index, entry)
+
+        if slot == self._header[4]:
+            self._header = self._header[:4] + (slot + 1,) + self._header[5:]
+            self._file.seek(0)
+            self._file.write(ATLAS_HEADER.pack(*self._header))
+
+
+    def _write_tile(self, tile):
+        """Write a tile at the end of the data and return its offset."""
+        if self._data_end + len(tile) > self._file_size:
+            self._file_size = self._data_end + len(tile) + ATLAS_GROW_SIZE
+            self._file.truncate(self._file_size)  # Grown in chunks (not at each tile)
+        offset = self._data_end
+        self._file.seek(offset)
+        self._file.write(tile)
+        self._data_end += len(tile)
+        return offset
+
+
+    def _write_entry(self, frame_index, entry):
+        slot, offset, size, width, height, flags = entry
+        self._file.seek(ATLAS_HEADER.size + slot * ATLAS_ENTRY.size)
+        self._file.write(ATLAS_ENTRY.pack(frame_index, offset, size, width, height, flags))
+
+
+    def _flush(self):
+        self._file.flush()
+        self._flushed_end = self._data_end
+
+
+    def _remap(self):
+        """Map the whole file (read-only) so tiles are faulted in on demand."""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if os.path.getsize(self._path) > 0:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+    def _close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self._file is not None:
+            try:
+                if self._file_size > self._data_end:
+                    self._file.truncate(self._data_end)  # Drop the unused end of the last chunk
+            except OSError as e:
+                print(f"Error: Cannot truncate thumbnail atlas {self._path}: {e}")
+            self._file.close()
+            self._file = None
+        self._file_size = 0
+        self._entries.clear()
+        self._dead_bytes = 0
+
+
+    def _encode(self, image):
+        """Returns the tile bytes of an image in the atlas tile format."""
+        if ATLAS_TILE_FORMAT == "zlib":
+            return zlib.compress(self._get_rgb24_bytes(image), ATLAS_ZLIB_LEVEL)
+        if ATLAS_TILE_FORMAT == "raw":
+            return self._get_rgb24_bytes(image)
+
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.WriteOnly)
+        if not image.save(buffer, "JPG", ATLAS_JPEG_QUALITY):
+            print("Error: Cannot encode thumbnail for the atlas.")
+            return None
+        buffer.close()
+        return bytes(data)
+
+
+    @staticmethod
+    def _get_rgb24_bytes(image):
+        """Returns the tightly packed rgb24 pixels of an image (without the padding at the end of its lines)."""
+        image = image.convertToFormat(QImage.Format_RGB888)
+        width = image.width()
+        bits = image.constBits()
+        bits.setsize(image.sizeInBytes())
+        if image.bytesPerLine() == 3 * width:
+            return bytes(bits)
+        return b"".join(bytes(bits[y * image.bytesPerLine():y * image.bytesPerLine() + 3 * width]) for y in range(image.height()))
+
+
+    def __del__(self):
+        self._close()
+
+
+if __name__ == "__main__":
+    print(f"\033[91mTHIS MODULE FILE IS NOT MEANT TO BE RUN!\033[0m")
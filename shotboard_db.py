@@ -9,6 +9,7 @@ class ShotBoardDb:
     def __init__(self):
         self._frame_count = 0
         self._shots = [] # contains the start frame number of each shot (integer)
+        self._provisional = set()  # start frame numbers of the shots found by the quick look and not confirmed yet
         self._is_dirty = False
 
 
@@ -18,6 +19,7 @@ class ShotBoardDb:
 
     def clear_shots(self):
         self._shots.clear()
+        self._provisional.clear()
         self._is_dirty = True
 
 
@@ -36,12 +38,15 @@ class ShotBoardDb:
 
     def set_shots(self, frame_indices):
         self._shots = sorted(list(set(frame_indices)))
+        self._provisional.intersection_update(self._shots)
         self._is_dirty = True
 
 
-    def add_shot(self, start_frame):
+    def add_shot(self, start_frame, provisional=False):
         index = bisect.bisect_left(self._shots, start_frame)
         self._shots.insert(index, start_frame)
+        if provisional:
+            self._provisional.add(start_frame)
         self._is_dirty = True
         return index
 
@@ -49,9 +54,26 @@ class ShotBoardDb:
     def del_shot(self, frame):
         if frame in self._shots:
             self._shots.remove(frame)
+            self._provisional.discard(frame)
             self._is_dirty = True
 
 
+    def is_provisional(self, start_frame):
+        return start_frame in self._provisional
+
+
+    def set_provisional(self, start_frame, provisional):
+        if provisional:
+            self._provisional.add(start_frame)
+        else:
+            self._provisional.discard(start_frame)
+        self._is_dirty = True
+
+
+    def get_provisional_shots(self):
+        return sorted(self._provisional)
+
+
     def get_shot_index(self, frame_index):
         return self._shots.index(frame_index)
     
@@ -93,12 +115,17 @@ class ShotBoardDb:
     
 
     def __setitem__(self, shot_index, start_frame):
+        self._provisional.discard(self._shots[shot_index])  # Moved by hand
         self._shots[shot_index] = start_frame
         self._is_dirty = True
 
 
     # Example usage: del db[shot_index]
     def __delitem__(self, shot_index):
+        if isinstance(shot_index, slice):
+            self._provisional.difference_update(self._shots[shot_index])
+        else:
+            self._provisional.discard(self._shots[shot_index])
         del self._shots[shot_index]
         self._is_dirty = True
 
@@ -122,7 +149,8 @@ class ShotBoardDb:
     def save_to_json(self, filename=DEFAULT_JSON_FILENAME):
         data = {
             "frame_count": self._frame_count,
-            "shots": self._shots
+            "shots": self._shots,
+            "provisional": sorted(self._provisional)
         }
         with open(filename, 'w', encoding='utf-8') as json_file:
             json.dump(data, json_file)
@@ -136,6 +164,7 @@ class ShotBoardDb:
                 data = json.load(json_file)
                 self.set_frame_count(data["frame_count"])
                 self.set_shots(data["shots"])
+                self._provisional = set(data.get("provisional", [])).intersection(self._shots)
         except FileNotFoundError:
             print(f"File not found: {filename}")
         except json.JSONDecodeError as e:
@@ -0,0 +1,381 @@
+from shotboard_vid import *
+
+import os
+import time
+import json
+import bisect
+import queue
+import subprocess
+import multiprocessing
+from multiprocessing import shared_memory
+import ffmpeg
+import numpy as np
+from PyQt5.QtCore import QThread, pyqtSignal, QMutex, QMutexLocker
+from PyQt5.QtGui import QImage
+
+# PyAV is optional: without it, frames are extracted by spawning FFmpeg as before
+try:
+    import av
+    from shotboard_wrk import *  # Decoder worker entry point (spawned processes only import this module)
+    DECODER_POOL_AVAILABLE = True
+except ImportError:
+    DECODER_POOL_AVAILABLE = False
+
+
+DECODER_POOL_ENABLED = True  # Keep decoder worker processes open on the video (False = spawn FFmpeg for each frame)
+DECODER_POOL_WORKERS = max(1, min(4, (os.cpu_count() or 2) // 2))
+DECODER_POOL_WAIT_TIMEOUT = 2.0  # Max time (in seconds) to wait for an idle worker before falling back to FFmpeg
+DECODER_POOL_CANCEL_CHECK_INTERVAL = 0.01  # Time (in seconds) between two checks of a cancellable request while waiting for a worker or its reply
+
+# Keyframe index (cached next to the video)
+KEYFRAME_INDEX_EXTENSION = ".sbkeys"
+
+
+##
+## DECODER POOL (parent process)
+##
+
+
+class DecoderWorker():
+    """Parent-side handle of a decoder process (its connection and shared memory block)."""
+
+
+    def __init__(self, context, video_path, shm_size):
+        self.shm = shared_memory.SharedMemory(create=True, size=shm_size)
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(target=decoder_worker_main, args=(video_path, child_connection, self.shm.name), daemon=True)
+        self.process.start()
+        child_connection.close()
+        self.is_ready = False
+        self.request_id = 0
+
+
+    def stop(self):
+        """Ask the process to exit. DecoderPool.reaper waits for it (a worker still importing PyAV would block the GUI thread)."""
+        try:
+            self.connection.send(None)
+        except (OSError, ValueError):
+            pass
+        DecoderPool.reaper.reap(self)
+
+
+    def wait(self):
+        """Called by the reaper: waits for the process (terminated if it doesn't exit), then releases its connection and shared memory."""
+        self.process.join(1.0)
+        if self.process.is_alive():
+            self.process.terminate()
+            self.process.join()
+        self.connection.close()
+        self.shm.close()
+        self.shm.unlink()
+
+
+class DecoderPool():
+    """Persistent decoder processes holding the video open and answering 'frame N at WxH' requests (thread-safe)."""
+    shared = None  # Pool of the current video (None = spawn FFmpeg instead)
+    reaper = ProcessReaper()  # Waits for the stopped workers
+
+
+    @staticmethod
+    def open_shared(video_info):
+        """Start the shared pool for a video (replacing the previous one)."""
+        DecoderPool.close_shared()
+        if DECODER_POOL_ENABLED and DECODER_POOL_AVAILABLE and video_info.video_path:
+            DecoderPool.shared = DecoderPool(video_info, DECODER_POOL_WORKERS)
+
+
+    @staticmethod
+    def close_shared():
+        if DecoderPool.shared:
+            DecoderPool.shared.close()
+            DecoderPool.shared = None
+
+
+    @staticmethod
+    def decode_shared(video_info, frame_index, width, height, wait_timeout=DECODER_POOL_WAIT_TIMEOUT, is_cancelled=None):
+        """Decode a frame with the shared pool if it serves this video. Returns a QImage, or None (the caller falls back to FFmpeg, unless cancelled)."""
+        pool = DecoderPool.shared
+        if pool is None or pool.video_path != video_info.video_path:
+            return None
+        return pool.decode(frame_index, video_info.seek_offset, video_info.fps, width, height, wait_timeout, is_cancelled)
+
+
+    @staticmethod
+    def decode_shared_gop(video_info, frame_indexes, width, height):
+        """Decode frames of the same GOP with a single worker of the shared pool (one seek).
+        Returns {frame index: QImage}, or None (the caller falls back to FFmpeg)."""
+        pool = DecoderPool.shared
+        if pool is None or pool.video_path != video_info.video_path:
+            return None
+        return pool.decode_gop(frame_indexes, video_info.seek_offset, video_info.fps, width, height)
+
+
+    def __init__(self, video_info, worker_count):
+        self.video_path = video_info.video_path
+        self.max_width = max(1, video_info.display_width)
+        self.max_height = max(1, video_info.frame_height)
+        context = multiprocessing.get_context("spawn")  # Don't fork a process running Qt threads
+        shm_size = 3 * self.max_width * self.max_height
+        self._mutex = QMutex()
+        self._starting_workers = [DecoderWorker(context, self.video_path, shm_size) for _ in range(worker_count)]
+        self._idle_workers = queue.Queue()
+        self._dead_workers = []  # Stopped when the pool is closed
+        self._worker_count = worker_count  # Workers started or starting (busy ones included)
+        self._closed = False
+
+
+    def close(self):
+        with QMutexLocker(self._mutex):
+            self._closed = True
+            workers = self._starting_workers + self._dead_workers
+            self._starting_workers = []
+            self._dead_workers = []
+        while True:
+            try:
+                workers.append(self._idle_workers.get_nowait())
+            except queue.Empty:
+                break
+        for worker in workers:
+            worker.stop()  # Busy workers are stopped when released
+
+
+    def decode(self, frame_index, seek_offset, fps, width, height, wait_timeout=DECODER_POOL_WAIT_TIMEOUT, is_cancelled=None):
+        """Returns the frame as a QImage of the given size (PAR is up to the caller), or None if no worker answered."""
+        images = self.decode_gop([frame_index], seek_offset, fps, width, height, wait_timeout, is_cancelled)
+        return images.get(frame_index, None) if images else None
+
+
+    def decode_gop(self, frame_indexes, seek_offset, fps, width, height, wait_timeout=DECODER_POOL_WAIT_TIMEOUT, is_cancelled=None):
+        """Decode frames of the same GOP in increasing order with one worker (a single seek).
+        Returns {frame index: QImage}, or None if no worker answered within wait_timeout seconds,
+        or if is_cancelled() became true while waiting for a worker or its reply (a late reply is skipped by the next request of the worker)."""
+        if width > self.max_width or height > self.max_height:
+            ratio = min(self.max_width / width, self.max_height / height)
+            width, height = max(1, int(width * ratio)), max(1, int(height * ratio))
+
+        worker = self._acquire_worker(wait_timeout, is_cancelled)
+        if worker is None:
+            return None
+
+        images = {}
+        try:
+            for i, frame_index in enumerate(sorted(frame_indexes)):
+                worker.request_id += 1
+                worker.connection.send((worker.request_id, frame_index, seek_offset, fps, width, height, i > 0))
+                ok = DecoderPool._receive_reply(worker, is_cancelled)
+                if ok is None:
+                    return None  # Cancelled
+                if ok:
+                    images[frame_index] = self._copy_image(worker.shm, width, height)
+        except (EOFError, OSError) as e:
+            print(f"Error: Decoder worker stopped unexpectedly: {e}")
+            worker.is_ready = False  # Not given back to the pool
+        finally:
+            self._release_worker(worker)
+        return images
+
+
+    @staticmethod
+    def _receive_reply(worker, is_cancelled):
+        """Returns whether the last request of a worker succeeded, or None if is_cancelled() became true first."""
+        while True:
+            if is_cancelled is not None:
+                while not worker.connection.poll(DECODER_POOL_CANCEL_CHECK_INTERVAL):
+                    if is_cancelled():
+                        return None
+            request_id, ok = worker.connection.recv()
+            if request_id == worker.request_id:
+                return ok
+
+
+    def _acquire_worker(self, wait_timeout=DECODER_POOL_WAIT_TIMEOUT, is_cancelled=None):
+        deadline = time.perf_counter() + wait_timeout
+        poll_interval = 0.05 if is_cancelled is None else DECODER_POOL_CANCEL_CHECK_INTERVAL
+        while True:
+            self._collect_ready_workers()
+            try:
+                return self._idle_workers.get(timeout=max(0.0, min(poll_interval, deadline - time.perf_counter())))
+            except queue.Empty:
+                with QMutexLocker(self._mutex):
+                    if self._closed or self._worker_count <= 0:
+                        return None  # No worker left: fall back to FFmpeg right away
+                if time.perf_counter() >= deadline or (is_cancelled is not None and is_cancelled()):
+                    return None
+
+
+    def _release_worker(self, worker):
+        with QMutexLocker(self._mutex):
+            closed = self._closed
+            if not worker.is_ready:
+                self._worker_count -= 1
+        if closed or not worker.is_ready:
+            worker.stop()
+        else:
+            self._idle_workers.put(worker)
+
+
+    def _collect_ready_workers(self):
+        """Move the workers that have opened the video to the idle queue."""
+        with QMutexLocker(self._mutex):
+            for worker in list(self._starting_workers):
+                if not worker.connection.poll():
+                    if not worker.process.is_alive():
+                        print("Error: Decoder worker failed to start.")
+                        self._starting_workers.remove(worker)
+                        self._dead_workers.append(worker)
+                        self._worker_count -= 1
+                    continue
+                self._starting_workers.remove(worker)
+                try:
+                    _, worker.is_ready = worker.connection.recv()
+                except EOFError:
+                    worker.is_ready = False
+                if worker.is_ready:
+                    self._idle_workers.put(worker)
+                else:
+                    self._dead_workers.append(worker)
+                    self._worker_count -= 1
+
+
+    @staticmethod
+    def _copy_image(shm, width, height):
+        image = QImage(width, height, QImage.Format_RGB888)
+        ptr = image.bits()
+        ptr.setsize(image.sizeInBytes())
+        line_bytes = 3 * width
+        pixels = np.frombuffer(ptr, np.uint8).reshape((height, image.bytesPerLine()))
+        pixels[:, :line_bytes] = np.ndarray((height, line_bytes), dtype=np.uint8, buffer=shm.buf)
+        return image
+
+
+##
+## KEYFRAME INDEX
+##
+
+
+class KeyframeIndex():
+    """Times of the keyframes of a video (in seconds from its start, like FFmpeg's -ss), to tell which frames share a GOP."""
+
+
+    @staticmethod
+    def path_for_video(video_path):
+        return os.path.splitext(video_path)[0] + KEYFRAME_INDEX_EXTENSION
+
+
+    @staticmethod
+    def load_or_build(video_path, is_cancelled=None):
+        """Returns the cached index of a video, or builds (and caches) it by reading packet flags (no decoding).
+        is_cancelled() is checked between packets: a cancelled build returns None (nothing is cached)."""
+        stat = os.stat(video_path)
+        path = KeyframeIndex.path_for_video(video_path)
+        try:
+            with open(path, 'r', encoding='utf-8') as json_file:
+                data = json.load(json_file)
+            if data.get("video_size") == stat.st_size and data.get("video_mtime") == stat.st_mtime:
+                return KeyframeIndex(data["keyframes"])
+        except (OSError, ValueError, KeyError):
+            pass  # No valid cache
+
+        times = KeyframeIndex.read_keyframe_times_av(video_path, is_cancelled) if DECODER_POOL_AVAILABLE else KeyframeIndex.read_keyframe_times_ffprobe(video_path, is_cancelled)
+        if times is None:
+            return None  # Cancelled
+        index = KeyframeIndex(times)
+        try:
+            with open(path, 'w', encoding='utf-8') as json_file:
+                json.dump({"video_size": stat.st_size, "video_mtime": stat.st_mtime, "keyframes": index._times}, json_file)
+        except OSError as e:
+            print(f"Warning: Cannot save keyframe index {path}: {e}")
+        return index
+
+
+    @staticmethod
+    def read_keyframe_times_av(video_path, is_cancelled=None):
+        with av.open(video_path) as container:
+            stream = container.streams.video[0]
+            start_time = container.start_time / av.time_base if container.start_time is not None else 0.0
+            times = []
+            for packet in container.demux(stream):
+                if is_cancelled is not None and is_cancelled():
+                    return None
+                if packet.is_keyframe and packet.pts is not None:
+                    times.append(float(packet.pts * stream.time_base) - start_time)
+            return times
+
+
+    @staticmethod
+    def read_keyframe_times_ffprobe(video_path, is_cancelled=None):
+        start_time = float(ffmpeg.probe(video_path)['format'].get('start_time', 0))
+        ffprobe_cmd = [
+            "ffprobe",
+            "-v", "quiet",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",  # Packet flags only: nothing is decoded
+            "-of", "csv=p=0",
+            video_path
+        ]
+        process = subprocess.Popen(ffprobe_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **FFMPEG_NOWINDOW_KWARGS)
+        times = []
+        for line in process.stdout:
+            if is_cancelled is not None and is_cancelled():
+                times = None
+                break
+            pts_time, _, flags = line.decode(errors="ignore").strip().partition(",")
+            if "K" in flags and pts_time not in ("", "N/A"):
+                times.append(float(pts_time) - start_time)
+        process.kill()
+        process.stdout.close()
+        process.wait()
+        return times
+
+
+    def __init__(self, times=None):
+        self._times = sorted(times) if times else []
+
+
+    def __len__(self):
+        return len(self._times)
+
+
+    def get_gop_index(self, time):
+        """Index of the GOP (i.e. of its keyframe) a time belongs to."""
+        return max(0, bisect.bisect_right(self._times, time + 1e-6) - 1)
+
+
+    def get_frame_gop_index(self, video_info, frame_index):
+        return self.get_gop_index(max(0, (frame_index + video_info.seek_offset) / video_info.fps))
+
+
+    def get_keyframe_time(self, gop_index):
+        return self._times[gop_index] if self._times else 0.0
+
+
+    def get_gop_frame_range(self, video_info, gop_index):
+        """Returns the (first, end) frame indexes of a GOP (end excluded, None for the last GOP)."""
+        def first_frame_index(time):
+            return ceil(time * video_info.fps - video_info.seek_offset - 1e-6)
+        first = first_frame_index(self.get_keyframe_time(gop_index)) if gop_index > 0 else 0
+        end = first_frame_index(self._times[gop_index + 1]) if gop_index + 1 < len(self._times) else None
+        return first, end
+
+
+class KeyframeIndexBuilder(QThread):
+    """Loads or builds the keyframe index of a video in the background."""
+    index_built = pyqtSignal(str, object)  # video path, KeyframeIndex
+
+
+    def __init__(self, video_path, parent=None):
+        super().__init__(parent)
+        self._video_path = video_path
+
+
+    def run(self):
+        try:
+            index = KeyframeIndex.load_or_build(self._video_path)
+        except Exception as e:
+            print(f"Error: Cannot build the keyframe index of {self._video_path}: {e}")
+            return
+        self.index_built.emit(self._video_path, index)
+
+
+if __name__ == "__main__":
+    print(f"\033[91mTHIS MODULE FILE IS NOT MEANT TO BE RUN!\033[0m")
@@ -0,0 +1,247 @@
+from shotboard_vid import *
+from shotboard_dec import *
+
+import re
+import math
+import subprocess
+import numpy as np
+from skimage.metrics import structural_similarity as ssim
+from PyQt5.QtCore import QThread, pyqtSignal, QMutex, QMutexLocker
+
+
+# Shot detection
+SIM_DROP_THRESHOLD_MIN = 0.05
+SIM_DROP_THRESHOLD_MAX = 0.30
+SIM_DROP_THRESHOLD_DEFAULT = 0.20
+
+# Quick look (keyframes only)
+QUICK_LOOK_WIDTH = 128  # Width of the keyframes compared by the quick look (low resolution is enough to spot cuts)
+QUICK_LOOK_SSIM_THRESHOLD = 0.5  # Consecutive keyframes less similar than this have a candidate cut between them
+QUICK_LOOK_PTS_TIME_REGEX = re.compile(rb"\bn: *\d+ +pts: *\S+ +pts_time:(\S+)")  # Frame line of FFmpeg's showinfo filter
+REFINE_MARGIN_FRAMES = 3  # Frames decoded around the GOPs of a candidate cut (the detector needs 2 frames before a cut)
+
+
+def is_ssim_drop(prev_prev_ssim, prev_ssim, current_ssim, ssim_drop_threshold, double_condition):
+    """True if the last 3 SSIM values show a cut at the frame of prev_ssim."""
+    if double_condition:
+        # Detect a 'V' spike (sudden drop followed by a rise) in similarity
+        return ((prev_prev_ssim - prev_ssim >= SIM_DROP_THRESHOLD_MAX and current_ssim - prev_ssim >= ssim_drop_threshold) or
+                (prev_prev_ssim - prev_ssim >= ssim_drop_threshold and current_ssim - prev_ssim >= SIM_DROP_THRESHOLD_MAX))
+    # Detect a sudden drop '\' in similarity
+    return prev_prev_ssim - prev_ssim >= ssim_drop_threshold
+
+
+##
+## QUICK LOOK
+##
+
+
+class QuickLookThread(QThread):
+    """Base of the quick look threads: stop() kills their FFmpeg process and cancels their keyframe index build, so it doesn't wait for the end of a scan."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._process = None
+        self._process_mutex = QMutex()
+
+
+    def load_keyframe_index(self, video_path):
+        """Returns the keyframe index of the video, or None if it couldn't be built or the thread was stopped."""
+        try:
+            return KeyframeIndex.load_or_build(video_path, self.isInterruptionRequested)
+        except Exception as e:
+            print(f"Error: Cannot build the keyframe index of {video_path}: {e}")
+            return None
+
+
+    def start_process(self, ffmpeg_cmd, stderr):
+        """Starts the FFmpeg process of the thread (one at a time), or returns None if the thread was stopped."""
+        with QMutexLocker(self._process_mutex):  # 🔒
+            if self.isInterruptionRequested():
+                return None
+            self._process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=stderr, **FFMPEG_NOWINDOW_KWARGS)
+            return self._process
+
+
+    def end_process(self):
+        with QMutexLocker(self._process_mutex):  # 🔒
+            process, self._process = self._process, None
+        process.kill()
+        process.stdout.close()
+        if process.stderr is not None:
+            process.stderr.close()
+        process.wait()
+
+
+    def stop(self):
+        """Interrupts the thread right away (FFmpeg may be seeking or decoding) and waits for it."""
+        self.requestInterruption()
+        with QMutexLocker(self._process_mutex):  # 🔒
+            if self._process is not None:
+                self._process.kill()  # The pending read returns
+        self.wait()
+
+
+class KeyframeScanner(QuickLookThread):
+    """Decodes only the keyframes of a video (at low resolution) and finds the candidate cuts between them."""
+    scan_finished = pyqtSignal(str, object)  # video path, list of candidate cut frame indexes
+
+
+    def __init__(self, video_info, parent=None):
+        super().__init__(parent)
+        self._video_info = video_info
+
+
+    def run(self):
+        video_path = self._video_info.video_path
+        keyframe_index = self.load_keyframe_index(video_path)
+        if keyframe_index is None:
+            return
+
+        width = QUICK_LOOK_WIDTH
+        height = max(8, round(self._video_info.frame_height * (width / self._video_info.frame_width)))  # don't bother using pixel aspect ratio for detection
+        ffmpeg_cmd = [
+            "ffmpeg",
+            "-hide_banner",
+            "-nostats",
+            "-loglevel", "info",  # For showinfo (its lines are read from stderr)
+            "-nostdin",
+            "-skip_frame", "nokey",  # Only keyframes are decoded
+            "-i", video_path,
+            "-vsync", "0",  # One output frame per keyframe
+            "-vf", f"scale={width}:{height},format=gray,showinfo",  # showinfo gives the time of each frame (in seconds from the start, like the keyframe index)
+            "-f", "rawvideo",
+            "-pix_fmt", "gray",
+            "-"
+        ]
+        process = self.start_process(ffmpeg_cmd, subprocess.PIPE)
+        if process is None:
+            return
+
+        candidates = []
+        prev_frame = None
+        frame = np.empty((height, width), dtype=np.uint8)
+        while not self.isInterruptionRequested():
+            if not read_exactly_into(process.stdout, frame):
+                break
+            keyframe_time = KeyframeScanner.read_frame_time(process.stderr)  # Logged before the frame is written
+            if keyframe_time is None:
+                break
+            if math.isnan(keyframe_time):
+                continue  # No timestamp: can't tell which GOP it starts
+
+            # The keyframe is mapped by its time, not by its position (FFmpeg may drop or add keyframes compared to the index)
+            if prev_frame is not None and ssim(prev_frame, frame) < QUICK_LOOK_SSIM_THRESHOLD:
+                frame_index, _ = keyframe_index.get_gop_frame_range(self._video_info, keyframe_index.get_gop_index(keyframe_time))
+                if 0 < frame_index < self._video_info.frame_count and (not candidates or frame_index > candidates[-1]):
+                    candidates.append(frame_index)
+            prev_frame, frame = frame, np.empty_like(frame)
+
+        self.end_process()
+
+        if not self.isInterruptionRequested():
+            self.scan_finished.emit(video_path, candidates)
+
+
+    @staticmethod
+    def read_frame_time(stderr):
+        """Reads FFmpeg's log up to the next showinfo frame line and returns its time (NaN if unknown), or None at the end of the log."""
+        for line in stderr:
+            match = QUICK_LOOK_PTS_TIME_REGEX.search(line)
+            if match:
+                try:
+                    return float(match.group(1))
+                except ValueError:
+                    return math.nan  # NOPTS
+        return None
+
+
+class CandidateRefiner(QuickLookThread):
+    """Runs the regular detector around each candidate cut (from the previous keyframe to the candidate's keyframe)."""
+    candidate_refined = pyqtSignal(int, object)  # candidate frame index, list of detected cut frame indexes
+
+
+    def __init__(self, video_info, candidates, target_width, ssim_drop_threshold, double_condition, parent=None):
+        super().__init__(parent)
+        self._video_info = video_info
+        self._candidates = sorted(candidates)
+        self._target_width = target_width
+        self._ssim_drop_threshold = ssim_drop_threshold
+        self._double_condition = double_condition
+
+
+    def run(self):
+        keyframe_index = self.load_keyframe_index(self._video_info.video_path)
+        if keyframe_index is None:
+            return
+
+        for candidate in self._candidates:
+            if self.isInterruptionRequested():
+                return
+            gop_index = keyframe_index.get_frame_gop_index(self._video_info, candidate)
+            first_frame_index, _ = keyframe_index.get_gop_frame_range(self._video_info, max(0, gop_index - 1))
+            if first_frame_index >= candidate:
+                first_frame_index = 0  # The candidate is in the first GOP
+            cuts = self.detect_cuts(first_frame_index, candidate)
+            if cuts is None:
+                return  # Interrupted
+            self.candidate_refined.emit(candidate, cuts)
+
+
+    def detect_cuts(self, first_frame_index, last_frame_index):
+        """Cuts found by the regular detector in ]first_frame_index, last_frame_index]."""
+        start_frame_index = max(0, first_frame_index - REFINE_MARGIN_FRAMES)
+        end_frame_index = min(self._video_info.frame_count, last_frame_index + REFINE_MARGIN_FRAMES)
+
+        width = self._target_width
+        height = round(self._video_info.frame_height * (width / self._video_info.frame_width))  # don't bother using pixel aspect ratio for detection
+        offset_start_frame_index = start_frame_index + self._video_info.seek_offset
+        if offset_start_frame_index < 0:
+            offset_start_frame_index += 1  # skip frame 0 to actually use negative seek_offset
+            start_frame_index += 1
+        ffmpeg_cmd = [
+            "ffmpeg",
+            "-loglevel", "quiet",
+            "-ss", str(offset_start_frame_index / self._video_info.fps),
+            "-i", self._video_info.video_path,
+            "-vframes", str(end_frame_index - start_frame_index),
+            "-vf", f"scale={width}:{height},format=gray",
+            "-f", "rawvideo",
+            "-pix_fmt", "gray",
+            "-nostdin",
+            "-"
+        ]
+        process = self.start_process(ffmpeg_cmd, subprocess.DEVNULL)
+        if process is None:
+            return None  # Interrupted
+
+        cuts = []
+        frame_index = start_frame_index
+        prev_frame = None
+        prev_ssim = None
+        prev_prev_ssim = None
+        frame = np.empty((height, width), dtype=np.uint8)
+        while frame_index < end_frame_index:
+            if self.isInterruptionRequested():
+                cuts = None
+                break
+            if not read_exactly_into(process.stdout, frame):
+                break
+            if prev_frame is not None:
+                current_ssim = ssim(prev_frame, frame)
+                if prev_ssim is not None and prev_prev_ssim is not None:
+                    cut_frame_index = frame_index - 1
+                    if first_frame_index < cut_frame_index <= last_frame_index and is_ssim_drop(prev_prev_ssim, prev_ssim, current_ssim, self._ssim_drop_threshold, self._double_condition):
+                        cuts.append(cut_frame_index)
+                prev_prev_ssim = prev_ssim
+                prev_ssim = current_ssim
+            prev_frame, frame = frame, np.empty_like(frame)
+            frame_index += 1
+
+        self.end_process()
+        if self.isInterruptionRequested():
+            return None  # Killed by stop(): the cuts found so far are incomplete
+        return cuts
+
+
+if __name__ == "__main__":
+    print(f"\033[91mTHIS MODULE FILE IS NOT MEANT TO BE RUN!\033[0m")
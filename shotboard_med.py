@@ -4,8 +4,9 @@ from shotboard_ui import *
 import subprocess
 import os
 import queue
+from collections import OrderedDict
 from enum import IntEnum, auto
-from PyQt5.QtCore import Qt, pyqtSignal
+from PyQt5.QtCore import Qt, pyqtSignal, QThread, QTimer, QMutex, QMutexLocker, QWaitCondition
 from PyQt5.QtWidgets import QLabel, QSizePolicy
 from PyQt5.QtGui import QImage, QPixmap
 
@@ -13,6 +14,494 @@ from PyQt5.QtGui import QImage, QPixmap
 # Image dimension for storage
 VIDEO_SIZE_MIN = (296, 167) # h = w / (16/9)
 
+# Frame stepping
+FRAME_STEPPER_ENABLED = True  # Keep an FFmpeg process paused at the playhead to step through frames without seeking
+FRAME_STEPPER_WINDOW = 2.0  # Steps (forward or backward) of less than this many seconds are served by the frame stepper, longer jumps seek
+FRAME_STEPPER_PREROLL = 24  # Frames decoded before the target when stepping backward past the cached frames (so that the next backward steps are cached)
+
+# Frame cache
+FRAME_CACHE_MAX_BYTES = 192 * 1024 * 1024  # Memory budget of the decoded still frames (least recently used frames are evicted first)
+FRAME_CACHE_PREFETCH_DELAY_MS = 300  # Idle time on a still frame before the frames around it are prefetched
+FRAME_CACHE_PREFETCH_BACKWARD = 1.0  # Seconds prefetched before the playhead
+FRAME_CACHE_PREFETCH_FORWARD = 2.0  # Seconds prefetched after the playhead
+
+# Still frame loading
+STILL_FRAME_POOL_WAIT_TIMEOUT = 0.0  # Max time (in seconds) to wait for an idle decoder worker (thumbnail loaders may hold them all): FFmpeg is started instead
+
+# Scrubbing (seek slider dragged)
+SCRUB_SCALE = 0.5  # Size of the frames shown while scrubbing, relative to the media player (full size frames are shown once the slider is released)
+SCRUB_CACHE_MAX_BYTES = 96 * 1024 * 1024  # Memory budget of the scrub frames (least recently used frames are evicted first)
+SCRUB_GOP_MAX_DURATION = 4.0  # Longest run of frames (in seconds) decoded at once when the playhead enters a GOP (longer or unknown GOPs are decoded in chunks)
+
+
+##
+## FRAME CACHE
+##
+
+
+class FrameCache():
+    """Decoded still frames of the media player, least recently used first, within a memory budget (thread-safe)."""
+    def __init__(self, max_bytes=FRAME_CACHE_MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._images = OrderedDict()  # key -> QImage (owning its memory)
+        self._byte_count = 0
+        self._mutex = QMutex()
+        self._hit_count = 0
+        self._miss_count = 0
+
+
+    @staticmethod
+    def make_key(video_info, frame_index, size, detect_edges, edge_factor):
+        return (video_info.video_path, video_info.seek_offset, frame_index, size, detect_edges, edge_factor)
+
+
+    def get(self, key):
+        """Returns the cached QImage, or None (counted as a hit or a miss)."""
+        with QMutexLocker(self._mutex):  # 🔒
+            image = self._images.get(key)
+            if image is None:
+                self._miss_count += 1
+                return None
+            self._images.move_to_end(key)
+            self._hit_count += 1
+            return image
+
+
+    def peek(self, key):
+        """Returns the cached QImage, or None, without counting a lookup (scrubbing would skew the hit rate of the still frames)."""
+        with QMutexLocker(self._mutex):  # 🔒
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+            return image
+
+
+    def contains(self, key):
+        with QMutexLocker(self._mutex):  # 🔒
+            return key in self._images
+
+
+    def put(self, key, image):
+        with QMutexLocker(self._mutex):  # 🔒
+            previous_image = self._images.pop(key, None)
+            if previous_image is not None:
+                self._byte_count -= previous_image.sizeInBytes()
+            self._images[key] = image
+            self._byte_count += image.sizeInBytes()
+            while self._byte_count > self._max_bytes and len(self._images) > 1:
+                _, evicted_image = self._images.popitem(last=False)
+                self._byte_count -= evicted_image.sizeInBytes()
+
+
+    def clear(self):
+        with QMutexLocker(self._mutex):  # 🔒
+            self._images.clear()
+            self._byte_count = 0
+
+
+    def get_max_frame_count(self, width, height):
+        """Number of rgb24 frames of width x height the budget can hold."""
+        return self._max_bytes // max(1, 3 * width * height)
+
+
+    def get_frame_count(self):
+        return len(self._images)
+
+
+    def get_lookup_count(self):
+        return self._hit_count + self._miss_count
+
+
+    def get_hit_rate(self):
+        total = self._hit_count + self._miss_count
+        return self._hit_count / total if total else 0.0
+
+
+class FramePrefetcher(QThread):
+    """Decodes the frames of [first_frame_index, end_frame_index[ missing from the frame cache, in the background (one FFmpeg process, no seek)."""
+    def __init__(self, video_info, first_frame_index, end_frame_index, size, detect_edges, edge_factor, frame_cache, parent=None):
+        super().__init__(parent)
+        self._video_info = video_info
+        self._first_frame_index = first_frame_index
+        self._end_frame_index = end_frame_index
+        self._size = size
+        self._detect_edges = detect_edges
+        self._edge_factor = edge_factor
+        self._frame_cache = frame_cache
+        self._process = None
+        self._process_mutex = QMutex()
+
+
+    def run(self):
+        ffmpeg_cmd = VideoPlayer.make_ffmpeg_cmd(self._video_info, self._first_frame_index, self._end_frame_index, self._size, self._detect_edges, self._edge_factor)
+        with QMutexLocker(self._process_mutex):  # 🔒
+            if self.isInterruptionRequested():
+                return
+            self._process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **FFMPEG_NOWINDOW_KWARGS)
+
+        frame_ring = FrameRing(*self._size, VideoPlayer.get_pixel_format(self._detect_edges), 1)
+        for frame_index in range(self._first_frame_index, self._end_frame_index):
+            if self.isInterruptionRequested():
+                break
+            try:
+                if not read_exactly_into(self._process.stdout, frame_ring.get_buffer(0)):
+                    break
+            except (OSError, ValueError):
+                break  # Pipe closed by stop()
+            key = FrameCache.make_key(self._video_info, frame_index, self._size, self._detect_edges, self._edge_factor)
+            if not self._frame_cache.contains(key):
+                frame_ring.convert(0)
+                self._frame_cache.put(key, frame_ring.get_image(0).copy())  # The slot is overwritten by the next read
+
+        with QMutexLocker(self._process_mutex):  # 🔒
+            self._process.kill()
+            self._process.stdout.close()
+            self._process.wait()
+
+
+    def stop(self):
+        """Interrupts the prefetch right away (FFmpeg may be seeking or decoding) and waits for the thread."""
+        self.requestInterruption()
+        with QMutexLocker(self._process_mutex):  # 🔒
+            if self._process is not None:
+                self._process.kill()  # The pending read returns
+        self.wait()
+
+
+##
+## FRAME STEPPER
+##
+
+
+class FrameStepper():
+    """One FFmpeg process kept open at the playhead (blocked on its full pipe while paused) to step through frames.
+    Forward steps read the next frames from the pipe. Every frame read goes to the frame cache, which serves backward steps."""
+    def __init__(self, frame_cache):
+        self._frame_cache = frame_cache
+        self._process = None
+        self._config = None  # (video path, seek offset, size, detect edges, edge factor) of the process
+        self._frame_ring = None  # Single slot ring the pipe is read into
+        self._next_frame_index = 0  # Frame the next read returns
+
+
+    def get_frame(self, video_info, frame_index, width, height, detect_edges, edge_factor, is_cancelled=None):
+        """Returns the frame as a QImage of width x height (PAR corrected), or None if FFmpeg fails.
+        is_cancelled() is checked between reads: a cancelled step returns None but keeps the process where it stopped."""
+        if not 0 <= frame_index < video_info.frame_count:
+            return None
+
+        config = (video_info.video_path, video_info.seek_offset, (width, height), detect_edges, edge_factor)
+        if config != self._config:
+            self.close()
+            self._config = config
+            self._frame_ring = FrameRing(width, height, VideoPlayer.get_pixel_format(detect_edges), 1)
+
+        # Seek unless the frame is a little ahead of the process
+        window = max(1, round(video_info.fps * FRAME_STEPPER_WINDOW))
+        if self._process is None or not (self._next_frame_index <= frame_index < self._next_frame_index + window):
+            start_frame_index = frame_index
+            if self._process is not None and frame_index < self._next_frame_index:
+                start_frame_index = max(0, frame_index - FRAME_STEPPER_PREROLL)  # Stepping backward past the cached frames
+            self.start_process(video_info, start_frame_index)
+
+        image = None
+        while self._next_frame_index <= frame_index:
+            if is_cancelled is not None and is_cancelled():
+                return None
+            if not read_exactly_into(self._process.stdout, self._frame_ring.get_buffer(0)):
+                self.stop_process()
+                return None
+            self._frame_ring.convert(0)
+            image = self._frame_ring.get_image(0).copy()  # The slot is overwritten by the next read
+            self._frame_cache.put(FrameCache.make_key(video_info, self._next_frame_index, (width, height), detect_edges, edge_factor), image)
+            self._next_frame_index += 1
+
+        return image
+
+
+    @staticmethod
+    def is_step(video_info, frame_index, current_frame_index):
+        """True if going from the current frame to frame_index is a step (rather than a jump the caller would rather seek to)."""
+        return abs(frame_index - current_frame_index) < max(1, round(video_info.fps * FRAME_STEPPER_WINDOW))
+
+
+    def start_process(self, video_info, frame_index):
+        self.stop_process()
+        _, decode_size, detect_edges, edge_factor = self._config[1:]
+        ffmpeg_cmd = VideoPlayer.make_ffmpeg_cmd(video_info, frame_index, video_info.frame_count, decode_size, detect_edges, edge_factor)
+        self._process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **FFMPEG_NOWINDOW_KWARGS)
+        self._next_frame_index = frame_index
+
+
+    def stop_process(self):
+        if self._process is not None:
+            self._process.kill()  # FFmpeg ignores SIGTERM while blocked writing to a pipe
+            self._process.stdout.close()
+            self._process.wait()
+            self._process = None
+
+
+    def close(self):
+        self.stop_process()
+        self._config = None
+
+
+##
+## STILL FRAME LOADER
+##
+
+
+class StillFrameLoader(QThread):
+    """Decodes the still frames requested by the media player, off the GUI thread.
+    Requests are coalesced: only the most recent one is decoded, and a decode superseded by a newer request is abandoned (its FFmpeg process is killed).
+    Scrub requests decode the whole GOP of the frame at once into the scrub cache, and aren't abandoned for a frame of the same GOP."""
+    frame_loaded = pyqtSignal(int, int, object)  # request id, frame index, QImage
+
+
+    def __init__(self, frame_cache, scrub_cache, parent=None):
+        super().__init__(parent)
+        self._frame_cache = frame_cache
+        self._scrub_cache = scrub_cache
+        self._frame_stepper = FrameStepper(frame_cache)  # Only used by this thread
+        self._mutex = QMutex()
+        self._condition = QWaitCondition()
+        self._running = True
+        self._request = None  # (request id, video info, frame index, current frame index, width, height, detect edges, edge factor, scrub range) waiting to be decoded
+        self._request_id = 0  # Id of the most recent request (the only one worth decoding)
+        self._decoding_request_id = None  # Id of the request being decoded
+        self._decoding_scrub_range = None  # (first, end) frame indexes of the GOP being decoded for scrubbing
+        self._close_stepper = False
+        self._process = None  # FFmpeg extracting a frame or decoding a GOP
+
+
+    def request(self, video_info, frame_index, current_frame_index, width, height, detect_edges, edge_factor, scrub_range=None):
+        """Queues the frame in place of any pending request, interrupts the decode in progress, and returns the request id (frame_loaded is only emitted for the most recent request).
+        Scrub requests give the (first, end) frame indexes of the GOP to decode into the scrub cache."""
+        with QMutexLocker(self._mutex):  # 🔒
+            self._request_id += 1
+            self._request = (self._request_id, video_info, frame_index, current_frame_index, width, height, detect_edges, edge_factor, scrub_range)
+            self.interrupt_locked()
+            self._condition.wakeAll()
+            return self._request_id
+
+
+    def cancel(self, close_stepper=False):
+        """Drops the pending request and interrupts the decode in progress (e.g. before playing). The frame stepper is closed by this thread if asked."""
+        with QMutexLocker(self._mutex):  # 🔒
+            self._request_id += 1
+            self._request = None
+            self.interrupt_locked()
+            if close_stepper:
+                self._close_stepper = True
+                self._condition.wakeAll()
+
+
+    def stop(self):
+        with QMutexLocker(self._mutex):  # 🔒
+            self._running = False
+            self._request = None
+            self.interrupt_locked()
+            self._condition.wakeAll()
+        self.wait()
+
+
+    def interrupt_locked(self):
+        """Kills the FFmpeg process of a superseded request, unless it decodes the GOP of the new request (the frame stepper checks is_superseded() between reads instead, to keep its position)."""
+        if self._process is not None and self.is_superseded_locked() and not self.is_gop_wanted_locked():
+            self._process.kill()
+
+
+    def is_gop_wanted_locked(self):
+        """True if the pending request is a frame of the GOP being decoded for scrubbing."""
+        return self._decoding_scrub_range is not None and self._request is not None and self._request[-1] == self._decoding_scrub_range
+
+
+    def is_superseded_locked(self):
+        return self._decoding_request_id is not None and self._decoding_request_id != self._request_id  # Direct calls (no request) are never superseded
+
+
+    def is_superseded(self):
+        with QMutexLocker(self._mutex):  # 🔒
+            return self.is_superseded_locked()
+
+
+    def run(self):
+        while True:
+            with QMutexLocker(self._mutex):  # 🔒
+                while self._running and self._request is None and not self._close_stepper:
+                    self._condition.wait(self._mutex)
+                if not self._running:
+                    break
+                close_stepper, self._close_stepper = self._close_stepper, False
+                request, self._request = self._request, None
+                if request is not None:
+                    self._decoding_request_id = request[0]
+
+            if close_stepper:
+                self._frame_stepper.close()
+            if request is None:
+                continue
+
+            if request[-1] is not None:
+                self.decode_scrub_gop(request)
+                continue
+
+            request_id, video_info, frame_index = request[:3]
+            image = self.decode(*request[1:-1])
+            with QMutexLocker(self._mutex):  # 🔒
+                superseded = self.is_superseded_locked()
+                self._decoding_request_id = None
+            if image is not None and not superseded:
+                self.frame_loaded.emit(request_id, frame_index, image)
+
+        self._frame_stepper.close()
+
+
+    def decode(self, video_info, frame_index, current_frame_index, width, height, detect_edges, edge_factor):
+        """Step with the frame stepper, or decode the frame with a decoder worker if possible, or extract it with FFmpeg. Decoded frames go to the frame cache."""
+        image = None
+        if FRAME_STEPPER_ENABLED and FrameStepper.is_step(video_info, frame_index, current_frame_index):
+            image = self._frame_stepper.get_frame(video_info, frame_index, width, height, detect_edges, edge_factor, self.is_superseded)  # Cached by the stepper
+            if image is not None or self.is_superseded():
+                return image
+
+        key = FrameCache.make_key(video_info, frame_index, (width, height), detect_edges, edge_factor)
+        if DecoderPool.shared and not detect_edges:
+            image = DecoderPool.decode_shared(video_info, frame_index, width, height, STILL_FRAME_POOL_WAIT_TIMEOUT, self.is_superseded)
+        if image is None and not self.is_superseded():
+            image = self.extract_still_image(video_info, frame_index, width, height, detect_edges, edge_factor)
+        if image is not None:
+            self._frame_cache.put(key, image)
+        return image
+
+
+    def decode_scrub_gop(self, request):
+        """Decodes the GOP of a scrub request into the scrub cache with one FFmpeg process (no seek inside the GOP).
+        The requested frame is shown as soon as it is decoded, and so are the frames of the same GOP requested in the meantime."""
+        request_id, video_info, frame_index, _, width, height, detect_edges, edge_factor, scrub_range = request
+        scrub_key = FrameCache.make_key(video_info, frame_index, (width, height), detect_edges, edge_factor)
+        image = self._scrub_cache.peek(scrub_key)
+        if image is not None:  # GOP already decoded
+            self.emit_frame_loaded(request_id, frame_index, image)
+            return
+
+        first_frame_index, end_frame_index = scrub_range
+        ffmpeg_cmd = VideoPlayer.make_ffmpeg_cmd(video_info, first_frame_index, end_frame_index, (width, height), detect_edges, edge_factor)
+        with QMutexLocker(self._mutex):  # 🔒
+            if self.is_superseded_locked() and not self.is_gop_wanted_locked():
+                self._decoding_request_id = None
+                return
+            self._decoding_scrub_range = scrub_range
+            self._process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **FFMPEG_NOWINDOW_KWARGS)
+            process = self._process
+
+        frame_ring = FrameRing(width, height, VideoPlayer.get_pixel_format(detect_edges), 1)
+        shown = False
+        for decoded_frame_index in range(first_frame_index, end_frame_index):
+            try:
+                if not read_exactly_into(process.stdout, frame_ring.get_buffer(0)):
+                    break  # FFmpeg failed or was killed by request()
+            except (OSError, ValueError):
+                break
+            frame_ring.convert(0)
+            image = frame_ring.get_image(0).copy()  # The slot is overwritten by the next read
+            self._scrub_cache.put(FrameCache.make_key(video_info, decoded_frame_index, (width, height), detect_edges, edge_factor), image)
+
+            with QMutexLocker(self._mutex):  # 🔒
+                if self.is_gop_wanted_locked():  # Frame of the same GOP requested in the meantime
+                    request_id, frame_index = self._request[0], self._request[2]
+                    self._decoding_request_id = request_id
+                    self._request = None
+                    shown = False
+                elif self.is_superseded_locked():
+                    break  # Scrubbed away from the GOP (FFmpeg was killed)
+                if not shown and frame_index <= decoded_frame_index:
+                    if frame_index < decoded_frame_index:
+                        image = self._scrub_cache.peek(FrameCache.make_key(video_info, frame_index, (width, height), detect_edges, edge_factor))
+                    if image is not None:
+                        self.frame_loaded.emit(request_id, frame_index, image)
+                        shown = True
+
+        with QMutexLocker(self._mutex):  # 🔒
+            self._process = None
+            self._decoding_scrub_range = None
+            self._decoding_request_id = None
+        process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+    def emit_frame_loaded(self, request_id, frame_index, image):
+        with QMutexLocker(self._mutex):  # 🔒
+            superseded = self.is_superseded_locked()
+            self._decoding_request_id = None
+        if not superseded:
+            self.frame_loaded.emit(request_id, frame_index, image)
+
+
+    def extract_still_image(self, video_info, frame_index, width, height, detect_edges, edge_factor):
+        """Extract a frame scaled to width x height (PAR corrected) with FFmpeg. Returns None if FFmpeg fails or the request is superseded (FFmpeg is killed)."""
+        START_POS = max(0, (frame_index + video_info.seek_offset) / video_info.fps)  # frame position in seconds
+
+        # Run FFmpeg without showing a console window
+        if detect_edges:
+            ffmpeg_cmd = [
+                "ffmpeg",
+                "-loglevel", "quiet",  # Suppress all FFmpeg logging
+                "-ss", str(START_POS),  # Fast seek FIRST
+                "-i", video_info.video_path,  # Input file AFTER
+                "-vframes", "1",  # Number of frames to process
+                # "-vf", f"format=gray, sobel=scale={edge_factor}, negate",  # Convert to grayscale, apply Sobel filter, and invert colors
+                "-vf", f"scale={width}:{height},setsar=1,format=gray, sobel=scale={edge_factor}, negate",  # Scale to the label size (PAR corrected), grayscale, Sobel, invert colors
+                "-f", "image2",  # Output format
+                "-vcodec", "mjpeg",  # Video codec
+                "-nostdin",  # Disable interaction on standard input
+                "-"  # Output to pipe
+            ]
+        else:
+            ffmpeg_cmd = [
+                "ffmpeg",
+                "-loglevel", "quiet",  # Suppress all FFmpeg logging
+                "-ss", str(START_POS),  # Fast seek FIRST
+                "-i", video_info.video_path,  # Input file AFTER
+                "-vframes", "1",  # Number of frames to process
+                "-vf", f"scale={width}:{height}:flags={THUMBNAIL_SCALER},setsar=1",  # Scale to the label size (PAR corrected)
+                "-f", "image2",  # Output format
+                "-vcodec", "mjpeg",  # Video codec
+                "-nostdin",  # Disable interaction on standard input
+                "-"  # Output to pipe
+            ]
+
+        with QMutexLocker(self._mutex):  # 🔒
+            if self.is_superseded_locked():
+                return None
+            self._process = subprocess.Popen(
+                ffmpeg_cmd,
+                stdout=subprocess.PIPE,  # Capture stdout
+                stderr=subprocess.DEVNULL,  # Discard stderr
+                **FFMPEG_NOWINDOW_KWARGS
+            )
+            process = self._process
+
+        out, err = process.communicate()
+        with QMutexLocker(self._mutex):  # 🔒
+            self._process = None
+            if self.is_superseded_locked():
+                return None  # Killed by request()
+        if process.returncode != 0:
+            print("Error: Cannot extract frame with FFmpeg.")
+            # print(err.decode())
+            return None
+
+        # Load the extracted frame using QImage
+        image = QImage.fromData(out)
+        if image.isNull():
+            print("Error: Cannot load extracted frame.")
+            return None
+
+        return image
+
+
 
 ##
 ## MEDIA PLAYER
@@ -41,10 +530,24 @@ class SBMediaPlayer(QLabel):
     edge_factor = 1.0
 
 
-    def __init__(self):
+    def __init__(self, keyframe_index_provider=None):
         super().__init__()
         self._state = self.StoppedState
         self._videoplayer = None
+        self._keyframe_index_provider = keyframe_index_provider  # Returns the keyframe index of the video (None until built), to scrub whole GOPs
+        self._frame_cache = FrameCache()
+        self._scrub_cache = FrameCache(SCRUB_CACHE_MAX_BYTES)  # Frames of the GOPs decoded while scrubbing
+        self._frame_loader = StillFrameLoader(self._frame_cache, self._scrub_cache)
+        self._frame_loader.frame_loaded.connect(self.on_still_frame_loaded)
+        self._frame_loader.start()
+        self._frame_request_id = None  # Still frame being decoded by the frame loader
+        self._frame_request_scrub = False  # The frame being decoded is a scrub frame
+        self._scrub_paused_playback = False  # Playback paused by scrub(), played again by end_scrub()
+        self._frame_prefetcher = None
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(FRAME_CACHE_PREFETCH_DELAY_MS)
+        self._prefetch_timer.timeout.connect(self.prefetch_frames)
 
         self._video_info = None
         self._frame_index = 0
@@ -67,6 +570,13 @@ class SBMediaPlayer(QLabel):
             self._videoplayer.set_volume(volume)
 
 
+    def set_speed(self, speed):
+        """Change the playback speed (the video player restarts from the current frame)."""
+        SBMediaPlayer.speed = speed
+        if self._videoplayer and self.is_playing():
+            self.play(self._frame_index)
+
+
     def is_ready(self):
         if not self._video_info or not self._video_info.video_path:
             return False
@@ -79,6 +589,10 @@ class SBMediaPlayer(QLabel):
 
 
     def set_video_info(self, video_info):
+        self.stop_prefetch()
+        self.cancel_still_frame(True)
+        self._frame_cache.clear()
+        self._scrub_cache.clear()
         self._video_info = video_info
         self._frame_index = 0
         self.seek(0)
@@ -99,8 +613,11 @@ class SBMediaPlayer(QLabel):
 
 
     def resizeEvent(self, event):
-        """Handle resizing by recalculating the pixmap."""
-        self.set_still_frame(self._frame_index)
+        """Handle resizing by recalculating the pixmap (or restarting the decoder at the new size)."""
+        if self.is_playing() and self._videoplayer:
+            self.play(self._frame_index)
+        else:
+            self.set_still_frame(self._frame_index)
         super().resizeEvent(event)
 
 
@@ -144,8 +661,10 @@ class SBMediaPlayer(QLabel):
         if self._videoplayer:
             self._videoplayer.stop()
             self._videoplayer = None
+        self.stop_prefetch()
+        self.cancel_still_frame()
 
-        self._videoplayer = VideoPlayer(self._video_info, start_frame_index, self._video_info.frame_count, SBMediaPlayer.volume, SBMediaPlayer.speed, SBMediaPlayer.detect_edges, SBMediaPlayer.edge_factor)
+        self._videoplayer = VideoPlayer(self._video_info, start_frame_index, self._video_info.frame_count, SBMediaPlayer.volume, SBMediaPlayer.speed, SBMediaPlayer.detect_edges, SBMediaPlayer.edge_factor, target_size=(self.width(), self.height()))  # Decoded at the label size
         if self._videoplayer:
             self._videoplayer.frame_loaded.connect(self.on_frame_loaded)
             self._videoplayer.start()  # Start the video rendering thread
@@ -186,6 +705,8 @@ class SBMediaPlayer(QLabel):
         if self._videoplayer:
             self._videoplayer.stop()
             self._videoplayer = None
+        self.stop_prefetch()
+        self.cancel_still_frame(True)
 
         self.set_state(self.StoppedState)
         if reset:
@@ -195,6 +716,8 @@ class SBMediaPlayer(QLabel):
 
 
     def set_still_frame(self, frame_index):
+        """Show the frame from the frame cache right away, or have the frame loader decode it (the GUI thread doesn't wait for FFmpeg).
+        The playhead moves at once; while scrubbing, only the last requested frame is decoded."""
         if not self.is_ready():
             return
 
@@ -202,70 +725,130 @@ class SBMediaPlayer(QLabel):
             self._videoplayer.stop()
             self._videoplayer = None
 
-        START_POS = max(0, (frame_index + self._video_info.seek_offset) / self._video_info.fps)  # frame position in seconds
+        self.stop_prefetch()
+        width, height = self._video_info.fit_size(self.width(), self.height())
+        image = self._frame_cache.get(FrameCache.make_key(self._video_info, frame_index, (width, height), SBMediaPlayer.detect_edges, SBMediaPlayer.edge_factor))
+        if image is not None:
+            self.cancel_still_frame()  # A pending frame would replace this one
+            self.update_frame_from_image(frame_index, image)
+            self._prefetch_timer.start()  # Prefetch the frames around once idle
+        else:
+            self._frame_request_id = self._frame_loader.request(self._video_info, frame_index, self._frame_index, width, height, SBMediaPlayer.detect_edges, SBMediaPlayer.edge_factor)
+            self._frame_request_scrub = False
+            self._frame_index = frame_index
+            self.frameChanged.emit(frame_index)
+        self.set_state(self.PausedState)
 
-        # Run FFmpeg without showing a console window
-        if SBMediaPlayer.detect_edges:
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-loglevel", "quiet",  # Suppress all FFmpeg logging
-                "-ss", str(START_POS),  # Fast seek FIRST
-                "-i", self._video_info.video_path,  # Input file AFTER
-                "-vframes", "1",  # Number of frames to process
-                # "-vf", f"format=gray, sobel=scale={SBMediaPlayer.edge_factor}, negate",  # Convert to grayscale, apply Sobel filter, and invert colors
-                "-vf", f"scale=iw*sar:ih,setsar=1,format=gray, sobel=scale={SBMediaPlayer.edge_factor}, negate",  # Correct pixel aspect ratio (PAR), grayscale, Sobel, invert colors
-                "-f", "image2",  # Output format
-                "-vcodec", "mjpeg",  # Video codec
-                "-nostdin",  # Disable interaction on standard input
-                "-"  # Output to pipe
-            ]
+
+    def scrub(self, frame_index):
+        """Show the frame while the seek slider is dragged: a full size frame if cached, else a scrub frame (SCRUB_SCALE) from the GOPs decoded whole into the scrub cache.
+        The full size frame is shown by end_scrub() once the slider is released."""
+        if not self.is_ready():
+            return
+
+        if self.is_playing():
+            # Played again once by end_scrub() (not at each slider move, which would restart FFmpeg each time)
+            self._videoplayer.stop()  # Not paused: its queued frames would be shown over the scrub frames
+            self._videoplayer = None
+            self._scrub_paused_playback = True
+
+        self.stop_prefetch()
+        width, height = self._video_info.fit_size(self.width(), self.height())
+        image = self._frame_cache.peek(FrameCache.make_key(self._video_info, frame_index, (width, height), SBMediaPlayer.detect_edges, SBMediaPlayer.edge_factor))
+        if image is None:
+            width, height = self._video_info.fit_size(max(1, round(self.width() * SCRUB_SCALE)), max(1, round(self.height() * SCRUB_SCALE)))
+            image = self._scrub_cache.peek(FrameCache.make_key(self._video_info, frame_index, (width, height), SBMediaPlayer.detect_edges, SBMediaPlayer.edge_factor))
+        if image is not None:
+            self.cancel_still_frame()  # A pending frame would replace this one
+            self.update_frame_from_image(frame_index, image)
         else:
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-loglevel", "quiet",  # Suppress all FFmpeg logging
-                "-ss", str(START_POS),  # Fast seek FIRST
-                "-i", self._video_info.video_path,  # Input file AFTER
-                "-vframes", "1",  # Number of frames to process
-                "-vf", "scale=iw*sar:ih,setsar=1",  # Correct pixel aspect ratio (PAR) before output
-                "-f", "image2",  # Output format
-                "-vcodec", "mjpeg",  # Video codec
-                "-nostdin",  # Disable interaction on standard input
-                "-"  # Output to pipe
-            ]
+            self._frame_request_id = self._frame_loader.request(self._video_info, frame_index, self._frame_index, width, height, SBMediaPlayer.detect_edges, SBMediaPlayer.edge_factor, self.get_scrub_range(frame_index))
+            self._frame_request_scrub = True
+            self._frame_index = frame_index
+            self.frameChanged.emit(frame_index)
+        self.set_state(self.PausedState)
 
-        process = subprocess.Popen(
-            ffmpeg_cmd,
-            stdout=subprocess.PIPE,  # Capture stdout
-            stderr=subprocess.DEVNULL,  # Discard stderr
-            **FFMPEG_NOWINDOW_KWARGS
-        )
 
-        out, err = process.communicate()
-        if process.returncode != 0:
-            print("Error: Cannot extract frame with FFmpeg.")
-            # print(err.decode())
+    def end_scrub(self, frame_index):
+        """Called once the seek slider is released: plays from the frame if scrub() paused the playback, else shows the full size frame."""
+        if self._scrub_paused_playback:
+            self._scrub_paused_playback = False
+            self.play(frame_index)
+        elif not self.is_playing():
+            self.seek(frame_index)
+
+
+    def get_scrub_range(self, frame_index):
+        """(first, end) frame indexes decoded at once for scrubbing: the GOP of the frame (from the keyframe index provider), or a chunk of it."""
+        first_frame_index, end_frame_index = 0, self._video_info.frame_count
+        keyframe_index = self._keyframe_index_provider() if self._keyframe_index_provider else None
+        if keyframe_index:
+            first_frame_index, end_frame_index = keyframe_index.get_gop_frame_range(self._video_info, keyframe_index.get_frame_gop_index(self._video_info, frame_index))
+            first_frame_index = max(0, min(first_frame_index, frame_index))
+            end_frame_index = max(frame_index + 1, min(end_frame_index or self._video_info.frame_count, self._video_info.frame_count))
+        chunk_frame_count = max(1, round(self._video_info.fps * SCRUB_GOP_MAX_DURATION))
+        first_frame_index += (frame_index - first_frame_index) // chunk_frame_count * chunk_frame_count
+        return first_frame_index, min(end_frame_index, first_frame_index + chunk_frame_count)
+
+
+    def on_still_frame_loaded(self, request_id, frame_index, image):
+        if request_id != self._frame_request_id or self.is_playing():
+            return  # Superseded
+        self._frame_request_id = None
+        self.set_frame_pixmap(QPixmap.fromImage(image))
+        if not self._frame_request_scrub:
+            self._prefetch_timer.start()  # Prefetch the frames around once idle
+
+
+    def cancel_still_frame(self, close_stepper=False):
+        self._frame_request_id = None
+        self._frame_loader.cancel(close_stepper)
+
+
+    def stop_frame_loader(self):
+        self._frame_request_id = None
+        self._frame_loader.stop()
+
+
+    def prefetch_frames(self):
+        """Decodes the frames around the still frame that aren't cached yet, in the background."""
+        if not self.is_ready() or self.is_playing():
             return
 
-        # Load the extracted frame using QImage
-        image = QImage.fromData(out)
-        if image.isNull():
-            print("Error: Cannot load extracted frame.")
+        width, height = self._video_info.fit_size(self.width(), self.height())
+        max_frame_count = self._frame_cache.get_max_frame_count(width, height) * 3 // 4  # Don't evict the window being prefetched
+        backward_count = min(round(self._video_info.fps * FRAME_CACHE_PREFETCH_BACKWARD), max_frame_count // 3)
+        forward_count = min(round(self._video_info.fps * FRAME_CACHE_PREFETCH_FORWARD), max_frame_count - backward_count)
+        frame_indexes = range(max(0, self._frame_index - backward_count), min(self._video_info.frame_count, self._frame_index + forward_count + 1))
+        missing_frame_indexes = [frame_index for frame_index in frame_indexes if not self._frame_cache.contains(FrameCache.make_key(self._video_info, frame_index, (width, height), SBMediaPlayer.detect_edges, SBMediaPlayer.edge_factor))]
+        if not missing_frame_indexes:
             return
 
-        # Update the image label
-        self.update_frame_from_image(frame_index, image)
-        self._frame_index = frame_index
-        self.frameChanged.emit(frame_index)
-        self.set_state(self.PausedState)
+        self.stop_prefetch()
+        self._frame_prefetcher = FramePrefetcher(self._video_info, missing_frame_indexes[0], missing_frame_indexes[-1] + 1, (width, height), SBMediaPlayer.detect_edges, SBMediaPlayer.edge_factor, self._frame_cache)
+        self._frame_prefetcher.start()
+
+
+    def stop_prefetch(self):
+        self._prefetch_timer.stop()
+        if self._frame_prefetcher is not None:
+            self._frame_prefetcher.stop()
+            self._frame_prefetcher.deleteLater()
+            self._frame_prefetcher = None
+
+
+    def get_frame_cache(self):
+        return self._frame_cache
 
 
     def on_frame_loaded(self):
-        assert self._videoplayer
+        if self._videoplayer is None or self.sender() is not self._videoplayer:
+            return  # Stopped (by scrub() for instance): a frame it queued would replace the scrub frame and move the seek slider
         if not self._videoplayer._frame_queue.empty():
             try:
-                frame_index, image = self._videoplayer._frame_queue.get()  # Thread-safe
+                frame_index, image = self._videoplayer.take_frame()  # Thread-safe
                 self.update_frame_from_image(frame_index, image)
-                if frame_index + 1 >= self._video_info.frame_count:
+                if frame_index + VideoPlayer.get_frame_step(VideoPlayer.clamp_speed(SBMediaPlayer.speed)) >= self._video_info.frame_count:
                     self.stop(False)
             except queue.Empty:
                 print("Warning: Frame queue is empty. Skipping frame.")
@@ -280,17 +863,23 @@ class SBMediaPlayer(QLabel):
 
 
     def update_frame(self, frame_index, pixmap):
-        scaled_pixmap = pixmap.scaled(self.width(), self.height(), Qt.KeepAspectRatio, Qt.FastTransformation)  # /!\ Qt.SmoothTransformation stalls when ThreadPoll is running
-        self.setPixmap(scaled_pixmap)
-
+        self.set_frame_pixmap(pixmap)
         self._frame_index = frame_index
         self.frameChanged.emit(frame_index)
 
 
+    def set_frame_pixmap(self, pixmap):
+        if pixmap.size().scaled(self.size(), Qt.KeepAspectRatio) != pixmap.size():  # Frames are already scaled to the label size
+            pixmap = pixmap.scaled(self.width(), self.height(), Qt.KeepAspectRatio, Qt.FastTransformation)  # Fallback only (e.g. resized while playing)
+        self.setPixmap(pixmap)
+
+
     def closeEvent(self, event):
         if self._videoplayer:
             self._videoplayer.stop()
             self._videoplayer = None
+        self.stop_prefetch()
+        self.stop_frame_loader()
         event.accept()
 
 
@@ -299,6 +888,7 @@ class SBMediaPlayer(QLabel):
         if self._videoplayer:
             self._videoplayer.stop()
             self._videoplayer = None
+        self._frame_loader.stop()
 
 
 if __name__ == "__main__":
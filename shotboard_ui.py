@@ -1,9 +1,17 @@
 from shotboard_vid import *
+from shotboard_atl import *
+from shotboard_dec import *
 
+import re
 import subprocess
 import queue
 import bisect
-from PyQt5.QtCore import Qt, QObject, pyqtSignal, QThreadPool, QRunnable, QEvent, QTimer, QMutex, QMutexLocker, QReadWriteLock, QReadLocker, QWriteLocker, QRect
+import math
+import os
+import json
+import numpy as np
+from collections import OrderedDict
+from PyQt5.QtCore import Qt, QObject, pyqtSignal, QThread, QThreadPool, QRunnable, QEvent, QTimer, QElapsedTimer, QMutex, QMutexLocker, QReadWriteLock, QReadLocker, QWriteLocker, QRect
 from PyQt5.QtWidgets import QFrame, QVBoxLayout, QLabel, QProgressBar
 from PyQt5.QtGui import QImage, QPixmap
 
@@ -11,6 +19,25 @@ from PyQt5.QtGui import QImage, QPixmap
 # Image dimension for storage
 STORED_IMAGE_SIZE = (1024, 576) # h = w * 0.5625  # ratio = 16/9
 
+# Thumbnail extraction
+THUMBNAIL_RAW_PIPE = True  # Let FFmpeg scale and output raw rgb24 pixels (False = MJPEG round-trip rescaled by Qt)
+THUMBNAIL_SCALER = "lanczos"  # FFmpeg scaler used to downscale thumbnails (bicubic, lanczos, area...)
+THUMBNAIL_ATLAS = True  # Keep the thumbnails of each video in an atlas file next to it (reloaded without FFmpeg)
+THUMBNAIL_GOP_GROUPING = True  # Decode the pending thumbnails of a GOP together (one seek), using the keyframe index of the video
+THUMBNAIL_GOP_GROUP_MAX = 16  # Max thumbnails decoded together
+THUMBNAIL_MIPMAPS = True  # Keep thumbnails pre-scaled for each zoom level (False = shot widgets rescale the stored image)
+THUMBNAIL_MIPMAP_CACHE_MAX_BYTES = 384 * 1024 * 1024  # Memory budget of the pre-scaled thumbnails (least recently used pixmaps are evicted first)
+STREAM_THUMBNAIL_RETAINED_FRAMES = 8  # Last frames kept by ThumbnailStreamReader (the reader may run a few frames ahead of the consumer of the other stream)
+STREAM_THUMBNAIL_FRAME_NUMBER_REGEX = re.compile(rb"\bn: *\d+ +pts: *(\d+)")  # Frame line of FFmpeg's showinfo filter, after setpts=N (pts = input frame number)
+
+# Representative frames (thumbnail of the sharpest typical frame of each shot instead of its first frame)
+THUMBNAIL_REPRESENTATIVE_FRAMES = False
+REPRESENTATIVE_SAMPLE_COUNT = 5  # Frames sampled per shot (away from its first and last frames)
+REPRESENTATIVE_SAMPLE_SIZE = (128, 72)  # Size of the sampled frames (grayscale)
+REPRESENTATIVE_BATCH_DURATION = 20.0  # Max length in seconds of the video decoded in a single pass for a batch of shots
+REPRESENTATIVE_BATCH_MAX_SHOTS = 32  # Max shots per batch
+REPRESENTATIVE_CACHE_EXTENSION = ".sbreps"  # Chosen frames, cached next to the video
+
 # Default Qt5 values
 # scrollarea_height = self.scroll_area.viewport().height()
 # visible_area_top = self.scroll_area.verticalScrollBar().value()
@@ -57,6 +84,15 @@ SHOT_WIDGET_RESCAN_COLOR = "#3ad98a"  # green
 
 SHOT_WIDGET_HIDE_CURSOR_TIMEOUT = 200  # in ms
 
+# Thumbnail prefetching
+PREFETCH_MIN_SCREENS = 1  # Number of screens of shot widgets always prefetched ahead of the viewport
+PREFETCH_MAX_SCREENS = 4  # Maximum number of screens prefetched ahead of the viewport when scrolling fast
+PREFETCH_LOOKAHEAD_MS = 1000  # Prefetch what the current scroll speed would bring into view within this delay
+PREFETCH_VELOCITY_SMOOTHING = 0.5  # Weight of the latest scroll speed measurement (0..1)
+PREFETCH_IDLE_RESET_MS = 500  # Scroll speed is reset when the scroll area stays still for that long
+PREFETCH_RESERVED_THREADS = 1  # Threads kept free for visible shot widgets (prefetch and background requests can't use them)
+PROCESS_QUEUE_RETRY_DELAY_MS = 50  # Retry delay when all threads are busy (finished loaders may still count as active)
+
 
 ##
 ## ASYNC IMAGE LOADER
@@ -66,72 +102,185 @@ SHOT_WIDGET_HIDE_CURSOR_TIMEOUT = 200  # in ms
 class ThumbnailLoader(QRunnable):
     ffmpeg_mutex = QMutex()
 
-    """ Asynchronous task to generate and return a QPixmap """
+    """ Asynchronous task to extract frames of the same GOP and return them as QImages (plus their mipmap for the requested zoom level) """
     class Signals(QObject):
-        thumbnail_loaded  = pyqtSignal(int, QPixmap)
+        thumbnail_loaded  = pyqtSignal(int, QImage, int, QImage)  # frame index, stored image, zoom level, mipmap
         thumbnail_failed  = pyqtSignal(int)
+        loader_finished  = pyqtSignal()  # Emitted last: the manager can release the runnable
 
 
-    def __init__(self, video_info, frame_index):
+    def __init__(self, video_info, frame_indexes, zoom=0, atlas=None, decoded_frame_indexes=None):
         super().__init__()
-        self.setAutoDelete(True)
+        self.setAutoDelete(False)  # Owned by the manager: an auto-deleted Python runnable can deadlock QThreadPool.start()
         self._running = True
         self._signals = ThumbnailLoader.Signals()
         self._signals.destroyed.connect(self._on_signals_destroyed)
 
         self._video_info = video_info
-        self._frame_index = frame_index
+        self._decoded_frame_indexes = decoded_frame_indexes or {}  # Frame to decode for each thumbnail (e.g. the representative frame of a shot), if not the frame index itself
+        self._frame_indexes = sorted(frame_indexes, key=self.get_decoded_frame_index)  # All decoded in the same GOP
+        self._zoom = zoom  # 0 = no mipmap
+        self._atlas = atlas  # None = no atlas
+        self._atlas_generation = atlas.get_generation() if atlas is not None else None
     
 
+    def get_decoded_frame_index(self, frame_index):
+        return self._decoded_frame_indexes.get(frame_index, frame_index)
+
+
     def run(self):
-        """ Simulate loading an image by creating a black QPixmap """
-        START_POS = max(0, (self._frame_index + self._video_info.seek_offset) / self._video_info.fps)  # frame position in seconds
+        try:
+            self.load_thumbnails()
+        finally:
+            try:
+                self._signals.loader_finished.emit()
+            except RuntimeError:
+                pass  # Signals object already deleted (application quitting)
+
+
+    def load_thumbnails(self):
+        """ Read the frames from the atlas, or extract them with a single decode, and return them as QImages """
+        decoded_frame_indexes = sorted(set(self.get_decoded_frame_index(frame_index) for frame_index in self._frame_indexes))
+        images = {}  # By decoded frame index
+        if self._atlas is not None:
+            for frame_index in decoded_frame_indexes:
+                image = self._atlas.get_image(frame_index)
+                if image is not None:
+                    images[frame_index] = image
+
+        missing_frame_indexes = [frame_index for frame_index in decoded_frame_indexes if frame_index not in images]
+        if missing_frame_indexes:
+            extracted_images = self.extract_images(missing_frame_indexes)
+            if self._atlas is not None:
+                for frame_index, image in extracted_images.items():
+                    self._atlas.add_image(frame_index, image, self._atlas_generation)
+            images.update(extracted_images)
+
+        for frame_index in self._frame_indexes:
+            if not self._running:
+                return
+            image = images.get(self.get_decoded_frame_index(frame_index), None)
+            if image is None:
+                self._signals.thumbnail_failed.emit(frame_index)
+            else:
+                mipmap = ThumbnailScaler.scale_image(image, self._zoom)
+                self._signals.thumbnail_loaded.emit(frame_index, image, self._zoom, mipmap)
+
+
+    def extract_images(self, frame_indexes):
+        """ Decode the frames with the decoder pool, or extract them with FFmpeg (one FFmpeg process at a time).
+        Returns {frame index: QImage}. """
+        if DecoderPool.shared:
+            images = DecoderPool.decode_shared_gop(self._video_info, frame_indexes, *self._video_info.fit_size(*STORED_IMAGE_SIZE))
+            if images is not None:
+                return images
 
         with QMutexLocker(ThumbnailLoader.ffmpeg_mutex):
-            # Run FFmpeg without showing a console window
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-loglevel", "quiet",  # Suppress all FFmpeg logging
-                "-ss", str(START_POS),  # Fast seek FIRST
-                "-i", self._video_info.video_path,  # Input file AFTER
-                "-vframes", "1",  # Number of frames to process
-                "-vf", "scale=iw*sar:ih,setsar=1",  # Correct pixel aspect ratio (PAR) before output
-                "-f", "image2",  # Output format
-                "-vcodec", "mjpeg",  # Video codec
-                "-nostdin",  # Disable interaction on standard input
-                "-"  # Output to pipe
-            ]
-
-            process = subprocess.Popen(
-                ffmpeg_cmd,
-                stdout=subprocess.PIPE,  # Capture stdout
-                stderr=subprocess.DEVNULL,  # Discard stderr
-                **FFMPEG_NOWINDOW_KWARGS
-            )
-
-            if self._running:
-                out, err = process.communicate()
-                if process.returncode != 0:
-                    print("Error: Cannot extract frame with FFmpeg.")
-                    print(err.decode())
-                    self._signals.thumbnail_failed.emit(self._frame_index)
-                    return
-
-            if self._running:
-                pixmap = QPixmap(STORED_IMAGE_SIZE[0], STORED_IMAGE_SIZE[1])
-                if pixmap.loadFromData(out):
-                    pixmap = pixmap.scaled(
-                        STORED_IMAGE_SIZE[0], 
-                        STORED_IMAGE_SIZE[1], 
-                        Qt.KeepAspectRatio, 
-                        Qt.SmoothTransformation  # For some reason, Qt.SmoothTransformation works fine here, but not downstream
-                    )
-                else:
-                    pixmap.fill(Qt.darkCyan)  # Default black in case of error
-                    print("Failed to load image data.")
-
-            if self._running:
-                self._signals.thumbnail_loaded.emit(self._frame_index, pixmap)
+            if not self._running:
+                return {}
+
+            if THUMBNAIL_RAW_PIPE:
+                images = ThumbnailLoader.extract_raw_images(self._video_info, frame_indexes)
+            else:
+                images = {frame_index: ThumbnailLoader.extract_mjpeg_image(self._video_info, frame_index) for frame_index in frame_indexes}
+                images = {frame_index: image for frame_index, image in images.items() if image is not None}
+        return images
+
+
+    @staticmethod
+    def extract_raw_image(video_info, frame_index):
+        """ Let FFmpeg scale the frame to its stored size and read its raw rgb24 pixels into a QImage """
+        return ThumbnailLoader.extract_raw_images(video_info, [frame_index]).get(frame_index, None)
+
+
+    @staticmethod
+    def extract_raw_images(video_info, frame_indexes):
+        """ Let FFmpeg seek once, select the frames, scale them to their stored size and read their raw rgb24 pixels into QImages """
+        frame_indexes = sorted(frame_indexes)
+        START_POS = max(0, (frame_indexes[0] + video_info.seek_offset) / video_info.fps)  # frame position in seconds
+        width, height = video_info.fit_size(*STORED_IMAGE_SIZE)
+        video_filter = f"scale={width}:{height}:flags={THUMBNAIL_SCALER},setsar=1"  # Scale to the stored size (PAR corrected)
+        if len(frame_indexes) > 1:
+            selection = "+".join(f"eq(n,{frame_index - frame_indexes[0]})" for frame_index in frame_indexes)
+            video_filter = f"select='{selection}'," + video_filter  # Frame numbers start at the seek position
+
+        # Run FFmpeg without showing a console window
+        ffmpeg_cmd = [
+            "ffmpeg",
+            "-loglevel", "quiet",  # Suppress all FFmpeg logging
+            "-ss", str(START_POS),  # Fast seek FIRST
+            "-i", video_info.video_path,  # Input file AFTER
+            "-vframes", str(len(frame_indexes)),  # Number of frames to process
+            "-vf", video_filter,
+            "-vsync", "0",  # Don't duplicate frames to fill the gaps between selected frames
+            "-f", "rawvideo",  # Output format
+            "-pix_fmt", "rgb24",  # Pixel format
+            "-nostdin",  # Disable interaction on standard input
+            "-"  # Output to pipe
+        ]
+
+        process = subprocess.Popen(
+            ffmpeg_cmd,
+            stdout=subprocess.PIPE,  # Capture stdout
+            stderr=subprocess.DEVNULL,  # Discard stderr
+            **FFMPEG_NOWINDOW_KWARGS
+        )
+
+        # Read the raw pixels straight into the QImage buffers
+        images = {}
+        for frame_index in frame_indexes:
+            image = read_rgb24_image(process.stdout, width, height)
+            if image is None:
+                print("Error: Cannot extract frame with FFmpeg.")
+                break
+            images[frame_index] = image
+        process.stdout.close()
+        process.wait()
+        return images
+
+
+    @staticmethod
+    def extract_mjpeg_image(video_info, frame_index):
+        """ Let FFmpeg encode the frame as MJPEG, then decode it and rescale it with Qt """
+        START_POS = max(0, (frame_index + video_info.seek_offset) / video_info.fps)  # frame position in seconds
+
+        # Run FFmpeg without showing a console window
+        ffmpeg_cmd = [
+            "ffmpeg",
+            "-loglevel", "quiet",  # Suppress all FFmpeg logging
+            "-ss", str(START_POS),  # Fast seek FIRST
+            "-i", video_info.video_path,  # Input file AFTER
+            "-vframes", "1",  # Number of frames to process
+            "-vf", "scale=iw*sar:ih,setsar=1",  # Correct pixel aspect ratio (PAR) before output
+            "-f", "image2",  # Output format
+            "-vcodec", "mjpeg",  # Video codec
+            "-nostdin",  # Disable interaction on standard input
+            "-"  # Output to pipe
+        ]
+
+        process = subprocess.Popen(
+            ffmpeg_cmd,
+            stdout=subprocess.PIPE,  # Capture stdout
+            stderr=subprocess.DEVNULL,  # Discard stderr
+            **FFMPEG_NOWINDOW_KWARGS
+        )
+
+        out, _ = process.communicate()
+        if process.returncode != 0:
+            print("Error: Cannot extract frame with FFmpeg.")
+            return None
+
+        image = QImage.fromData(out)
+        if image.isNull():
+            print("Failed to load image data.")
+            return None
+
+        return scale_image_smooth(image, STORED_IMAGE_SIZE[0], STORED_IMAGE_SIZE[1])  # Not QImage.scaled(): runs in the thread pool
+
+
+    def stop(self):
+        """ Skip the thumbnails not extracted yet. """
+        self._running = False
 
 
     def _on_signals_destroyed(self):
@@ -144,33 +293,523 @@ class ThumbnailLoader(QRunnable):
         self._running = False
 
 
+class ThumbnailScaler(QRunnable):
+    """ Asynchronous task to scale a stored image down to the image size of a zoom level (and draw its edges in "Lines" mode) """
+    class Signals(QObject):
+        mipmap_loaded = pyqtSignal(int, int, float, QImage)  # frame index, zoom level, edge factor (0 = colour), mipmap
+
+
+    def __init__(self, frame_index, image, zoom, edge_factor=0):
+        super().__init__()
+        self.setAutoDelete(False)  # Owned by the manager: an auto-deleted Python runnable can deadlock QThreadPool.start()
+        self._signals = ThumbnailScaler.Signals()
+
+        self._frame_index = frame_index
+        self._image = image
+        self._zoom = zoom
+        self._edge_factor = edge_factor
+
+
+    def run(self):
+        mipmap = ThumbnailScaler.scale_image(self._image, self._zoom, self._edge_factor)
+        self._signals.mipmap_loaded.emit(self._frame_index, self._zoom, self._edge_factor, mipmap)
+
+
+    @staticmethod
+    def scale_image(image, zoom, edge_factor=0):
+        """ Returns the image scaled to fit the image size of the given zoom level (in any thread, see scale_image_smooth),
+        drawn as lines if edge_factor > 0 (edges are detected at the displayed size, like FFmpeg's filter during playback) """
+        if zoom in SHOT_IMAGE_SIZES:
+            image_size = SHOT_IMAGE_SIZES[zoom]
+            image = scale_image_smooth(image, image_size[0], image_size[1])
+        if edge_factor > 0:
+            image = sobel_edge_image(image, edge_factor)
+        return image
+
+
+class ThumbnailStreamReader(QThread):
+    """ Reads the thumbnail-sized yuv420p frames an FFmpeg process outputs alongside another stream (e.g. shot detection) and keeps the last ones to deliver requested thumbnails without seeking.
+    FFmpeg may only output some of the frames (e.g. likely cuts): the number of each frame is read from the showinfo lines of its log. """
+    thumbnail_loaded = pyqtSignal(int, QImage, int, QImage)  # frame index, stored image, zoom level, mipmap
+    thumbnail_missed = pyqtSignal(int)  # frame index (already discarded, skipped or never decoded)
+
+
+    def __init__(self, stream, log_stream, start_frame_index, width, height, zoom=0, atlas=None, parent=None):
+        super().__init__(parent)
+        self._stream = stream
+        self._log_stream = log_stream  # FFmpeg's stderr
+        self._start_frame_index = start_frame_index  # Index of the frame number 0
+        self._frame_index = start_frame_index  # Frames before this index were read or skipped
+        self._width = width
+        self._height = height
+        self._zoom = zoom  # 0 = no mipmap
+        self._atlas = atlas  # None = no atlas
+        self._atlas_generation = atlas.get_generation() if atlas is not None else None
+
+        self._mutex = QMutex()
+        self._recent_frames = {}  # Last raw frames read, by frame index (only requested ones are converted to RGB)
+        self._requested_frame_indexes = set()
+
+
+    def request_thumbnail(self, frame_index):
+        """ Deliver the thumbnail of a frame index from the reader thread, unless it's already been discarded """
+        with QMutexLocker(self._mutex):
+            missed = frame_index not in self._recent_frames and frame_index < self._frame_index
+            if not missed:
+                self._requested_frame_indexes.add(frame_index)
+
+        if missed:
+            self.thumbnail_missed.emit(frame_index)
+
+
+    def run(self):
+        while True:
+            frame = None
+            frame_number = ThumbnailStreamReader.read_frame_number(self._log_stream)  # Logged before the frame is written
+            if frame_number is not None:
+                frame = read_yuv420p_frame(self._stream, self._width, self._height)
+            if frame is not None:
+                with QMutexLocker(self._mutex):
+                    frame_index = self._start_frame_index + frame_number
+                    self._recent_frames[frame_index] = frame
+                    if len(self._recent_frames) > STREAM_THUMBNAIL_RETAINED_FRAMES:
+                        del self._recent_frames[min(self._recent_frames)]
+                    self._frame_index = frame_index + 1
+
+            # Deliver the requested frames read so far, and report those FFmpeg skipped
+            with QMutexLocker(self._mutex):
+                ready_frame_indexes = sorted(self._requested_frame_indexes.intersection(self._recent_frames))
+                missed_frame_indexes = sorted(frame_index for frame_index in self._requested_frame_indexes if frame_index < self._frame_index and frame_index not in self._recent_frames)
+                self._requested_frame_indexes.difference_update(ready_frame_indexes)
+                self._requested_frame_indexes.difference_update(missed_frame_indexes)
+                ready_frames = [self._recent_frames[frame_index] for frame_index in ready_frame_indexes]
+            for frame_index, ready_frame in zip(ready_frame_indexes, ready_frames):
+                self.deliver_thumbnail(frame_index, yuv420p_to_rgb24_image(ready_frame, self._width, self._height))
+            for frame_index in missed_frame_indexes:
+                self.thumbnail_missed.emit(frame_index)
+
+            if frame is None:
+                break  # EOF (process ended or was closed)
+
+        self._stream.close()
+        self._log_stream.close()
+
+        # Frames requested but never read
+        with QMutexLocker(self._mutex):
+            missed_frame_indexes = sorted(self._requested_frame_indexes)
+            self._requested_frame_indexes.clear()
+            self._recent_frames.clear()
+            self._frame_index = math.inf  # Later requests are missed right away
+        for frame_index in missed_frame_indexes:
+            self.thumbnail_missed.emit(frame_index)
+
+
+    @staticmethod
+    def read_frame_number(log_stream):
+        """Reads FFmpeg's log up to the next showinfo frame line and returns its frame number, or None at the end of the log."""
+        for line in log_stream:
+            match = STREAM_THUMBNAIL_FRAME_NUMBER_REGEX.search(line)
+            if match:
+                return int(match.group(1))
+        return None
+
+
+    def deliver_thumbnail(self, frame_index, image):
+        if self._atlas is not None:
+            self._atlas.add_image(frame_index, image, self._atlas_generation)
+        mipmap = ThumbnailScaler.scale_image(image, self._zoom)
+        self.thumbnail_loaded.emit(frame_index, image, self._zoom, mipmap)
+
+
+class RepresentativeFrameSelector(QRunnable):
+    """ Asynchronous task to pick the representative frame of a batch of consecutive shots, from low-res grayscale samples decoded in a single FFmpeg pass """
+    class Signals(QObject):
+        frames_selected = pyqtSignal(str, object)  # video path, {(start frame index, end frame index): representative frame index}
+
+
+    def __init__(self, video_info, shot_ranges):
+        super().__init__()
+        self.setAutoDelete(False)  # Owned by the manager: an auto-deleted Python runnable can deadlock QThreadPool.start()
+        self._signals = RepresentativeFrameSelector.Signals()
+
+        self._video_info = video_info
+        self._shot_ranges = sorted(shot_ranges)
+
+
+    def run(self):
+        sample_frame_indexes = {shot_range: RepresentativeFrameSelector.get_sample_frame_indexes(*shot_range) for shot_range in self._shot_ranges}
+        frame_indexes = sorted(set(frame_index for frame_indexes in sample_frame_indexes.values() for frame_index in frame_indexes))
+        samples = RepresentativeFrameSelector.extract_samples(self._video_info, frame_indexes) if frame_indexes else {}
+
+        representative_frames = {}
+        for shot_range, frame_indexes in sample_frame_indexes.items():
+            frame_indexes = [frame_index for frame_index in frame_indexes if frame_index in samples]
+            if frame_indexes:
+                representative_frames[shot_range] = frame_indexes[RepresentativeFrameSelector.select_frame(np.stack([samples[frame_index] for frame_index in frame_indexes]))]
+            else:
+                representative_frames[shot_range] = shot_range[0]  # Too short (or couldn't be decoded)
+        self._signals.frames_selected.emit(self._video_info.video_path, representative_frames)
+
+
+    @staticmethod
+    def get_sample_frame_indexes(start_frame_index, end_frame_index):
+        """ Frames spread across the shot, away from its ends (often blurred or mid-transition) """
+        frame_count = end_frame_index - start_frame_index
+        if frame_count <= 2:
+            return []
+        sample_count = min(REPRESENTATIVE_SAMPLE_COUNT, frame_count - 2)
+        return sorted(set(start_frame_index + round(frame_count * (i + 1) / (sample_count + 1)) for i in range(sample_count)))
+
+
+    @staticmethod
+    def extract_samples(video_info, frame_indexes):
+        """ Let FFmpeg seek once, select the frames and output them as small grayscale images. Returns {frame index: 2D array} """
+        START_POS = max(0, (frame_indexes[0] + video_info.seek_offset) / video_info.fps)  # frame position in seconds
+        width, height = REPRESENTATIVE_SAMPLE_SIZE
+        selection = "+".join(f"eq(n,{frame_index - frame_indexes[0]})" for frame_index in frame_indexes)  # Frame numbers start at the seek position
+
+        # Run FFmpeg without showing a console window
+        ffmpeg_cmd = [
+            "ffmpeg",
+            "-loglevel", "quiet",  # Suppress all FFmpeg logging
+            "-ss", str(START_POS),  # Fast seek FIRST
+            "-i", video_info.video_path,  # Input file AFTER
+            "-vframes", str(len(frame_indexes)),  # Number of frames to process
+            "-vf", f"select='{selection}',scale={width}:{height},format=gray",
+            "-vsync", "0",  # Don't duplicate frames to fill the gaps between selected frames
+            "-f", "rawvideo",  # Output format
+            "-pix_fmt", "gray",  # Pixel format
+            "-nostdin",  # Disable interaction on standard input
+            "-"  # Output to pipe
+        ]
+        process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **FFMPEG_NOWINDOW_KWARGS)
+
+        frames = np.empty((len(frame_indexes), height, width), np.uint8)
+        frame_count = 0
+        while frame_count < len(frame_indexes) and read_exactly_into(process.stdout, frames[frame_count]):
+            frame_count += 1
+        process.stdout.close()
+        process.wait()
+        return dict(zip(frame_indexes[:frame_count], frames[:frame_count]))
+
+
+    @staticmethod
+    def select_frame(frames):
+        """ Returns the index of the sharpest frame (variance of the Laplacian) among the most typical ones (closest to the median frame) """
+        frames = frames.astype(np.float32)
+        laplacians = 4 * frames[:, 1:-1, 1:-1] - frames[:, :-2, 1:-1] - frames[:, 2:, 1:-1] - frames[:, 1:-1, :-2] - frames[:, 1:-1, 2:]
+        sharpness = laplacians.reshape((len(frames), -1)).var(axis=1)
+        distances = np.abs(frames - np.median(frames, axis=0)).reshape((len(frames), -1)).mean(axis=1)
+        typical = distances <= np.median(distances)  # Skip the frames of a transition or a flash
+        return int(np.argmax(np.where(typical, sharpness, -1.0)))
+
+
+    @staticmethod
+    def get_cache_path(video_path):
+        return os.path.splitext(video_path)[0] + REPRESENTATIVE_CACHE_EXTENSION
+
+
+    @staticmethod
+    def load_cache(video_path):
+        """ Returns the representative frames chosen in previous sessions ({} if the video changed since) """
+        try:
+            with open(RepresentativeFrameSelector.get_cache_path(video_path), "r") as file:
+                data = json.load(file)
+            stat = os.stat(video_path)
+            if data.get("video_size") != stat.st_size or data.get("video_mtime") != stat.st_mtime:
+                return {}
+            return {(start_frame_index, end_frame_index): frame_index for start_frame_index, end_frame_index, frame_index in data.get("frames", [])}
+        except (OSError, ValueError, TypeError):
+            return {}
+
+
+    @staticmethod
+    def save_cache(video_path, representative_frames):
+        cache_path = RepresentativeFrameSelector.get_cache_path(video_path)
+        try:
+            stat = os.stat(video_path)
+            data = {
+                "video_size": stat.st_size,
+                "video_mtime": stat.st_mtime,
+                "frames": [[start_frame_index, end_frame_index, frame_index] for (start_frame_index, end_frame_index), frame_index in sorted(representative_frames.items())],
+            }
+            with open(cache_path + ".tmp", "w") as file:
+                json.dump(data, file)
+            os.replace(cache_path + ".tmp", cache_path)
+        except OSError as e:
+            print(f"Error: Cannot save {cache_path}: {e}")
+
+
 ##
 ## IMAGE MANAGER
 ##
 
 
+class MipmapCache():
+    """Pre-scaled thumbnail pixmaps by (frame index, zoom level, edge factor), least recently used first, within a memory budget (GUI thread, guarded by the manager lock)."""
+    def __init__(self, max_bytes=THUMBNAIL_MIPMAP_CACHE_MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._pixmaps = OrderedDict()  # key -> QPixmap
+        self._byte_count = 0
+
+
+    @staticmethod
+    def get_pixmap_bytes(pixmap):
+        return pixmap.width() * pixmap.height() * max(1, pixmap.depth() // 8)
+
+
+    def get(self, key):
+        pixmap = self._pixmaps.get(key, None)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(key)
+        return pixmap
+
+
+    def put(self, key, pixmap):
+        self.discard(key)
+        self._pixmaps[key] = pixmap
+        self._byte_count += MipmapCache.get_pixmap_bytes(pixmap)
+        while self._byte_count > self._max_bytes and len(self._pixmaps) > 1:
+            _, evicted_pixmap = self._pixmaps.popitem(last=False)
+            self._byte_count -= MipmapCache.get_pixmap_bytes(evicted_pixmap)
+
+
+    def discard(self, key):
+        pixmap = self._pixmaps.pop(key, None)
+        if pixmap is not None:
+            self._byte_count -= MipmapCache.get_pixmap_bytes(pixmap)
+
+
+    def discard_frame(self, frame_index):
+        """Discard the pixmaps of a frame at every zoom level and edge factor."""
+        for key in [key for key in self._pixmaps if key[0] == frame_index]:
+            self.discard(key)
+
+
+    def discard_edge_factor(self, edge_factor):
+        """Discard the "Lines" pixmaps drawn with the given edge factor, at every zoom level."""
+        for key in [key for key in self._pixmaps if key[2] == edge_factor]:
+            self.discard(key)
+
+
+    def clear(self):
+        self._pixmaps.clear()
+        self._byte_count = 0
+
+
+    def get_byte_count(self):
+        return self._byte_count
+
+
 class ThumbnailManager(QObject):
-    """Manages asynchronous loading of QPixmaps."""
+    """Manages asynchronous loading of thumbnails and of their pre-scaled variants (one per zoom level)."""
 
-    thumbnail_loaded = pyqtSignal(int, QPixmap)  # Signal emitted when an image is ready
+    thumbnail_loaded = pyqtSignal(int, QPixmap)  # Signal emitted when an image is ready (scaled for the current zoom level)
 
 
     def __init__(self):
         super().__init__()
         self.thread_pool = QThreadPool.globalInstance()
         # self.thread_pool.setMaxThreadCount(4)  # DEBUG
+        self.scale_thread_pool = QThreadPool()  # Mipmaps are quick to generate: don't wait behind FFmpeg loaders
         self.lock = QReadWriteLock()
         self.queue = []  # Frame index queue
         self.priority_list = []  # High-priority frame indexes
-        self.thumbnails = {}  # Loaded pixmaps
+        self.prefetch_list = []  # Low-priority frame indexes (ahead of the viewport)
+        self.thumbnails = {}  # Loaded images (STORED_IMAGE_SIZE)
+        self.mipmaps = MipmapCache()  # Pre-scaled pixmaps, by (frame index, zoom level, edge factor)
         self.running_tasks = set()  # Tracks currently loading frame indexes
+        self.running_loaders = {}  # Currently loading tasks, by signals object (kept alive until they're done, even if cleared)
+        self.running_scale_tasks = {}  # Currently scaling tasks, by (frame index, zoom level, edge factor)
         self.is_processing_queue = False
+        self._process_queue_timer = QTimer(self)  # Retries when the queue couldn't be emptied
+        self._process_queue_timer.setSingleShot(True)
+        self._process_queue_timer.timeout.connect(self.process_queue)
 
         self._video_info = None
+        self._zoom = DEFAULT_SHOT_IMAGE_SIZE_INDEX
+        self._edge_factor = 0  # "Lines" mode (0 = colour thumbnails)
+        self.atlas = ThumbnailAtlas()
+        self._atlas_dirty = False  # Shots were removed or moved since the atlas was last compacted
+        self.keyframe_index = None  # Built in the background once needed (None = unknown GOPs)
+        self._keyframe_index_builder = None
+
+        # Representative frames (THUMBNAIL_REPRESENTATIVE_FRAMES)
+        self.shot_end_frame_indexes = {}  # End frame index of each shot, by start frame index (the thumbnail key)
+        self.representative_frames = {}  # Chosen frame index, by (start frame index, end frame index)
+        self._pending_selections = []  # Shot ranges waiting for their representative frame
+        self._running_selector = None
 
 
     def set_video_info(self, video_info):
         self._video_info = video_info
+        self.open_atlas()
+        self.keyframe_index = None
+        self._keyframe_index_builder = None
+        self.load_representative_frames()
+
+
+    def request_keyframe_index(self):
+        """Load or build the keyframe index of the current video in the background, the first time a feature needs it (it is cached in a .sbkeys file)."""
+        if self.keyframe_index is None and self._keyframe_index_builder is None and self._video_info and self._video_info.video_path:
+            self._keyframe_index_builder = KeyframeIndexBuilder(self._video_info.video_path, self)
+            self._keyframe_index_builder.index_built.connect(self.on_keyframe_index_built)
+            self._keyframe_index_builder.finished.connect(self._keyframe_index_builder.deleteLater)
+            self._keyframe_index_builder.start()
+
+
+    def get_keyframe_index(self):
+        """Returns the keyframe index of the current video, or None until it is built (the first call starts building it)."""
+        if self.keyframe_index is None:
+            self.request_keyframe_index()
+        return self.keyframe_index
+
+
+    def on_keyframe_index_built(self, video_path, keyframe_index):
+        if self._video_info and self._video_info.video_path == video_path:
+            self.keyframe_index = keyframe_index
+
+
+    def load_representative_frames(self):
+        self.shot_end_frame_indexes.clear()
+        self._pending_selections.clear()
+        self.representative_frames = {}
+        if THUMBNAIL_REPRESENTATIVE_FRAMES and self._video_info and self._video_info.video_path:
+            self.representative_frames = RepresentativeFrameSelector.load_cache(self._video_info.video_path)
+
+
+    def set_shot_range(self, start_frame_index, end_frame_index):
+        """Record the end of a shot (its representative frame depends on it). A thumbnail chosen for another end is discarded."""
+        if not THUMBNAIL_REPRESENTATIVE_FRAMES:
+            return
+        previous_end_frame_index = self.shot_end_frame_indexes.get(start_frame_index, None)
+        self.shot_end_frame_indexes[start_frame_index] = end_frame_index
+        if previous_end_frame_index is not None and previous_end_frame_index != end_frame_index:
+            with QWriteLocker(self.lock):
+                self.thumbnails.pop(start_frame_index, None)
+                self.mipmaps.discard_frame(start_frame_index)
+
+
+    def get_decoded_frame_index(self, frame_index):
+        """Returns the frame to decode for the thumbnail of a shot (its first frame, or its representative frame), or None if not chosen yet."""
+        if not THUMBNAIL_REPRESENTATIVE_FRAMES:
+            return frame_index
+        end_frame_index = self.shot_end_frame_indexes.get(frame_index, None)
+        if end_frame_index is None:
+            return None
+        return self.representative_frames.get((frame_index, end_frame_index), None)
+
+
+    def request_representative_frame(self, frame_index):
+        """Queue the shot for representative frame selection (shots of unknown end are skipped: their widget requests them again)."""
+        end_frame_index = self.shot_end_frame_indexes.get(frame_index, None)
+        if end_frame_index is None:
+            return
+        shot_range = (frame_index, end_frame_index)
+        if shot_range not in self._pending_selections:
+            self._pending_selections.append(shot_range)
+        self.start_representative_selection()
+
+
+    def start_representative_selection(self):
+        """Start selecting the representative frames of the first pending shot and of the pending shots shortly after it (one decoding pass)."""
+        if self._running_selector is not None or not self._pending_selections:
+            return
+
+        # Shots still in the lists are likely to be requested next: select them in the same pass if they are close enough
+        for pending_list in (self.priority_list, self.prefetch_list, self.queue):
+            for frame_index in pending_list:
+                end_frame_index = self.shot_end_frame_indexes.get(frame_index, None)
+                if end_frame_index is not None and (frame_index, end_frame_index) not in self.representative_frames and (frame_index, end_frame_index) not in self._pending_selections:
+                    self._pending_selections.append((frame_index, end_frame_index))
+
+        first_shot_range = self._pending_selections[0]
+        max_end_frame_index = max(first_shot_range[1], first_shot_range[0] + REPRESENTATIVE_BATCH_DURATION * self._video_info.fps)
+        batch = [first_shot_range] + [shot_range for shot_range in sorted(self._pending_selections)
+                                      if shot_range != first_shot_range and first_shot_range[0] <= shot_range[0] and shot_range[1] <= max_end_frame_index]
+        batch = batch[:REPRESENTATIVE_BATCH_MAX_SHOTS]
+        self._pending_selections = [shot_range for shot_range in self._pending_selections if shot_range not in batch]
+
+        self._running_selector = RepresentativeFrameSelector(self._video_info, batch)
+        self._running_selector._signals.frames_selected.connect(self.on_representative_frames_selected)
+        self.thread_pool.start(self._running_selector)
+
+
+    def on_representative_frames_selected(self, video_path, representative_frames):
+        self._running_selector = None
+        if not self._video_info or self._video_info.video_path != video_path:
+            return
+
+        self.representative_frames.update(representative_frames)
+        RepresentativeFrameSelector.save_cache(video_path, self.representative_frames)
+        for start_frame_index, _ in representative_frames:
+            if not self.has_thumbnail(start_frame_index) and start_frame_index not in self.priority_list:
+                self.priority_list.append(start_frame_index)  # Requested a moment ago
+
+        self.start_representative_selection()
+        self.process_queue()
+
+
+    def open_atlas(self):
+        """(Re)open the thumbnail atlas of the current video."""
+        self._atlas_dirty = False
+        if THUMBNAIL_ATLAS and self._video_info and self._video_info.video_path:
+            self.atlas.open(self._video_info, STORED_IMAGE_SIZE)
+        else:
+            self.atlas.close()
+
+
+    def compact_atlas(self, frame_indexes):
+        """Discard the atlas tiles of all frame indexes not in the given list, and reclaim their space if worth it."""
+        if self.atlas.is_open():
+            decoded_frame_indexes = [self.get_decoded_frame_index(frame_index) for frame_index in frame_indexes]
+            self.atlas.discard_all_but(list(frame_indexes) + [frame_index for frame_index in decoded_frame_indexes if frame_index is not None])
+            self.atlas.compact()
+        self._atlas_dirty = False
+
+
+    def mark_atlas_dirty(self):
+        """Called when shots are removed or moved. Their tiles are discarded by the next compact_atlas() (kept until then, so undoing doesn't decode them again)."""
+        self._atlas_dirty = True
+
+
+    def is_atlas_dirty(self):
+        return self._atlas_dirty
+
+
+    def set_zoom(self, num_img_per_row):
+        """Set the zoom level (number of images per row) of the thumbnails emitted from now on."""
+        self._zoom = num_img_per_row
+
+
+    def get_mipmap_zoom(self):
+        return self._zoom if THUMBNAIL_MIPMAPS else 0  # 0 = stored size
+
+
+    def set_edge_factor(self, edge_factor):
+        """Set the edge factor of the thumbnails emitted from now on (0 = colour, else drawn as lines from the stored colour images).
+        The "Lines" pixmaps of the previous edge factor are discarded: the spinbox passes through many values, each one a full board of pixmaps."""
+        previous_edge_factor = self._edge_factor
+        self._edge_factor = edge_factor
+        if previous_edge_factor != 0 and previous_edge_factor != edge_factor:
+            with QWriteLocker(self.lock):
+                self.mipmaps.discard_edge_factor(previous_edge_factor)
+
+
+    def get_edge_factor(self):
+        return self._edge_factor
+
+
+    def stop(self):
+        """Stops loading thumbnails and waits for the running tasks (they are owned by the manager: none may outlive the application)."""
+        self.queue.clear()
+        self.clear_priority_list()
+        self.clear_prefetch_list()
+        self._pending_selections.clear()
+        for loader in self.running_loaders.values():
+            loader.stop()
+        self.thread_pool.waitForDone()
+        self.scale_thread_pool.waitForDone()
 
 
     def clear(self):
@@ -178,20 +817,29 @@ class ThumbnailManager(QObject):
         self.safe_disconnect_from_loaders()
         with QWriteLocker(self.lock):
             self.running_tasks.clear()
+            self.running_scale_tasks.clear()
             self.thumbnails.clear()
+            self.mipmaps.clear()
         self.queue.clear()
         self.clear_priority_list()
+        self.clear_prefetch_list()
+        self._pending_selections.clear()
 
 
     def clear_priority_list(self):
         self.priority_list.clear()
 
 
+    def clear_prefetch_list(self):
+        self.prefetch_list.clear()
+
+
     def safe_disconnect_from_loaders(self):
         """Disconnect all shot widget slots"""
         try:
             self.disconnect(self.on_thumbnail_loaded)
             self.disconnect(self.on_loading_failed)
+            self.disconnect(self.on_mipmap_loaded)
         except TypeError:
             pass  # Already disconnected
 
@@ -230,11 +878,20 @@ class ThumbnailManager(QObject):
             self.priority_list.extend(unique_indexes)
 
 
-    def request_thumbnail(self, frame_index, priority):
+    def set_prefetch_list(self, frame_indexes):
+        """ Replace the prefetch list (ordered from nearest to farthest from the viewport) """
+        self.prefetch_list = [frame_index for frame_index in frame_indexes if not self.has_thumbnail(frame_index)]
+        self.process_queue()
+
+
+    def request_thumbnail(self, frame_index, priority, end_frame_index=None):
         """Adds a frame index to the queue if needed."""
-        # Already loaded? Respond immediately
+        if end_frame_index is not None:
+            self.set_shot_range(frame_index, end_frame_index)
+
+        # Already loaded? Respond immediately (or as soon as it's scaled)
         if self.has_thumbnail(frame_index):
-            self.thumbnail_loaded.emit(frame_index, self.get_thumbnail(frame_index))
+            self.deliver_thumbnail(frame_index)
             return
 
         # Else store the requested frame index and start processing the queue
@@ -248,48 +905,137 @@ class ThumbnailManager(QObject):
 
 
     def process_queue(self):
-        """Processes the priority list first, then the queue, and starts worker threads."""
+        """Processes the priority list first, then the prefetch list, then the queue, and starts worker threads."""
         if self.is_processing_queue:
             return
         self.is_processing_queue = True
 
-        while self.thread_pool.activeThreadCount() < self.thread_pool.maxThreadCount():
+        # Prefetch and background requests leave a few threads free for visible shot widgets
+        max_thread_count = self.thread_pool.maxThreadCount()
+        max_low_priority_thread_count = max(1, max_thread_count - PREFETCH_RESERVED_THREADS)
+
+        while self.thread_pool.activeThreadCount() < max_thread_count:
             if self.priority_list:
                 frame_index = self.priority_list.pop(0)  # Process priority first
-                self.queue.remove(frame_index)  # Remove from queue as well
+                if frame_index in self.queue:
+                    self.queue.remove(frame_index)  # Remove from queue as well
+            elif self.thread_pool.activeThreadCount() >= max_low_priority_thread_count:
+                break  # Keep the reserved threads for visible shot widgets
+            elif self.prefetch_list:
+                frame_index = self.prefetch_list.pop(0)  # Then prefetch ahead of the viewport
+                if frame_index in self.queue:
+                    self.queue.remove(frame_index)  # Remove from queue as well
             elif self.queue:
                 frame_index = self.queue.pop(0)  # Process normal queue
             else:
                 break  # Nothing left to process
 
             if self.has_thumbnail(frame_index):
-                self.thumbnail_loaded.emit(frame_index, self.get_thumbnail(frame_index))
+                self.deliver_thumbnail(frame_index)
                 continue
 
             with QReadLocker(self.lock):
                 if frame_index in self.running_tasks:
                     continue  # Skip if this frame is already being loaded
 
+            if self.get_decoded_frame_index(frame_index) is None:
+                self.request_representative_frame(frame_index)  # Queued again once chosen
+                continue
+
+            frame_indexes = self.take_gop_frame_indexes(frame_index)
             with QWriteLocker(self.lock):
-                self.running_tasks.add(frame_index)
-            loader = ThumbnailLoader(self._video_info, frame_index)
+                self.running_tasks.update(frame_indexes)
+            decoded_frame_indexes = {index: self.get_decoded_frame_index(index) for index in frame_indexes} if THUMBNAIL_REPRESENTATIVE_FRAMES else None
+            loader = ThumbnailLoader(self._video_info, frame_indexes, self.get_mipmap_zoom(), self.atlas if self.atlas.is_open() else None, decoded_frame_indexes)
             loader._signals.thumbnail_loaded.connect(self.on_thumbnail_loaded)
             loader._signals.thumbnail_failed.connect(self.on_loading_failed)
+            loader._signals.loader_finished.connect(self.on_loader_finished)
+            self.running_loaders[loader._signals] = loader  # Keep the runnable alive until it's done
             # print(f"activeThreadCount={self.thread_pool.activeThreadCount()}/{self.thread_pool.maxThreadCount() - 1}")
             self.thread_pool.start(loader)
             # assert len(self.running_tasks) == self.thread_pool.maxThreadCount() - self.thread_pool.activeThreadCount()
+
+        # The last loaders emit their signals just before their thread is released: retry shortly if work is left
+        if self.priority_list or self.prefetch_list or self.queue:
+            self._process_queue_timer.start(PROCESS_QUEUE_RETRY_DELAY_MS)
         self.is_processing_queue = False
 
 
-    def on_thumbnail_loaded(self, frame_index, pixmap):
-        """Store the loaded pixmap and emit a signal."""
+    def take_gop_frame_indexes(self, frame_index):
+        """Returns the frame index plus the pending frame indexes of the same GOP (removed from the lists), to be decoded together."""
+        if not THUMBNAIL_GOP_GROUPING or not self._video_info:
+            return [frame_index]
+        if not self.keyframe_index:
+            self.request_keyframe_index()
+            return [frame_index]
+
+        gop_index = self.keyframe_index.get_frame_gop_index(self._video_info, self.get_decoded_frame_index(frame_index))
+        first, end = self.keyframe_index.get_gop_frame_range(self._video_info, gop_index)
+        frame_indexes = [frame_index]
+        with QReadLocker(self.lock):
+            for pending_list in (self.priority_list, self.prefetch_list, self.queue):
+                for pending_frame_index in pending_list:
+                    if len(frame_indexes) >= THUMBNAIL_GOP_GROUP_MAX:
+                        break
+                    decoded_frame_index = self.get_decoded_frame_index(pending_frame_index)
+                    if decoded_frame_index is not None and first <= decoded_frame_index and (end is None or decoded_frame_index < end) and pending_frame_index not in frame_indexes \
+                            and pending_frame_index not in self.running_tasks and pending_frame_index not in self.thumbnails:
+                        frame_indexes.append(pending_frame_index)
+
+        for pending_list in (self.priority_list, self.prefetch_list, self.queue):
+            pending_list[:] = [pending_frame_index for pending_frame_index in pending_list if pending_frame_index not in frame_indexes]
+        return frame_indexes
+
+
+    def deliver_thumbnail(self, frame_index):
+        """Emit the thumbnail scaled for the current zoom level (and edge factor), or start scaling it in a worker thread."""
+        zoom = self.get_mipmap_zoom()
+        edge_factor = self._edge_factor
+        key = (frame_index, zoom, edge_factor)
+        with QWriteLocker(self.lock):  # The lookup refreshes the mipmap's rank in the cache
+            mipmap = self.mipmaps.get(key)
+            image = self.thumbnails.get(frame_index, None)
+            is_scaling = key in self.running_scale_tasks
+
+        if mipmap is not None:
+            self.thumbnail_loaded.emit(frame_index, mipmap)  # Ready-made pixmap
+        elif image is not None and not is_scaling:
+            scaler = ThumbnailScaler(frame_index, image, zoom, edge_factor)
+            scaler._signals.mipmap_loaded.connect(self.on_mipmap_loaded)
+            with QWriteLocker(self.lock):
+                self.running_scale_tasks[key] = scaler  # Keep the runnable alive until it's done
+            self.scale_thread_pool.start(scaler)
+
+
+    def on_thumbnail_loaded(self, frame_index, image, zoom, mipmap):
+        """Store the loaded image and its mipmap and emit a signal."""
         with QWriteLocker(self.lock):
-            self.thumbnails[frame_index] = pixmap
+            self.thumbnails[frame_index] = image
             self.running_tasks.discard(frame_index)
-        self.thumbnail_loaded.emit(frame_index, pixmap)
+        self.on_mipmap_loaded(frame_index, zoom, 0, mipmap)  # Loaders always scale the colour image
         self.process_queue()
 
 
+    def on_mipmap_loaded(self, frame_index, zoom, edge_factor, mipmap):
+        """Store the scaled image as a pixmap (GUI thread) and emit a signal if it matches the current zoom level and edge factor."""
+        pixmap = QPixmap.fromImage(mipmap)
+        with QWriteLocker(self.lock):
+            self.running_scale_tasks.pop((frame_index, zoom, edge_factor), None)
+            if frame_index not in self.thumbnails:
+                return  # Cleared in the meantime
+            if edge_factor == 0 or edge_factor == self._edge_factor:  # "Lines" pixmaps of a previous edge factor are not kept
+                self.mipmaps.put((frame_index, zoom, edge_factor), pixmap)
+
+        if zoom == self.get_mipmap_zoom() and edge_factor == self._edge_factor:
+            self.thumbnail_loaded.emit(frame_index, pixmap)
+        else:
+            self.deliver_thumbnail(frame_index)  # Zoom level or "Lines" mode changed while loading
+
+
+    def on_loader_finished(self):
+        self.running_loaders.pop(self.sender(), None)
+
+
     def on_loading_failed(self, frame_index):
         """Called when ffmpeg was unable to load the requested frame."""
         with QWriteLocker(self.lock):
@@ -304,7 +1050,7 @@ class ThumbnailManager(QObject):
 
 
     def get_thumbnail(self, frame_index):
-        """Returns the loaded QPixmap or None if not available."""
+        """Returns the loaded QImage (STORED_IMAGE_SIZE) or None if not available."""
         with QReadLocker(self.lock):
             return self.thumbnails.get(frame_index, None)
 
@@ -332,6 +1078,108 @@ class ThumbnailManager(QObject):
             return f"ThumbnailContainer({list(self.thumbnails.keys())})"
 
 
+##
+## THUMBNAIL PREFETCHER
+##
+
+
+class ThumbnailPrefetcher():
+    """Tracks the scroll direction and speed to request thumbnails ahead of the viewport."""
+
+    def __init__(self, thumbnail_manager):
+        self._thumbnail_manager = thumbnail_manager
+        self._scroll_timer = QElapsedTimer()
+        self.reset()
+
+
+    def reset(self):
+        """Forget the scroll history and the hit-rate metrics."""
+        self._scroll_timer.invalidate()
+        self._last_scroll_pos = None
+        self._velocity = 0.0  # in pixels per ms (signed: > 0 when scrolling down)
+        self._direction = 1  # 1 = down, -1 = up
+        self._visible_shot_widgets = set()
+        self._hit_count = 0  # Shot widgets whose thumbnail was already loaded when they became visible
+        self._miss_count = 0  # Shot widgets that were still empty when they became visible
+        self._thumbnail_manager.clear_prefetch_list()
+
+
+    def update(self, shot_widgets, first_visible_index, last_visible_index, scroll_pos, viewport_height):
+        """
+        Called whenever the scroll area moves.
+        shot_widgets is the ordered list of all shot widgets, first_visible_index and last_visible_index the range of visible ones.
+        """
+        self.update_velocity(scroll_pos)
+        if first_visible_index is None or viewport_height <= 0:
+            self._visible_shot_widgets = set()
+            self._thumbnail_manager.clear_prefetch_list()
+            return
+
+        # Count hits and misses for the shot widgets that just became visible
+        visible_shot_widgets = set(shot_widgets[first_visible_index : last_visible_index + 1])
+        for shot_widget in visible_shot_widgets - self._visible_shot_widgets:
+            if shot_widget.is_thumbnail_loaded():
+                self._hit_count += 1
+            else:
+                self._miss_count += 1
+        self._visible_shot_widgets = visible_shot_widgets
+
+        # Prefetch as many screens as the current scroll speed would bring into view, within limits
+        screens = PREFETCH_MIN_SCREENS + abs(self._velocity) * PREFETCH_LOOKAHEAD_MS / viewport_height
+        screens = min(PREFETCH_MAX_SCREENS, screens)
+        prefetch_count = math.ceil(screens * (last_visible_index - first_visible_index + 1))
+
+        if self._direction > 0:
+            prefetch_shot_widgets = shot_widgets[last_visible_index + 1 : last_visible_index + 1 + prefetch_count]
+        else:
+            prefetch_shot_widgets = shot_widgets[max(0, first_visible_index - prefetch_count) : first_visible_index][::-1]  # Nearest first
+
+        frame_indexes = []
+        for shot_widget in prefetch_shot_widgets:
+            if not shot_widget.is_thumbnail_loaded():
+                self._thumbnail_manager.set_shot_range(shot_widget.get_start_frame_index(), shot_widget.get_end_frame_index())
+                frame_indexes.append(shot_widget.get_start_frame_index())
+        self._thumbnail_manager.set_prefetch_list(frame_indexes)
+
+
+    def update_velocity(self, scroll_pos):
+        """Estimate the scroll speed (smoothed) and direction from successive scroll positions."""
+        if self._last_scroll_pos is None or not self._scroll_timer.isValid():
+            self._velocity = 0.0
+        else:
+            elapsed_ms = self._scroll_timer.elapsed()
+            delta = scroll_pos - self._last_scroll_pos
+            if elapsed_ms >= PREFETCH_IDLE_RESET_MS:
+                self._velocity = 0.0
+            elif elapsed_ms > 0:
+                velocity = delta / elapsed_ms
+                self._velocity = PREFETCH_VELOCITY_SMOOTHING * velocity + (1.0 - PREFETCH_VELOCITY_SMOOTHING) * self._velocity
+            if delta != 0:
+                self._direction = 1 if delta > 0 else -1
+
+        self._last_scroll_pos = scroll_pos
+        self._scroll_timer.start()
+
+
+    def get_velocity(self):
+        """Returns the smoothed scroll speed in pixels per second."""
+        return self._velocity * 1000
+
+
+    def get_hit_count(self):
+        return self._hit_count
+
+
+    def get_miss_count(self):
+        return self._miss_count
+
+
+    def get_hit_rate(self):
+        """Returns the ratio of shot widgets whose thumbnail was already loaded when they became visible."""
+        total = self._hit_count + self._miss_count
+        return self._hit_count / total if total > 0 else 0.0
+
+
 ##
 ## SHOT WIDGET
 ##
@@ -344,6 +1192,8 @@ class ShotWidget(QFrame):
 
     # Shared ThumbnailManager for all instances
     thumbnail_manager = ThumbnailManager()
+    preview_cache = PreviewClipCache()
+    standby_pool = StandbyDecoderPool()
 
     # Shared data
     volume = 0
@@ -538,7 +1388,7 @@ class ShotWidget(QFrame):
         self.stop_videoplayer()
         self._cursor_timer.start()  # Start tracking inactivity
 
-        self._videoplayer = VideoPlayer(self._video_info, self._start_frame_index, self._end_frame_index, ShotWidget.volume, ShotWidget.speed, ShotWidget.detect_edges, ShotWidget.edge_factor)
+        self._videoplayer = VideoPlayer(self._video_info, self._start_frame_index, self._end_frame_index, ShotWidget.volume, ShotWidget.speed, ShotWidget.detect_edges, ShotWidget.edge_factor, ShotWidget.preview_cache, ShotWidget.standby_pool, self.get_preview_size())  # Decoded at the label size
         if self._videoplayer:
             self._videoplayer.frame_loaded.connect(self.on_frame_loaded)
             self._videoplayer.start()  # Start the video rendering thread
@@ -551,6 +1401,27 @@ class ShotWidget(QFrame):
         self.hovered.emit(False)
 
 
+    def get_preview_size(self):
+        """Size the preview frames are decoded to fit in."""
+        label_size = self._image_label.maximumSize()
+        return label_size.width(), label_size.height()
+
+
+    def is_preview_cached(self):
+        """True if hovering the shot would start playing from the preview cache."""
+        key = PreviewClipCache.make_key(self._video_info, self._start_frame_index, self._end_frame_index, self.get_preview_size(), ShotWidget.detect_edges, ShotWidget.edge_factor)
+        return ShotWidget.preview_cache.contains(key)
+
+
+    def is_playing_preview(self):
+        return self._videoplayer is not None
+
+
+    def set_preview_volume(self, volume):
+        if self._videoplayer:
+            self._videoplayer.set_volume(volume)
+
+
     def stop_videoplayer(self):
         self._cursor_timer.stop()  # Stop hiding cursor
         self.setCursor(Qt.ArrowCursor)  # Ensure the cursor is visible
@@ -567,7 +1438,7 @@ class ShotWidget(QFrame):
     def request_thumbnail(self, priority):
         """Request a thumbnail from the shared ThumbnailManager."""
         if not self._thumbnail_loaded:
-            ShotWidget.thumbnail_manager.request_thumbnail(self._start_frame_index, priority)
+            ShotWidget.thumbnail_manager.request_thumbnail(self._start_frame_index, priority, self._end_frame_index)
 
 
     # Callback function called by VideoPlayer when a frame is ready to be displayed
@@ -576,7 +1447,7 @@ class ShotWidget(QFrame):
         assert self._videoplayer
         if not self._videoplayer._frame_queue.empty():
             try:
-                frame_index, image = self._videoplayer._frame_queue.get()  # Thread-safe
+                frame_index, image = self._videoplayer.take_frame()  # Thread-safe
                 self.update_frame(frame_index, QPixmap.fromImage(image))
             except queue.Empty:
                 print("Warning: Frame queue is empty. Skipping frame.")
@@ -587,8 +1458,10 @@ class ShotWidget(QFrame):
 
 
     def update_frame(self, frame_index, pixmap):
-        scaled_pixmap = pixmap.scaled(self._image_label.maximumWidth(), self._image_label.maximumHeight(), Qt.KeepAspectRatio, Qt.FastTransformation)  # /!\ Qt.SmoothTransformation stalls when ThreadPoll is running
-        self._image_label.setPixmap(scaled_pixmap)
+        label_size = self._image_label.maximumSize()
+        if pixmap.size().scaled(label_size, Qt.KeepAspectRatio) != pixmap.size():  # Mipmaps and preview frames already have the right size
+            pixmap = pixmap.scaled(label_size.width(), label_size.height(), Qt.KeepAspectRatio, Qt.FastTransformation)  # Fallback only (e.g. zoom changed while playing)
+        self._image_label.setPixmap(pixmap)
         self._image_label.update()  # IS THIS REALLY NECESSARY?
         self._thumbnail_loaded = True
         self.update_progress_bar(frame_index)
@@ -645,6 +1518,8 @@ class ShotWidgetManager(QObject):
     def set_video_info(self, video_info):
         self._video_info = video_info
         ShotWidget.thumbnail_manager.set_video_info(self._video_info)
+        ShotWidget.preview_cache.clear()
+        ShotWidget.standby_pool.clear()
 
 
     def get_shot_widget_size(self):
@@ -3,11 +3,13 @@ import subprocess
 import numpy as np
 import pyaudio
 from queue import Queue
+from collections import OrderedDict
 import os
 import sys
 from math import *
-from PyQt5.QtCore import QThread, pyqtSignal, QElapsedTimer, QMutex, QMutexLocker, QWaitCondition
-from PyQt5.QtGui import QImage
+import time
+from PyQt5.QtCore import Qt, QSize, QRect, QThread, pyqtSignal, QElapsedTimer, QMutex, QMutexLocker, QWaitCondition
+from PyQt5.QtGui import QImage, QPainter
 
 
 # Platform-specific settings
@@ -20,6 +22,250 @@ if sys.platform == "win32":
 
 
 MAX_VOLUME_FACTOR = 2.0
+PLAYER_SPEED_MIN = 0.5  # Slowest playback speed
+PLAYER_SPEED_MAX = 4.0  # Fastest playback speed (for skimming long films)
+PREVIEW_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Memory budget of the cached hover previews (least recently used clips are evicted first)
+PREVIEW_LOOP = True  # Hover previews restart from their first frame once they are entirely cached
+COMBINED_AUDIO_VIDEO = os.name == "posix"  # Previews decode video and audio with a single FFmpeg process (audio on a second output pipe)
+FRAME_RING_SIZE = 8  # Preallocated frame buffers of a video player: frame queue (5) + frame displayed + frame being decoded, and a spare
+STANDBY_DECODER_COUNT = 3 if (os.cpu_count() or 1) >= 8 else 0  # FFmpeg processes kept seeked to the shots near the mouse cursor (off on low-core machines)
+PLAYER_SCALER = "area"  # FFmpeg scaler used to decode the played frames at their display size (area is about as cheap as bilinear and averages the pixels it drops)
+PLAYER_YUV420P_PIPE = False  # Played frames cross the pipe as yuv420p (half the bytes of rgb24) and are converted by NumPy in the player thread
+
+
+def read_exactly_into(stream, buffer):
+    """Fills a writable buffer from a stream (a pipe may return less data than requested). Returns False on EOF."""
+    view = memoryview(buffer).cast('B')
+    total_bytes = len(view)
+    read_bytes = 0
+    while read_bytes < total_bytes:
+        n = stream.readinto(view[read_bytes:])
+        if not n:
+            return False
+        read_bytes += n
+    return True
+
+
+def read_rgb24_image(stream, width, height):
+    """Reads a raw rgb24 frame from a stream straight into the pixel buffer of a new QImage (None if incomplete)."""
+    image = QImage(width, height, QImage.Format_RGB888)
+    line_bytes = 3 * width
+    ptr = image.bits()
+    ptr.setsize(image.sizeInBytes())
+
+    if image.bytesPerLine() == line_bytes:
+        if not read_exactly_into(stream, memoryview(ptr)[:line_bytes * height]):
+            return None
+    else:
+        # Scanlines are 32-bit aligned: read the frame then copy it line by line
+        frame = bytearray(line_bytes * height)
+        if not read_exactly_into(stream, frame):
+            return None
+        pixels = np.frombuffer(ptr, np.uint8).reshape((height, image.bytesPerLine()))
+        pixels[:, :line_bytes] = np.frombuffer(frame, np.uint8).reshape((height, line_bytes))
+
+    return image
+
+
+def read_yuv420p_frame(stream, width, height):
+    """Reads a raw yuv420p frame from a stream into a new bytearray (None if incomplete)."""
+    chroma_width, chroma_height = (width + 1) // 2, (height + 1) // 2
+    frame = bytearray(width * height + 2 * chroma_width * chroma_height)
+    if not read_exactly_into(stream, frame):
+        return None
+    return frame
+
+
+def yuv420p_to_rgb24_image(frame, width, height):
+    """Converts a raw yuv420p frame (BT.601 limited range, FFmpeg's default) to a new QImage."""
+    image = QImage(width, height, QImage.Format_RGB888)
+    ptr = image.bits()
+    ptr.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(ptr, np.uint8).reshape((height, image.bytesPerLine()))[:, :3 * width].reshape((height, width, 3))
+    Yuv420pConverter(width, height).convert(frame, pixels)
+    return image
+
+
+class Yuv420pConverter():
+    """Converts raw yuv420p frames of a given size to rgb24 pixels (BT.601 limited range) with vectorized NumPy.
+    Fixed point int16 arithmetic in preallocated work buffers: no per-pixel Python and no allocation per frame."""
+    FRACTION_BITS = 5  # int16 headroom: (1.164 * 239 + 2.017 * 128) * 2**5 < 32767
+    Y_FACTOR = round(1.164 * (1 << FRACTION_BITS))
+    RV_FACTOR = round(1.596 * (1 << FRACTION_BITS))
+    GU_FACTOR = round(-0.392 * (1 << FRACTION_BITS))
+    GV_FACTOR = round(-0.813 * (1 << FRACTION_BITS))
+    BU_FACTOR = round(2.017 * (1 << FRACTION_BITS))
+
+    def __init__(self, width, height):
+        self._width = width
+        self._height = height
+        self._chroma_width, self._chroma_height = (width + 1) // 2, (height + 1) // 2
+        self._luma_size = width * height
+        self._chroma_size = self._chroma_width * self._chroma_height
+
+        # Luma is padded to even dimensions, so that chroma rows can be added to pairs of luma rows by broadcasting
+        self._luma = np.zeros((2 * self._chroma_height, 2 * self._chroma_width), dtype=np.int16)
+        self._channel = np.empty_like(self._luma)
+        self._u = np.empty((self._chroma_height, self._chroma_width), dtype=np.int16)
+        self._v = np.empty_like(self._u)
+        self._chroma = np.empty_like(self._u)
+        self._chroma2 = np.empty_like(self._u)
+        self._wide_chroma = np.empty((self._chroma_height, 2 * self._chroma_width), dtype=np.int16)  # Upsampled horizontally
+
+
+    def get_frame_size(self):
+        """Bytes of a raw yuv420p frame."""
+        return self._luma_size + 2 * self._chroma_size
+
+
+    def convert(self, frame, pixels):
+        """Writes the rgb24 conversion of a raw yuv420p frame into pixels (a (height, width, 3) uint8 array)."""
+        width, height = self._width, self._height
+        chroma_shape = (self._chroma_height, self._chroma_width)
+        data = np.frombuffer(frame, np.uint8)
+        y = data[:self._luma_size].reshape((height, width))
+        u = data[self._luma_size:self._luma_size + self._chroma_size].reshape(chroma_shape)
+        v = data[self._luma_size + self._chroma_size:self._luma_size + 2 * self._chroma_size].reshape(chroma_shape)
+
+        rounding = 1 << (Yuv420pConverter.FRACTION_BITS - 1)
+        np.multiply(y, Yuv420pConverter.Y_FACTOR, out=self._luma[:height, :width], dtype=np.int16)
+        np.add(self._luma, rounding - 16 * Yuv420pConverter.Y_FACTOR, out=self._luma)
+        np.subtract(u, 128, out=self._u, dtype=np.int16)
+        np.subtract(v, 128, out=self._v, dtype=np.int16)
+
+        row_pairs = self._luma.reshape((self._chroma_height, 2, 2 * self._chroma_width))
+        channel_row_pairs = self._channel.reshape(row_pairs.shape)
+        wide_chroma_pairs = self._wide_chroma.reshape((self._chroma_height, self._chroma_width, 2))
+        for channel_index in range(3):
+            if channel_index == 0:
+                np.multiply(self._v, Yuv420pConverter.RV_FACTOR, out=self._chroma)  # R = Y + 1.596 V
+            elif channel_index == 1:
+                np.multiply(self._u, Yuv420pConverter.GU_FACTOR, out=self._chroma)  # G = Y - 0.392 U - 0.813 V
+                np.multiply(self._v, Yuv420pConverter.GV_FACTOR, out=self._chroma2)
+                np.add(self._chroma, self._chroma2, out=self._chroma)
+            else:
+                np.multiply(self._u, Yuv420pConverter.BU_FACTOR, out=self._chroma)  # B = Y + 2.017 U
+            wide_chroma_pairs[:, :, 0] = self._chroma  # Upsample chroma (each sample covers 2x2 pixels)
+            wide_chroma_pairs[:, :, 1] = self._chroma
+            np.add(row_pairs, self._wide_chroma[:, None, :], out=channel_row_pairs)
+            np.right_shift(self._channel, Yuv420pConverter.FRACTION_BITS, out=self._channel)
+            np.clip(self._channel[:height, :width], 0, 255, out=pixels[:, :, channel_index], casting="unsafe")
+
+
+def scale_image_smooth(image, max_width, max_height):
+    """Returns the image smoothly scaled to fit in max_width x max_height (aspect ratio kept), by halving steps then a bilinear pass.
+    Safe in any thread: QImage.scaled(..., Qt.SmoothTransformation) splits large images over the global thread pool
+    and waits for it while holding the GIL, which deadlocks when the pool is busy running Python tasks."""
+    size = image.size().scaled(QSize(max_width, max_height), Qt.KeepAspectRatio)  # Same size as QImage.scaled()
+    width, height = max(1, size.width()), max(1, size.height())
+    if (width, height) == (image.width(), image.height()):
+        return image
+
+    while image.width() >= 2 * width and image.height() >= 2 * height:
+        image = draw_scaled_image(image, image.width() // 2, image.height() // 2)  # Averages 2x2 pixels
+    return draw_scaled_image(image, width, height)
+
+
+def draw_scaled_image(image, width, height):
+    scaled_image = QImage(width, height, QImage.Format_RGB888)
+    painter = QPainter(scaled_image)
+    painter.setRenderHint(QPainter.SmoothPixmapTransform)
+    painter.drawImage(QRect(0, 0, width, height), image)
+    painter.end()
+    return scaled_image
+
+
+def sobel_edge_image(image, edge_factor):
+    """Returns the image drawn as dark lines on white, like FFmpeg's "format=gray,sobel=scale=edge_factor,negate" filters (NumPy, any thread)."""
+    if image.format() != QImage.Format_RGB888:
+        image = image.convertToFormat(QImage.Format_RGB888)
+    width, height = image.width(), image.height()
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    pixels = np.frombuffer(ptr, np.uint8).reshape((height, image.bytesPerLine()))[:, :3 * width].reshape((height, width, 3))
+
+    gray = np.pad(pixels.astype(np.float32) @ np.array([0.299, 0.587, 0.114], np.float32), 1, mode="edge")
+    gx = (gray[:-2, 2:] + 2 * gray[1:-1, 2:] + gray[2:, 2:]) - (gray[:-2, :-2] + 2 * gray[1:-1, :-2] + gray[2:, :-2])
+    gy = (gray[2:, :-2] + 2 * gray[2:, 1:-1] + gray[2:, 2:]) - (gray[:-2, :-2] + 2 * gray[:-2, 1:-1] + gray[:-2, 2:])
+    edges = 255.0 - np.clip(np.sqrt(gx * gx + gy * gy) * edge_factor, 0, 255)
+
+    edge_image = QImage(width, height, QImage.Format_Grayscale8)
+    ptr = edge_image.bits()
+    ptr.setsize(edge_image.sizeInBytes())
+    np.frombuffer(ptr, np.uint8).reshape((height, edge_image.bytesPerLine()))[:, :width] = edges
+    return edge_image
+
+
+class FrameRing():
+    """Preallocated frame buffers that FFmpeg output is read into, each wrapped once by a QImage sharing its memory.
+    A slot stays reserved from acquire() to release(), so its QImage can cross threads without being overwritten.
+    pixel_format is the FFmpeg output: rgb24 and gray are displayed as is, yuv420p is converted by convert()."""
+    def __init__(self, width, height, pixel_format="rgb24", slot_count=FRAME_RING_SIZE):
+        self._width = width
+        self._height = height
+        self._pixel_format = pixel_format
+        self._converter = Yuv420pConverter(width, height) if pixel_format == "yuv420p" else None
+        self._buffers = []
+        self._pixels = []
+        self._images = []
+        self._free_slots = []
+        self._mutex = QMutex()
+        for _ in range(slot_count):
+            self._add_slot()
+
+
+    def _add_slot(self):
+        if self._pixel_format == "gray":
+            buffer = np.empty((self._height, self._width), dtype=np.uint8)
+            pixels = buffer
+            image = QImage(pixels.data, self._width, self._height, self._width, QImage.Format_Grayscale8)
+        else:
+            if self._converter:
+                buffer = np.empty(self._converter.get_frame_size(), dtype=np.uint8)
+                pixels = np.empty((self._height, self._width, 3), dtype=np.uint8)
+            else:
+                buffer = np.empty((self._height, self._width, 3), dtype=np.uint8)
+                pixels = buffer
+            image = QImage(pixels.data, self._width, self._height, 3 * self._width, QImage.Format_RGB888)
+        self._buffers.append(buffer)
+        self._pixels.append(pixels)  # Owns the memory of the QImage
+        self._images.append(image)
+        self._free_slots.append(len(self._buffers) - 1)
+
+
+    def acquire(self):
+        """Reserves a free slot (a new one is allocated if they're all in use)."""
+        with QMutexLocker(self._mutex):  # 🔒
+            if not self._free_slots:
+                self._add_slot()
+            return self._free_slots.pop()
+
+
+    def release(self, slot):
+        if slot is None:
+            return
+        with QMutexLocker(self._mutex):  # 🔒
+            if slot not in self._free_slots:
+                self._free_slots.append(slot)
+
+
+    def get_buffer(self, slot):
+        """Buffer the FFmpeg output is read into."""
+        return self._buffers[slot]
+
+
+    def convert(self, slot):
+        """Converts the buffer of a slot to the pixels of its QImage (nothing to do unless yuv420p)."""
+        if self._converter:
+            self._converter.convert(self._buffers[slot], self._pixels[slot])
+
+
+    def get_image(self, slot):
+        return self._images[slot]
+
+
+    def get_slot_count(self):
+        return len(self._buffers)
 
 
 #
@@ -41,6 +287,7 @@ class VideoInfo():
         self.frame_count = 0
         self.duration = 0  # in seconds
         self.seek_offset = 0.0  # in frames
+        self.has_audio = False
 
 
     def set_from_video(self, video_path, seek_offset = 0.0):
@@ -71,6 +318,18 @@ class VideoInfo():
         self.frame_count = frame_count
         self.duration = duration
         self.seek_offset = seek_offset
+        self.has_audio = any(stream['codec_type'] == 'audio' for stream in probe['streams'])
+
+
+    def fit_size(self, max_width, max_height):
+        """Returns the largest display size (PAR corrected) fitting in max_width x max_height while keeping the aspect ratio."""
+        if self.display_width <= 0 or self.frame_height <= 0:
+            return max_width, max_height
+
+        ratio = min(max_width / self.display_width, max_height / self.frame_height)
+        width = max(1, min(max_width, round(self.display_width * ratio)))
+        height = max(1, min(max_height, round(self.frame_height * ratio)))
+        return width, height
 
 
 #
@@ -78,28 +337,254 @@ class VideoInfo():
 #
 
 
-AUDIO_BUFFER_SIZE = 1024  # E.g. (44100 * 2 * 2) = 1 second of audio (44.1kHz, 16-bit stereo)
+AUDIO_SAMPLE_RATE = 44100  # Hz (16-bit stereo)
+AUDIO_CALLBACK_FRAMES = 1024  # Stereo samples PyAudio asks the callback for at once (23 ms)
+AUDIO_READ_SIZE = 16384  # Bytes read from FFmpeg at once (93 ms)
+AUDIO_RING_DURATION = 0.5  # Seconds of audio buffered between FFmpeg and the PyAudio callback (the GUI can stall this long without audio dropouts)
+AUDIO_CROSSFADE_MS = 50  # Fade between the audio of the previous and the next shot (stopped audio fades out instead of being cut)
+AUDIO_MIXER_IDLE_CHECK_MS = 250  # Interval at which the mixer removes the faded out sources and stops the stream once silent
+
+
+def make_atempo_filter(speed):
+    """FFmpeg audio filter changing the tempo without changing the pitch (one atempo takes factors from 0.5 to 2.0, so they're chained)."""
+    factors = []
+    while speed > 2.0:
+        factors.append(2.0)
+        speed /= 2.0
+    factors.append(speed)
+    return ",".join(f"atempo={factor:g}" for factor in factors)
+
+
+class AudioRingBuffer():
+    """Ring of int16 samples between one producer (the thread reading FFmpeg) and one consumer (the PyAudio callback).
+    Each position only grows and is only updated by its side, so neither side takes a lock."""
+    def __init__(self, sample_count):
+        self._samples = np.zeros(sample_count, dtype=np.int16)
+        self._write_pos = 0  # Total samples written (producer)
+        self._read_pos = 0  # Total samples read (consumer)
+        self.eof = False  # Set by the producer once FFmpeg has no more audio
+        self.underrun_count = 0  # Callbacks the producer couldn't keep up with
+
+
+    def get_fill_count(self):
+        return self._write_pos - self._read_pos
+
+
+    def get_free_count(self):
+        return len(self._samples) - self.get_fill_count()
+
+
+    def write(self, samples):
+        """Copies as many samples as fit and returns their count."""
+        count = min(len(samples), self.get_free_count())
+        start = self._write_pos % len(self._samples)
+        first_count = min(count, len(self._samples) - start)
+        self._samples[start:start + first_count] = samples[:first_count]
+        self._samples[:count - first_count] = samples[first_count:count]
+        self._write_pos += count
+        return count
+
+
+    def read_into(self, samples, expect_more=True):
+        """Fills samples with the oldest samples, or with silence for those missing (an underrun unless the audio has ended or no more is expected). Returns the count read."""
+        count = min(len(samples), self.get_fill_count())
+        start = self._read_pos % len(self._samples)
+        first_count = min(count, len(self._samples) - start)
+        samples[:first_count] = self._samples[start:start + first_count]
+        samples[first_count:count] = self._samples[:count - first_count]
+        samples[count:] = 0
+        self._read_pos += count
+        if count < len(samples) and expect_more and not self.eof:
+            self.underrun_count += 1
+        return count
+
+
+class AudioMixerSource():
+    """What the audio mixer's callback reads of an audio player: its ring, and a copy of its volume and pause state (set by the player).
+    The fade gain is only changed by the PyAudio callback."""
+    def __init__(self, player, ring, volume):
+        self.player = player  # Only used to stop it when the mixer is closed
+        self.ring = ring
+        self.volume = volume
+        self.paused = False
+        self.gain = 0.0  # Fades in from silence
+        self.fading_out = False
+        self.finished = False  # Faded out: removed by the mixer thread
+
+
+class AudioMixer(QThread):
+    """Long-lived owner of the PyAudio output stream. Its callback mixes the rings of the audio players (sources):
+    a new source fades in while the others fade out, and a stopped source fades out of what is left in its ring instead of being cut.
+    The thread starts and stops the stream (no callbacks while silent), and keeps the stopped audio players until they have finished on their own."""
+    shared = None  # Opened at startup on the GUI thread (audio players are created by the video player threads)
+
+
+    @staticmethod
+    def open_shared():
+        """Opens the audio output. Without a usable output device, the mixer stays None and the videos play without audio."""
+        if AudioMixer.shared is None:
+            try:
+                mixer = AudioMixer()
+            except OSError as e:  # PyAudio errors (no device, device busy...)
+                print(f"Error: Cannot open the audio output, playing without audio: {e}")
+                return
+            AudioMixer.shared = mixer
+            mixer.start()
 
 
-class AudioPlayer(QThread):
-    """Plays audio in a separate thread using PyAudio."""
-    audio = None
-    audio_stream = None
+    @staticmethod
+    def get_shared():
+        return AudioMixer.shared
+
+
+    @staticmethod
+    def close_shared():
+        if AudioMixer.shared is not None:
+            AudioMixer.shared.stop()
+            AudioMixer.shared = None
 
-    def __init__(self, video_info, start_pos, volume, speed, parent=None):
-        super().__init__(parent)
 
-        if AudioPlayer.audio is None:
-            AudioPlayer.audio = pyaudio.PyAudio()
-        if AudioPlayer.audio_stream is None:
-            AudioPlayer.audio_stream = AudioPlayer.audio.open(
-                format=pyaudio.paInt16, channels=2, rate=44100, output=True, frames_per_buffer=AUDIO_BUFFER_SIZE
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._audio = pyaudio.PyAudio()
+        try:
+            self._stream = self._audio.open(
+                format=pyaudio.paInt16, channels=2, rate=AUDIO_SAMPLE_RATE, output=True, frames_per_buffer=AUDIO_CALLBACK_FRAMES,
+                stream_callback=self.stream_callback, start=False  # Started while a source plays
             )
+        except OSError:
+            self._audio.terminate()
+            raise
+        self._sources = ()  # Replaced as a whole (the callback reads it without locking)
+        self._retired_players = []  # Stopped audio players, kept until their thread has finished
+        self._running = True
+        self._mutex = QMutex()
+        self._condition = QWaitCondition()
+        self._underrun_count = 0  # Total underruns of the sources (only updated by the callback)
+
+        # Buffers of the callback (only reallocated if PyAudio changes the frame count)
+        self._samples = np.zeros(0, dtype=np.int16)
+        self._mix = np.zeros(0, dtype=np.float32)
+        self._scratch = np.zeros(0, dtype=np.float32)
+        self._ramp = np.zeros(0, dtype=np.float32)
+        self._ramp_base = np.zeros(0, dtype=np.float32)
+        self._output = memoryview(self._samples).cast('B').toreadonly()  # Returned to PyAudio, which copies it
+
+
+    def add_source(self, source):
+        """Crossfades from the playing sources to the new source.
+        Paused sources are silent and kept as they are, to be heard again once resumed (the main video player is paused while a shot is previewed)."""
+        with QMutexLocker(self._mutex):  # 🔒
+            for other_source in self._sources:
+                if not other_source.paused:
+                    self.fade_out(other_source)
+            self._sources += (source,)
+            if not self._stream.is_active():
+                if not self._stream.is_stopped():
+                    self._stream.stop_stream()
+                self._stream.start_stream()
+            self._condition.wakeAll()
+
 
+    def fade_out(self, source):
+        source.fading_out = True  # No longer fed: an empty ring isn't an underrun
+
+
+    def get_underrun_count(self):
+        return self._underrun_count
+
+
+    def retire(self, player):
+        """Keeps a stopped audio player alive until its thread has finished (its FFmpeg process is torn down by its own thread, not the caller's)."""
+        with QMutexLocker(self._mutex):  # 🔒
+            self._retired_players = [retired_player for retired_player in self._retired_players if not retired_player.isFinished()]
+            if player not in self._retired_players:
+                self._retired_players.append(player)
+
+
+    def run(self):
+        with QMutexLocker(self._mutex):  # 🔒
+            while self._running:
+                self._sources = tuple(source for source in self._sources if not source.finished)
+                if not self._sources and self._stream.is_active():
+                    self._stream.stop_stream()  # The callback doesn't lock the mutex
+                if self._stream.is_active():
+                    self._condition.wait(self._mutex, AUDIO_MIXER_IDLE_CHECK_MS)
+                else:
+                    self._condition.wait(self._mutex)
+
+
+    def stop(self):
+        with QMutexLocker(self._mutex):  # 🔒
+            self._running = False
+            self._condition.wakeAll()
+            retired_players = self._retired_players + [source.player for source in self._sources]
+        self.wait()
+        for player in retired_players:
+            player.stop()
+            player.wait()
+        self._stream.stop_stream()
+        self._stream.close()
+        self._audio.terminate()
+
+
+    def stream_callback(self, in_data, frame_count, time_info, status):
+        """Called by PyAudio (on its own thread) for the next frame_count stereo samples: sum of the sources, each scaled by its fade gain and volume, saturated."""
+        if len(self._samples) != 2 * frame_count:
+            self._samples = np.zeros(2 * frame_count, dtype=np.int16)
+            self._mix = np.zeros(2 * frame_count, dtype=np.float32)
+            self._scratch = np.zeros(2 * frame_count, dtype=np.float32)
+            self._ramp = np.zeros(frame_count, dtype=np.float32)
+            self._ramp_base = np.arange(1, frame_count + 1, dtype=np.float32) / frame_count
+            self._output = memoryview(self._samples).cast('B').toreadonly()
+        gain_step = frame_count * 1000 / (AUDIO_SAMPLE_RATE * AUDIO_CROSSFADE_MS)  # Gain change over the callback
+
+        self._mix.fill(0)
+        for source in self._sources:
+            if source.finished or (source.paused and not source.fading_out):
+                continue
+            target_gain = 0.0 if source.fading_out else 1.0
+            end_gain = max(source.gain - gain_step, target_gain) if source.fading_out else min(source.gain + gain_step, target_gain)
+            underrun_count = source.ring.underrun_count
+            source.ring.read_into(self._samples, not source.fading_out)
+            self._underrun_count += source.ring.underrun_count - underrun_count
+
+            # Linear fade from the previous gain (all 1.0 once faded in), times the volume
+            np.multiply(self._ramp_base, end_gain - source.gain, out=self._ramp)
+            self._ramp += source.gain
+            self._ramp *= source.volume
+            np.multiply(self._samples.reshape(frame_count, 2), self._ramp[:, None], out=self._scratch.reshape(frame_count, 2))
+            self._mix += self._scratch
+
+            source.gain = end_gain
+            if source.fading_out and end_gain == 0.0:
+                source.finished = True
+                self._condition.wakeAll()
+
+        np.clip(self._mix, -32768, 32767, out=self._mix)  # Saturate instead of wrapping around
+        np.copyto(self._samples, self._mix, casting="unsafe")
+        return self._output, pyaudio.paContinue
+
+
+class AudioPlayer(QThread):
+    """Plays audio in a separate thread: reads FFmpeg in large chunks into a ring buffer, which the audio mixer plays."""
+
+    def __init__(self, video_info, start_pos, volume, speed, pcm_pipe=None, pcm_samples=None, record_sample_count=0, parent=None):
+        super().__init__(parent)
+
+        self._mixer = AudioMixer.get_shared()  # None if the audio output couldn't be opened (the samples are then dropped)
+        self._ring = AudioRingBuffer(2 * round(AUDIO_SAMPLE_RATE * AUDIO_RING_DURATION))
+        self._mixer_source = AudioMixerSource(self, self._ring, 0.0)
+        self._mixing = False  # The source is added to the mixer once the ring has samples
         self._video_info = video_info
         self._start_pos = start_pos
         self.set_volume(volume)  # Ensure valid range
         self._speed = speed
+        self._process = None
+        self._pcm_pipe = pcm_pipe  # PCM output of the video player's FFmpeg process (None = start our own)
+        self._pcm_samples = pcm_samples  # Samples played from memory instead of FFmpeg (cached preview)
+        self._recording = np.empty(record_sample_count, dtype=np.int16) if record_sample_count else None  # First samples read, kept for the preview cache
+        self._recorded_count = 0
 
         self._running = True
         self._paused = False
@@ -116,6 +601,7 @@ class AudioPlayer(QThread):
             if not self._running:
                 return
 
+        if self._pcm_pipe is None and self._pcm_samples is None:
             # self._process = (
             #     ffmpeg
             #     .input(self._video_info.video_path, ss=self._start_pos)
@@ -129,64 +615,122 @@ class AudioPlayer(QThread):
                 "-loglevel", "quiet",  # Suppress all FFmpeg logging
                 "-ss", str(self._start_pos),  # Fast seek to the start position
                 "-i", self._video_info.video_path,  # Input file
+                "-af", make_atempo_filter(self._speed),  # Playback speed (pitch unchanged)
                 "-f", "s16le",  # Output format (16-bit signed little-endian PCM)
                 "-acodec", "pcm_s16le",  # Audio codec
                 "-ac", "2",  # Number of audio channels (stereo)
-                "-ar", "44100",  # Audio sample rate (44.1 kHz)
+                "-ar", str(AUDIO_SAMPLE_RATE),  # Audio sample rate (44.1 kHz)
                 "-"  # Output to pipe
             ]
 
             # Run FFmpeg without showing a console window
-            self._process = subprocess.Popen(
-                ffmpeg_cmd,
-                stdout=subprocess.PIPE,  # Capture stdout
-                stderr=subprocess.DEVNULL,  # Discard stderr
-                **FFMPEG_NOWINDOW_KWARGS
-            )
+            with QMutexLocker(self._process_mutex):  # 🔒
+                if not self._running:
+                    return
+                self._process = subprocess.Popen(
+                    ffmpeg_cmd,
+                    stdout=subprocess.PIPE,  # Capture stdout
+                    stderr=subprocess.DEVNULL,  # Discard stderr
+                    **FFMPEG_NOWINDOW_KWARGS
+                )
+                self._pcm_pipe = self._process.stdout
 
         self._master_clock_timer.start()
 
+        chunk = np.empty(AUDIO_READ_SIZE // 2, dtype=np.int16)
+        chunk_view = memoryview(chunk).cast('B')
+        position = 0  # Next sample of self._pcm_samples
         while self._running:
-            with QMutexLocker(self._pause_mutex):  # 🔒
-                if self._paused:
-                    pause_time_ms = self._master_clock_timer.elapsed()
-                    self._pause_condition.wait(self._pause_mutex)
-                    self._pause_duration_ms += self._master_clock_timer.elapsed() - pause_time_ms
+            self.wait_if_paused()
 
-            with QMutexLocker(self._process_mutex):  # 🔒
-                if not self._running or self._process.poll() is not None:
-                    break
-                try:
-                    audio_bytes = self._process.stdout.read(AUDIO_BUFFER_SIZE)
-                    if not audio_bytes:
-                        raise RuntimeError("Error: No audio data received from FFmpeg.")
-                except (OSError, ValueError) as e:
-                    print(f"Error reading audio data: {e}")
-                    audio_bytes = None
+            if self._pcm_samples is not None:
+                samples = self._pcm_samples[position:position + len(chunk)]
+                position += len(samples)
+                if not len(samples):
+                    break  # End of the cached samples
+            else:
+                with QMutexLocker(self._process_mutex):  # 🔒
+                    if not self._running or (self._process is not None and self._process.poll() is not None):
+                        break
+                    try:
+                        byte_count = self._pcm_pipe.readinto1(chunk_view)  # What the pipe has (up to AUDIO_READ_SIZE), without waiting for more
+                        if not byte_count:
+                            break  # End of the audio stream, or FFmpeg stopped by the video player sharing it
+                        if byte_count % 2:  # Half a sample
+                            if not read_exactly_into(self._pcm_pipe, chunk_view[byte_count:byte_count + 1]):
+                                break
+                            byte_count += 1
+                    except (OSError, ValueError) as e:
+                        print(f"Error reading audio data: {e}")
+                        break
+                samples = chunk[:byte_count // 2]
+                self.record(samples)
+
+            # Queue the samples for the callback, waiting for room in the ring (it is emptied in real time)
+            while self._running:
+                samples = samples[self._ring.write(samples):]
+                if self._mixer_source.finished:
+                    break  # Faded out by a newer source: drop the samples rather than stall FFmpeg (and the video sharing its process)
+                if not self._mixing and self._ring.get_fill_count() >= 4 * AUDIO_CALLBACK_FRAMES:  # Primed with 2 callbacks (FFmpeg may start with small chunks)
+                    self.add_to_mixer()
+                if not len(samples):
                     break
+                self.msleep(AUDIO_CALLBACK_FRAMES * 1000 // AUDIO_SAMPLE_RATE)
+                self.wait_if_paused()
 
-            try:
-                # Apply a linear volume factor
-                audio_samples = ((np.frombuffer(audio_bytes, dtype=np.int16) * self._volume).astype(np.int16))
-                
-                # Write the adjusted audio data to the stream
-                self.audio_stream.write(audio_samples.tobytes())
-            except (OSError) as e:
-                print(f"Error playing audio data: {e}")
-                break
+        # Let the mixer play what is left
+        self._ring.eof = True
+        if self._running and not self._mixing and self._ring.get_fill_count():
+            self.add_to_mixer()
+        while self._running and self._ring.get_fill_count() and not self._mixer_source.finished:
+            self.msleep(AUDIO_CALLBACK_FRAMES * 1000 // AUDIO_SAMPLE_RATE)
+            self.wait_if_paused()
 
         self.cleanup()
 
 
+    def wait_if_paused(self):
+        with QMutexLocker(self._pause_mutex):  # 🔒
+            if self._paused:
+                pause_time_ms = self._master_clock_timer.elapsed()
+                self._pause_condition.wait(self._pause_mutex)
+                self._pause_duration_ms += self._master_clock_timer.elapsed() - pause_time_ms
+
+
+    def record(self, samples):
+        """Keeps a copy of the first samples read, up to record_sample_count (the whole audio of a preview, cached to be replayed without FFmpeg)."""
+        if self._recording is not None and self._recorded_count < len(self._recording):
+            count = min(len(samples), len(self._recording) - self._recorded_count)
+            self._recording[self._recorded_count:self._recorded_count + count] = samples[:count]
+            self._recorded_count += count
+
+
+    def get_recorded_samples(self):
+        """Returns the recorded samples once all of them have been read (they no longer change), else None."""
+        if self._recording is None or self._recorded_count < len(self._recording):
+            return None
+        return self._recording
+
+
+    def add_to_mixer(self):
+        self._mixing = True
+        if self._mixer is not None:
+            self._mixer.add_source(self._mixer_source)
+        else:
+            self._mixer_source.finished = True  # Nothing plays the ring
+
+
+    def get_underrun_count(self):
+        return self._ring.underrun_count
+
+
     def cleanup(self):
         self._running = False
+        self.fade_out()
         with QMutexLocker(self._process_mutex):  # 🔒
-            # if AudioPlayer.audio_stream:
-            #     AudioPlayer.audio_stream.stop_stream()
-            #     AudioPlayer.audio_stream.close()
-            #     AudioPlayer.audio.terminate()
-            if hasattr(self, '_process'):
-                self._process.stdout.close()
+            if self._pcm_pipe is not None:
+                self._pcm_pipe.close()
+            if self._process is not None:
                 self._process.terminate()  # kill
                 self._process.wait()
 
@@ -194,6 +738,7 @@ class AudioPlayer(QThread):
     def set_volume(self, volume):
         """Dynamically change the audio volume."""
         self._volume = max(0.0, min(MAX_VOLUME_FACTOR, volume))  # Limit volume between 0% and 100% of MAX_VOLUME_FACTOR
+        self._mixer_source.volume = self._volume
 
 
     def get_volume(self):
@@ -201,37 +746,274 @@ class AudioPlayer(QThread):
 
 
     def get_elapsed_time_ms(self):
-        """Returns the elapsed playback time in seconds since the beginning of the audio stream rendition."""
+        """Returns the elapsed media time in ms since the beginning of the audio stream rendition (real time scaled by the speed)."""
         elapsed_time = self._master_clock_timer.elapsed() - self._pause_duration_ms  # in ms
-        return elapsed_time
+        return elapsed_time * self._speed
 
 
     def pause(self):
         """Pauses audio playback."""
         with QMutexLocker(self._pause_mutex):
             self._paused = True
+            self._mixer_source.paused = True
 
 
     def resume(self):
         """Resumes audio playback."""
         with QMutexLocker(self._pause_mutex):
             self._paused = False
+            self._mixer_source.paused = False
             self._pause_condition.wakeAll()  # Resume the thread
 
 
     def stop(self):
-        """Stops audio playback."""
-        with QMutexLocker(self._process_mutex):
-            self._running = False
+        """Stops audio playback without waiting: the audio fades out, and the thread tears its FFmpeg process down and finishes on its own (kept alive by the mixer)."""
+        self._running = False  # Not under the process mutex: the thread may hold it while blocked on the pipe
 
         with QMutexLocker(self._pause_mutex):
             self._paused = False
+            self._mixer_source.paused = False
             self._pause_condition.wakeAll()
 
-        self.cleanup()
+        self.fade_out()
+        process = self._process
+        if process is not None:
+            process.kill()  # The pending read returns
+        if self._mixer is not None:
+            self._mixer.retire(self)
+        else:
+            self.wait()  # Nothing keeps the thread alive (it finishes at once once its process is killed)
+
+
+    def fade_out(self):
+        if self._mixer is not None:
+            self._mixer.fade_out(self._mixer_source)
+
+
+#
+# PREVIEW CLIP CACHE
+#
+
+
+class PreviewClipCache():
+    """Frames of recently played previews, already scaled to their label, so that hovering a shot again doesn't decode it.
+    Complete previews also keep their audio samples (for the speed they were played at), replayed without FFmpeg."""
+    def __init__(self, max_bytes=PREVIEW_CACHE_MAX_BYTES):
+        self._max_bytes = max_bytes
+        self._clips = OrderedDict()  # key -> (images, complete, (speed, samples) or None), least recently used first
+        self._byte_count = 0
+        self._mutex = QMutex()
+        self._first_frame_timings = {True: [0, 0.0], False: [0, 0.0]}  # cached -> [count, total ms]
+
+
+    @staticmethod
+    def make_key(video_info, start_frame_index, end_frame_index, target_size, detect_edges, edge_factor):
+        return (video_info.video_path, video_info.seek_offset, start_frame_index, end_frame_index, target_size, detect_edges, edge_factor)
+
+
+    def contains(self, key):
+        with QMutexLocker(self._mutex):  # 🔒
+            return key in self._clips
+
+
+    def get(self, key):
+        """Returns (images, complete) for a clip key, ([], False) if it isn't cached."""
+        with QMutexLocker(self._mutex):  # 🔒
+            clip = self._clips.get(key)
+            if clip is None:
+                return [], False
+            self._clips.move_to_end(key)
+            return list(clip[0]), clip[1]
+
+
+    def get_audio(self, key, speed):
+        """Returns the audio samples of a complete clip played at the given speed, or None."""
+        with QMutexLocker(self._mutex):  # 🔒
+            clip = self._clips.get(key)
+            if clip is None or clip[2] is None or clip[2][0] != speed:
+                return None
+            return clip[2][1]
+
+
+    def put(self, key, images, complete, audio=None):
+        """Stores the first frames of a clip (all of them if complete, with its (speed, audio samples) if any), then evicts clips until the cache fits in its budget."""
+        clip = (list(images), complete, audio if complete else None)
+        byte_count = PreviewClipCache.get_clip_bytes(clip)
+        with QMutexLocker(self._mutex):  # 🔒
+            self._remove(key)
+            if byte_count > self._max_bytes:
+                return
+            self._clips[key] = clip
+            self._byte_count += byte_count
+            while self._byte_count > self._max_bytes:
+                self._remove(next(iter(self._clips)))
+
+
+    @staticmethod
+    def get_clip_bytes(clip):
+        images, _, audio = clip
+        return sum(image.sizeInBytes() for image in images) + (audio[1].nbytes if audio is not None else 0)
+
+
+    def _remove(self, key):
+        clip = self._clips.pop(key, None)
+        if clip is not None:
+            self._byte_count -= PreviewClipCache.get_clip_bytes(clip)
+
+
+    def clear(self):
+        with QMutexLocker(self._mutex):  # 🔒
+            self._clips.clear()
+            self._byte_count = 0
+
+
+    def get_byte_count(self):
+        return self._byte_count
+
+
+    def get_max_bytes(self):
+        return self._max_bytes
+
+
+    def add_first_frame_timing(self, cached, elapsed_ms):
+        """Records the time between the creation of a video player and its first frame."""
+        with QMutexLocker(self._mutex):  # 🔒
+            timing = self._first_frame_timings[cached]
+            timing[0] += 1
+            timing[1] += elapsed_ms
+
+
+    def get_first_frame_count(self, cached):
+        return self._first_frame_timings[cached][0]
+
+
+    def get_mean_first_frame_ms(self, cached):
+        """Mean time to first frame of the previews that started from the cache (cached=True) or from FFmpeg."""
+        count, total_ms = self._first_frame_timings[cached]
+        return total_ms / count if count else 0.0
+
+
+#
+# STANDBY DECODERS
+#
+
+
+class ProcessReaper(QThread):
+    """Waits for killed processes in the background, so that the thread killing them (the GUI thread) doesn't block."""
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._processes = []
+        self._running = False
+        self._mutex = QMutex()
+        self._condition = QWaitCondition()
+
+
+    def reap(self, process):
+        with QMutexLocker(self._mutex):  # 🔒
+            self._processes.append(process)
+            if not self._running:
+                self._running = True
+                self.start()
+            self._condition.wakeAll()
+
+
+    def run(self):
+        while True:
+            with QMutexLocker(self._mutex):  # 🔒
+                while self._running and not self._processes:
+                    self._condition.wait(self._mutex)
+                if not self._processes:
+                    return  # Stopped
+                process = self._processes.pop()
+            process.wait()
+
+
+    def stop(self):
+        """Waits for the processes left, then for the thread."""
+        with QMutexLocker(self._mutex):  # 🔒
+            self._running = False
+            self._condition.wakeAll()
         self.wait()
 
 
+class StandbyDecoderPool():
+    """FFmpeg processes started ahead of time at the first frame of the shots likely to be hovered next.
+    They seek and decode their first frames, then block on their full stdout pipe until a video player reads it."""
+    def __init__(self, max_count=STANDBY_DECODER_COUNT):
+        self._max_count = max_count
+        self._processes = {}  # key -> (FFmpeg process, PCM audio pipe or None)
+        self._reaper = ProcessReaper()  # Waits for the killed processes
+        self._mutex = QMutex()
+        self._hit_count = 0
+        self._miss_count = 0
+
+
+    @staticmethod
+    def make_key(video_info, start_frame_index, end_frame_index, decode_size, speed, detect_edges, edge_factor, with_audio):
+        return (video_info.video_path, video_info.seek_offset, start_frame_index, end_frame_index, decode_size, speed, detect_edges, edge_factor, with_audio)
+
+
+    def is_enabled(self):
+        return self._max_count > 0
+
+
+    def prepare(self, video_info, shot_ranges, target_size, speed, detect_edges, edge_factor, volume):
+        """Keeps a process for each (start, end) shot range (most likely first, within the pool size) and recycles the others.
+        The processes only decode the audio if the previews will play it (volume > 0)."""
+        decode_size = VideoPlayer.get_decode_size(video_info, target_size)
+        speed = VideoPlayer.clamp_speed(speed)
+        with_audio = VideoPlayer.can_combine_audio(video_info) and VideoPlayer.needs_audio(video_info, volume)
+        keys = [StandbyDecoderPool.make_key(video_info, start, end, decode_size, speed, detect_edges, edge_factor, with_audio) for start, end in shot_ranges[:self._max_count]]
+        with QMutexLocker(self._mutex):  # 🔒
+            for key in [key for key in self._processes if key not in keys]:
+                self._kill(self._processes.pop(key))
+            for key, (start, end) in zip(keys, shot_ranges):
+                if key not in self._processes:
+                    self._processes[key] = VideoPlayer.start_ffmpeg(video_info, start, end, decode_size, detect_edges, edge_factor, with_audio, speed)
+
+
+    def take(self, key):
+        """Hands over the (process, audio pipe) prepared for a key ((None, None) if there isn't a live one)."""
+        with QMutexLocker(self._mutex):  # 🔒
+            process, audio_pipe = self._processes.pop(key, (None, None))
+            if process is not None and process.poll() is not None:
+                self._kill((process, audio_pipe))
+                process, audio_pipe = None, None
+            if process is not None:
+                self._hit_count += 1
+            else:
+                self._miss_count += 1
+            return process, audio_pipe
+
+
+    def clear(self):
+        with QMutexLocker(self._mutex):  # 🔒
+            for decoder in self._processes.values():
+                self._kill(decoder)
+            self._processes.clear()
+
+
+    def close(self):
+        """Kills the processes and waits for them (when the application quits)."""
+        self.clear()
+        self._reaper.stop()
+
+
+    def get_hit_rate(self):
+        total = self._hit_count + self._miss_count
+        return self._hit_count / total if total else 0.0
+
+
+    def _kill(self, decoder):
+        """Kills a process without waiting for it (the reaper thread does)."""
+        process, audio_pipe = decoder
+        process.kill()
+        process.stdout.close()
+        if audio_pipe is not None:
+            audio_pipe.close()
+        self._reaper.reap(process)
+
+
 #
 # VIDEO PLAYER
 #
@@ -239,17 +1021,22 @@ class AudioPlayer(QThread):
 
 class VideoPlayer(QThread):
     frame_loaded = pyqtSignal()  # Signal to send frames to the UI
+    retired_players = []  # Stopped players, kept alive until their thread has finished (GUI thread only)
 
-    def __init__(self, video_info, start_frame_index, end_frame_index, volume, speed, detect_edges, edge_factor, parent=None):
+    def __init__(self, video_info, start_frame_index, end_frame_index, volume, speed, detect_edges, edge_factor, preview_cache=None, standby_pool=None, target_size=None, parent=None):
         super().__init__(parent)
-        self._audio_thread = None  # Store reference to audio thread
+        self._creation_time = time.perf_counter()  # Time to first frame
+        self._audio_thread = None  # Store reference to audio thread (None while muted: the internal clock paces the frames)
+        self._audio_clock_offset_ms = 0  # Media time (since the start frame) at which the audio thread started
+        self._internal_clock_timer = QElapsedTimer()  # Master clock without audio
+        self._internal_clock_pause_ms = 0
 
         self._video_info = video_info
-        self._frame_size = (video_info.frame_height, video_info.display_width, 3)
         self._start_frame_index = start_frame_index
         self._end_frame_index = end_frame_index
         self.set_volume(volume)  # Ensure valid range
-        self._speed = max(0.5, min(2.0, speed))  # Limit to [0.5x, 2.0x]
+        self._speed = VideoPlayer.clamp_speed(speed)
+        self._frame_step = VideoPlayer.get_frame_step(self._speed)  # Frames advanced per displayed frame (FFmpeg skips the others)
         self._detect_edges = detect_edges
         self._edge_factor = edge_factor
 
@@ -259,7 +1046,16 @@ class VideoPlayer(QThread):
         self._pause_mutex = QMutex()
         self._pause_condition = QWaitCondition()
 
-        self._frame_queue = Queue(maxsize=5)  # Thread-safe queue
+        self._frame_queue = Queue(maxsize=5)  # Thread-safe queue of (frame index, image, ring slot or None if the image owns its memory)
+        self._decode_size = VideoPlayer.get_decode_size(video_info, target_size)  # (width, height) FFmpeg scales the frames to (None = full size)
+        self._frame_ring = FrameRing(*(self._decode_size or (video_info.display_width, video_info.frame_height)), VideoPlayer.get_pixel_format(detect_edges))  # Decoded frames (FFmpeg corrects the pixel aspect ratio)
+        self._taken_slot = None  # Ring slot of the frame last returned by take_frame()
+        self._target_size = None  # (width, height) the frames are scaled to fit in, in this thread (None = decoded size)
+        self._target_size_mutex = QMutex()
+        if target_size is not None:
+            self.set_target_size(*target_size)
+        self._preview_cache = preview_cache  # PreviewClipCache (frames are only cached when they are scaled to a target size)
+        self._standby_pool = standby_pool  # StandbyDecoderPool that may already have started FFmpeg for this shot
 
 
     def run(self):
@@ -269,7 +1065,15 @@ class VideoPlayer(QThread):
 
         assert self._video_info.fps > 0
         START_POS = max(0, (self._start_frame_index + self._video_info.seek_offset) / self._video_info.fps)  # frame position in seconds
-        FRAME_BYTES = np.prod(self._frame_size)  # shortcut for: w * h *ch
+
+        # Frames cached by a previous preview of the shot are played first, FFmpeg decodes the rest
+        cache_key = self.get_preview_cache_key()
+        images, _ = self._preview_cache.get(cache_key) if cache_key else ([], False)
+        cached_audio = self._preview_cache.get_audio(cache_key, self._speed) if cache_key else None
+        audio_samples = cached_audio  # Whole audio of the shot once known (played from memory, without FFmpeg)
+        cached_frame_count = len(images)
+        image_byte_count = sum(image.sizeInBytes() for image in images)
+        decode_frame_index = self._start_frame_index + cached_frame_count
 
         # Start video process (only video)
         with QMutexLocker(self._process_mutex):  # 🔒
@@ -277,51 +1081,38 @@ class VideoPlayer(QThread):
                 self.safe_disconnect()
                 return
 
-        # Run FFmpeg without showing a console window
-        if self._detect_edges:
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-loglevel", "quiet",  # Suppress all FFmpeg logging
-                "-ss", str(START_POS),  # Fast seek FIRST
-                "-i", self._video_info.video_path,  # Input file AFTER
-                "-vframes", str(self._end_frame_index - self._start_frame_index),  # Number of frames to process
-                # "-vf", f"format=gray, sobel=scale={self._edge_factor}, negate",  # Convert to grayscale, apply Sobel filter, and invert colors
-                "-vf", f"scale=iw*sar:ih,setsar=1,format=gray, sobel=scale={self._edge_factor}, negate",  # Correct pixel aspect ratio (PAR), grayscale, Sobel, invert colors
-                "-f", "rawvideo",  # Output format
-                "-pix_fmt", "rgb24",  # Pixel format
-                "-nostdin",  # Disable interaction on standard input
-                "-"  # Output to pipe
-            ]
-        else:
-            ffmpeg_cmd = [
-                "ffmpeg",
-                "-loglevel", "quiet",  # Suppress all FFmpeg logging
-                "-ss", str(START_POS),  # Fast seek FIRST
-                "-i", self._video_info.video_path,  # Input file AFTER
-                "-vframes", str(self._end_frame_index - self._start_frame_index),  # Number of frames to process
-                "-vf", "scale=iw*sar:ih,setsar=1",  # Correct pixel aspect ratio (PAR) before output
-                "-f", "rawvideo",  # Output format
-                "-pix_fmt", "rgb24",  # Pixel format
-                "-nostdin",  # Disable interaction on standard input
-                "-"  # Output to pipe
-            ]
-
-        self._process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **FFMPEG_NOWINDOW_KWARGS)
-
-        TARGET_TIME_MS = 1000 / self._video_info.fps  # Desired frame interval in ms
-
-        # Start audio thread
+        # Run FFmpeg without showing a console window (or adopt the process started in advance for the shot)
+        # When decoding from the first frame, the same process also decodes the audio for the audio thread
+        audio_pipe = None
+        if decode_frame_index < self._end_frame_index:
+            process = None
+            with_audio = decode_frame_index == self._start_frame_index and VideoPlayer.can_combine_audio(self._video_info) and VideoPlayer.needs_audio(self._video_info, self._volume)
+            if self._standby_pool is not None and decode_frame_index == self._start_frame_index:
+                process, audio_pipe = self._standby_pool.take(StandbyDecoderPool.make_key(self._video_info, self._start_frame_index, self._end_frame_index, self._decode_size, self._speed, self._detect_edges, self._edge_factor, with_audio))
+            if process is None:
+                process, audio_pipe = VideoPlayer.start_ffmpeg(self._video_info, decode_frame_index, self._end_frame_index, self._decode_size, self._detect_edges, self._edge_factor, with_audio, self._speed)
+            self._process = process
+
+        FRAME_TIME_MS = 1000 / self._video_info.fps  # Media time of a frame in ms
+        TARGET_TIME_MS = FRAME_TIME_MS * self._frame_step / self._speed  # Desired interval between displayed frames in ms
+
+        # Start audio thread (unless muted: audio is attached if the volume is turned up)
         with QMutexLocker(self._process_mutex):  # 🔒
             if not self._running:  # In case stop() was called before creating the thread
+                if audio_pipe is not None:
+                    audio_pipe.close()
                 self.safe_disconnect()
                 return
-            self._audio_thread = AudioPlayer(self._video_info, START_POS, self._volume, self._speed)
-            self._audio_thread.start()
+            if audio_pipe is not None or VideoPlayer.needs_audio(self._video_info, self._volume):
+                self._audio_thread = AudioPlayer(self._video_info, START_POS, self._volume, self._speed, audio_pipe, audio_samples, self.get_audio_record_count(cache_key, audio_samples))
+                self._audio_thread.start()
+        self._internal_clock_timer.start()
 
         frame_timer = QElapsedTimer()
 
         frame_index = self._start_frame_index
         time_compensation_ms = 0
+        first_frame = True
         while self._running and frame_index < self._end_frame_index:
             frame_timer.start()
             pause_duration_ms = 0
@@ -330,61 +1121,278 @@ class VideoPlayer(QThread):
                 if self._paused:
                     self._pause_condition.wait(self._pause_mutex)  # Wait until resumed
                     pause_duration_ms = frame_timer.elapsed()
+                    self._internal_clock_pause_ms += pause_duration_ms
 
-            # Ensures process isn't stopped before reading
-            video_bytes = self.read_one_frame(FRAME_BYTES)
-            if not video_bytes:
-                break
+            if self._audio_thread is None and VideoPlayer.needs_audio(self._video_info, self._volume):
+                self.attach_audio(frame_index, (frame_index - self._start_frame_index) * FRAME_TIME_MS)  # Unmuted during playback
 
-            frame = np.frombuffer(video_bytes, np.uint8).reshape(self._frame_size)
-            h, w, ch = frame.shape
-            bytes_per_line = ch * w
-            image = QImage(frame.data, w, h, bytes_per_line, QImage.Format_RGB888)
+            slot = None
+            if frame_index - self._start_frame_index < len(images):
+                image = images[frame_index - self._start_frame_index]
+            else:
+                # Ensures process isn't stopped before reading
+                slot = self._frame_ring.acquire()
+                if not self.read_one_frame(self._frame_ring.get_buffer(slot)):
+                    self._frame_ring.release(slot)
+                    break
+                self._frame_ring.convert(slot)
+
+                decoded_image = self._frame_ring.get_image(slot)
+                image = self.scale_image(decoded_image)
+                if image is not decoded_image or cache_key:
+                    if image is decoded_image:
+                        image = image.copy()  # Cached frames must own their memory
+                    self._frame_ring.release(slot)  # The slot is no longer referenced
+                    slot = None
+                if cache_key:
+                    images.append(image)
+                    image_byte_count += image.sizeInBytes()
+                    if image_byte_count > self._preview_cache.get_max_bytes():
+                        images, cache_key = [], None  # Too long to be cached: don't keep its frames in memory
 
             if not self._frame_queue.full():
-                self._frame_queue.put((frame_index, image))  # Thread-safe
+                self._frame_queue.put((frame_index, image, slot))  # Thread-safe
                 self.frame_loaded.emit()  # Notify UI to update
             else:
+                self._frame_ring.release(slot)
                 print(f"Image queue full: Dropping frame {frame_index}.")
 
-            frame_index += 1
+            if first_frame and self._preview_cache:
+                self._preview_cache.add_first_frame_timing(cached_frame_count > 0, (time.perf_counter() - self._creation_time) * 1000)
+                first_frame = False
+
+            frame_index += self._frame_step
 
             # Compare video time with audio time
             if self._running:
                 remaining_time_ms = TARGET_TIME_MS - (frame_timer.elapsed() - pause_duration_ms) + time_compensation_ms
                 remaining_time_ms = int(max(0, min(TARGET_TIME_MS * 2, remaining_time_ms)))  # clamp to [0, 2 * TARGET_TIME_MS] -> max 2 frames
 
-                # Sleep until end of frame
+                # Sleep until end of frame (stop() wakes the thread up, so that it doesn't keep the GUI waiting)
                 if remaining_time_ms > 0:
-                    self.msleep(remaining_time_ms)
+                    with QMutexLocker(self._pause_mutex):  # 🔒
+                        if self._running:
+                            self._pause_condition.wait(self._pause_mutex, remaining_time_ms)
 
                 # Absolute time difference at the end of the frame, to compensate next frame
-                video_time_ms = (frame_index - self._start_frame_index) * TARGET_TIME_MS  # Expected video time in ms
-                master_clock_elapsed_time_ms = self._audio_thread.get_elapsed_time_ms() if self._audio_thread else video_time_ms
-                time_compensation_ms = video_time_ms - master_clock_elapsed_time_ms
+                video_time_ms = (frame_index - self._start_frame_index) * FRAME_TIME_MS  # Expected media time in ms
+                master_clock_elapsed_time_ms = self.get_master_clock_ms()  # Scaled by the speed
+                time_compensation_ms = (video_time_ms - master_clock_elapsed_time_ms) / self._speed  # In real time
+
+            # Loop entirely cached previews
+            if PREVIEW_LOOP and cache_key and self._running and frame_index == self._end_frame_index and len(images) == self._end_frame_index - self._start_frame_index:
+                frame_index = self._start_frame_index
+                time_compensation_ms = 0
+                if audio_samples is None and self._audio_thread:
+                    audio_samples = self._audio_thread.get_recorded_samples()  # Read during the first loop
+                self.restart_audio(START_POS, 0, audio_samples, self.get_audio_record_count(cache_key, audio_samples))
+                self._internal_clock_timer.start()
+                self._internal_clock_pause_ms = 0
+
+        if audio_samples is None and self._audio_thread:
+            audio_samples = self._audio_thread.get_recorded_samples()
+        if cache_key and (len(images) > cached_frame_count or audio_samples is not cached_audio) and cache_key == self.get_preview_cache_key():
+            self._preview_cache.put(cache_key, images, len(images) == self._end_frame_index - self._start_frame_index, (self._speed, audio_samples) if audio_samples is not None else None)
 
         self.cleanup()
 
 
-    def read_one_frame(self, frame_bytes):
+    @staticmethod
+    def make_ffmpeg_cmd(video_info, first_frame_index, end_frame_index, decode_size, detect_edges, edge_factor, audio_fd=None, speed=1.0):
+        """FFmpeg command decoding [first_frame_index, end_frame_index[ as raw frames of decode_size (full size if None) in get_pixel_format()
+        (and the audio from the same position to file descriptor audio_fd, if any).
+        Above 2x speed, only one frame in get_frame_step() is output (the others are decoded but neither scaled nor piped)."""
+        START_POS = max(0, (first_frame_index + video_info.seek_offset) / video_info.fps)  # frame position in seconds
+        pixel_format = VideoPlayer.get_pixel_format(detect_edges)
+        frame_step = VideoPlayer.get_frame_step(speed)
+        frame_count = (end_frame_index - first_frame_index + frame_step - 1) // frame_step
+        if decode_size is None:
+            scale_filter = "scale=iw*sar:ih,setsar=1"  # Correct pixel aspect ratio (PAR)
+        else:
+            scale_filter = f"scale={decode_size[0]}:{decode_size[1]}:flags={PLAYER_SCALER},setsar=1"  # Scale to the display size (PAR corrected)
+        step_options = []
+        if frame_step > 1:
+            scale_filter = f"select=not(mod(n\\,{frame_step})),{scale_filter}"  # Skip frames before scaling them
+            step_options = ["-vsync", "0"]  # Don't duplicate frames to fill the gaps
+        audio_output = [] if audio_fd is None else [
+            "-af", make_atempo_filter(speed),  # Playback speed (pitch unchanged)
+            "-f", "s16le",  # Output format (16-bit signed little-endian PCM), same as AudioPlayer
+            "-acodec", "pcm_s16le",  # Audio codec
+            "-ac", "2",  # Number of audio channels (stereo)
+            "-ar", str(AUDIO_SAMPLE_RATE),  # Audio sample rate (44.1 kHz)
+            f"pipe:{audio_fd}"  # Second output pipe
+        ]
+        if detect_edges:
+            return [
+                "ffmpeg",
+                "-loglevel", "quiet",  # Suppress all FFmpeg logging
+                "-ss", str(START_POS),  # Fast seek FIRST
+                "-i", video_info.video_path,  # Input file AFTER
+                "-vframes", str(frame_count),  # Number of frames to output
+                # "-vf", f"format=gray, sobel=scale={edge_factor}, negate",  # Convert to grayscale, apply Sobel filter, and invert colors
+                "-vf", f"{scale_filter},format=gray, sobel=scale={edge_factor}, negate",  # Scale (PAR corrected), grayscale, Sobel, invert colors
+                *step_options,
+                "-f", "rawvideo",  # Output format
+                "-pix_fmt", pixel_format,  # Pixel format (gray: a third of rgb24)
+                "-nostdin",  # Disable interaction on standard input
+                "-"  # Output to pipe
+            ] + audio_output
+        return [
+            "ffmpeg",
+            "-loglevel", "quiet",  # Suppress all FFmpeg logging
+            "-ss", str(START_POS),  # Fast seek FIRST
+            "-i", video_info.video_path,  # Input file AFTER
+            "-vframes", str(frame_count),  # Number of frames to output
+            "-vf", scale_filter,  # Scale (PAR corrected) before output
+            *step_options,
+            "-f", "rawvideo",  # Output format
+            "-pix_fmt", pixel_format,  # Pixel format
+            "-nostdin",  # Disable interaction on standard input
+            "-"  # Output to pipe
+        ] + audio_output
+
+
+    @staticmethod
+    def start_ffmpeg(video_info, first_frame_index, end_frame_index, decode_size, detect_edges, edge_factor, with_audio, speed=1.0):
+        """Starts FFmpeg for make_ffmpeg_cmd() and returns (process, PCM audio pipe or None).
+        With audio, both streams share one seek and one demuxer, so they start at exactly the same position."""
+        if not with_audio:
+            ffmpeg_cmd = VideoPlayer.make_ffmpeg_cmd(video_info, first_frame_index, end_frame_index, decode_size, detect_edges, edge_factor, speed=speed)
+            return subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, **FFMPEG_NOWINDOW_KWARGS), None
+
+        audio_read_fd, audio_write_fd = os.pipe()
+        ffmpeg_cmd = VideoPlayer.make_ffmpeg_cmd(video_info, first_frame_index, end_frame_index, decode_size, detect_edges, edge_factor, audio_write_fd, speed)
+        process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, pass_fds=(audio_write_fd,), **FFMPEG_NOWINDOW_KWARGS)
+        os.close(audio_write_fd)  # Only FFmpeg writes to the pipe
+        return process, os.fdopen(audio_read_fd, "rb")
+
+
+    @staticmethod
+    def can_combine_audio(video_info):
+        return COMBINED_AUDIO_VIDEO and video_info.has_audio
+
+
+    @staticmethod
+    def clamp_speed(speed):
+        return max(PLAYER_SPEED_MIN, min(PLAYER_SPEED_MAX, speed))
+
+
+    @staticmethod
+    def get_frame_step(speed):
+        """Frames advanced per displayed frame: below 2x all the frames are shown faster, beyond that 1 frame in N is shown (N = speed rounded down)."""
+        return max(1, int(speed))
+
+
+    @staticmethod
+    def get_pixel_format(detect_edges):
+        """Raw format of the frames FFmpeg outputs (edges are gray, no need for 3 identical channels)."""
+        if detect_edges:
+            return "gray"
+        return "yuv420p" if PLAYER_YUV420P_PIPE else "rgb24"
+
+
+    @staticmethod
+    def get_decode_size(video_info, target_size):
+        """Size FFmpeg decodes the frames at to fit in target_size (None = full size: no target size, or it would upscale)."""
+        if target_size is None or target_size[0] <= 0 or target_size[1] <= 0:
+            return None
+        width, height = video_info.fit_size(*target_size)
+        if width >= video_info.display_width or height >= video_info.frame_height:
+            return None
+        return width, height
+
+
+    def get_preview_cache_key(self):
+        """Key of the frames of this preview in the cache (None if they aren't cached: no cache, no target size or skipped frames)."""
+        if self._preview_cache is None or self._frame_step > 1:
+            return None
+        with QMutexLocker(self._target_size_mutex):  # 🔒
+            target_size = self._target_size
+        if target_size is None:
+            return None
+        return PreviewClipCache.make_key(self._video_info, self._start_frame_index, self._end_frame_index, target_size, self._detect_edges, self._edge_factor)
+
+
+    def get_audio_record_count(self, cache_key, audio_samples):
+        """Number of samples (16-bit stereo) of the whole shot, to be recorded by an audio thread starting at the first frame of a cached preview (0 = no recording)."""
+        if not cache_key or audio_samples is not None:
+            return 0
+        sample_count = 2 * round((self._end_frame_index - self._start_frame_index) / self._video_info.fps / self._speed * AUDIO_SAMPLE_RATE)
+        return sample_count if 2 * sample_count <= self._preview_cache.get_max_bytes() else 0  # Too long to be cached
+
+
+    def restart_audio(self, start_pos, audio_clock_offset_ms=0, pcm_samples=None, record_sample_count=0):
+        """(Re)starts the audio thread from start_pos, with its own FFmpeg process or from pcm_samples (stops it if muted)."""
+        with QMutexLocker(self._process_mutex):  # 🔒
+            if not self._running:
+                return
+            if self._audio_thread:
+                self._audio_thread.stop()
+                self._audio_thread = None
+            if VideoPlayer.needs_audio(self._video_info, self._volume):
+                self._audio_thread = AudioPlayer(self._video_info, start_pos, self._volume, self._speed, pcm_samples=pcm_samples, record_sample_count=record_sample_count)
+                self._audio_clock_offset_ms = audio_clock_offset_ms
+                self._audio_thread.start()
+
+
+    def attach_audio(self, frame_index, media_time_ms):
+        """Starts the audio at a frame during playback (media_time_ms: its media time since the start frame, where the audio clock starts)."""
+        self.restart_audio(max(0, (frame_index + self._video_info.seek_offset) / self._video_info.fps), media_time_ms)
+
+
+    def get_master_clock_ms(self):
+        """Media time in ms since the start frame: from the audio if any, else from the internal clock (real time scaled by the speed)."""
+        if self._audio_thread:
+            return self._audio_clock_offset_ms + self._audio_thread.get_elapsed_time_ms()
+        return (self._internal_clock_timer.elapsed() - self._internal_clock_pause_ms) * self._speed
+
+
+    @staticmethod
+    def needs_audio(video_info, volume):
+        """False if the audio wouldn't be heard: no audio stream, muted, or no audio output (no audio thread nor FFmpeg audio decoding)."""
+        return video_info.has_audio and volume > 0 and AudioMixer.get_shared() is not None
+
+
+    def set_target_size(self, width, height):
+        """Scale the frames to fit in width x height before queuing them (so the GUI thread only converts them to pixmaps).
+        FFmpeg already decodes them at the target size passed to the constructor: a new size is scaled in this thread until the player is restarted."""
+        with QMutexLocker(self._target_size_mutex):  # 🔒
+            self._target_size = (width, height) if width > 0 and height > 0 else None
+
+
+    def scale_image(self, image):
+        with QMutexLocker(self._target_size_mutex):  # 🔒
+            target_size = self._target_size
+        if target_size is None or (image.width(), image.height()) == self._video_info.fit_size(*target_size):
+            return image  # Already decoded at the target size
+        return scale_image_smooth(image, *target_size)
+
+
+    def read_one_frame(self, buffer):
+        """Reads the next frame into a ring buffer (no allocation). Returns False if there's no complete frame."""
         with QMutexLocker(self._process_mutex):  # 🔒
             if not self._running or self._process.poll() is not None:
                 print("Skipping next frame: FFmpeg still busy decoding")
-                return None
+                return False
             
             try:
-                video_bytes = self._process.stdout.read(frame_bytes)
-                if not video_bytes:
-                    raise RuntimeError("Error: No video data received from FFmpeg.")
+                if not read_exactly_into(self._process.stdout, buffer):
+                    print("Error: No complete frame received from FFmpeg.")
+                    return False
             except (OSError, ValueError) as e:
                 print(f"Error reading video data: {e}")
-                return None
+                return False
+
+        return True
 
-        if len(video_bytes) != frame_bytes:
-            print(f"Error: Frame size mismatch. Expected {frame_bytes} bytes, got {len(video_bytes)} bytes.")
-            return None
 
-        return video_bytes
+    def take_frame(self):
+        """Returns the next (frame_index, image) of the frame queue (raises queue.Empty if there's none).
+        The image may share the memory of a ring slot: it's only valid until the next call, so display (copy) it right away."""
+        frame_index, image, slot = self._frame_queue.get_nowait()  # Thread-safe
+        self._frame_ring.release(self._taken_slot)  # The previous frame has been displayed
+        self._taken_slot = slot
+        return frame_index, image
 
 
     def safe_disconnect(self):
@@ -394,9 +1402,17 @@ class VideoPlayer(QThread):
             pass
 
 
+    def kill_process(self):
+        """Ends FFmpeg first: an audio thread reading its audio pipe would otherwise wait forever for FFmpeg, itself blocked on the unread video pipe."""
+        if hasattr(self, '_process'):
+            self._process.kill()  # FFmpeg ignores SIGTERM while blocked writing to a pipe
+
+
     def cleanup(self):
+        """Tears the player down at the end of its thread (the process is killed first, so waiting for it is short)."""
         self._running = False
         self.safe_disconnect()
+        self.kill_process()
         with QMutexLocker(self._process_mutex):  # 🔒
             if self._audio_thread:
                 self._audio_thread.stop()
@@ -434,19 +1450,35 @@ class VideoPlayer(QThread):
 
 
     def stop(self):
-        """Stops video playback."""
-        with QMutexLocker(self._process_mutex):
-            self._running = False
+        """Stops video playback without waiting: FFmpeg is killed and the thread tears its process down and finishes on its own (kept alive by retire())."""
+        self._running = False  # Not under the process mutex: the thread may hold it while blocked on the pipe
 
         with QMutexLocker(self._pause_mutex):
             self._paused = False
             self._pause_condition.wakeAll()
 
-        if self._audio_thread:
-            self._audio_thread.stop()
+        self.safe_disconnect()  # No frame is sent once stopped
+        self.kill_process()  # The pending read returns
+        audio_thread = self._audio_thread
+        if audio_thread:
+            audio_thread.stop()
+        VideoPlayer.retire(self)
 
-        self.cleanup()
-        self.wait()
+
+    @staticmethod
+    def retire(player):
+        """Keeps a stopped player alive until its thread has finished (the caller drops its reference right away)."""
+        VideoPlayer.retired_players = [retired_player for retired_player in VideoPlayer.retired_players if not retired_player.isFinished()]
+        if player not in VideoPlayer.retired_players:
+            VideoPlayer.retired_players.append(player)
+
+
+    @staticmethod
+    def wait_for_retired_players():
+        """Waits for the threads of the stopped players (when the application quits)."""
+        for player in VideoPlayer.retired_players:
+            player.wait()
+        VideoPlayer.retired_players = []
 
 
 if __name__ == "__main__":
@@ -0,0 +1,81 @@
+from multiprocessing import shared_memory
+import numpy as np
+import av
+
+# Only PyAV and NumPy are imported: this module is what each spawned decoder process imports (not PyQt5 or PyAudio)
+
+
+DECODER_POOL_SEQUENTIAL_WINDOW = 2.0  # Decode forward instead of seeking when the requested frame is less than this many seconds ahead
+
+
+##
+## DECODER WORKER (child process)
+##
+
+
+def decoder_worker_main(video_path, connection, shm_name):
+    """Entry point of a decoder process: opens the video once, then answers (request id, frame index, seek offset, fps, width, height, forward) requests.
+    Frames are written as rgb24 into the shared memory block; the reply only says whether it succeeded.
+    'forward' means the frame is in the same GOP as the previous request (decode forward whatever the distance)."""
+    shm = shared_memory.SharedMemory(name=shm_name)  # Unlinked by the parent (spawned children share its resource tracker)
+    try:
+        container = av.open(video_path)
+        stream = container.streams.video[0]
+        stream.thread_type = "AUTO"
+    except Exception as e:
+        connection.send(("ready", False))
+        print(f"Error: Decoder worker cannot open {video_path}: {e}")
+        shm.close()
+        return
+    connection.send(("ready", True))
+
+    start_time = float(container.start_time / av.time_base) if container.start_time is not None else 0.0
+    frames = None  # Decoding iterator (kept between requests to decode forward without seeking)
+    last_time = None  # Time of the last decoded frame
+
+    while True:
+        try:
+            request = connection.recv()
+        except EOFError:
+            break
+        if request is None:
+            break  # Shutdown
+
+        request_id, frame_index, seek_offset, fps, width, height, forward = request
+        target_time = start_time + max(0, (frame_index + seek_offset) / fps)  # Same position as FFmpeg's -ss
+        try:
+            # Seek unless the frame is ahead of the last decoded one (in the same GOP, or a little ahead)
+            is_ahead = frames is not None and last_time is not None and last_time < target_time
+            if not is_ahead or not (forward or target_time <= last_time + DECODER_POOL_SEQUENTIAL_WINDOW):
+                container.seek(int(target_time / stream.time_base), stream=stream, backward=True)
+                frames = container.decode(stream)
+
+            found = None
+            for frame in frames:
+                if frame.time is None:
+                    continue
+                last_time = frame.time
+                if frame.time >= target_time - 1e-6:
+                    found = frame
+                    break
+
+            if found is None:
+                frames = None
+                connection.send((request_id, False))
+                continue
+
+            pixels = found.reformat(width=width, height=height, format="rgb24", interpolation="LANCZOS").to_ndarray()
+            line_bytes = 3 * width
+            np.ndarray((height, line_bytes), dtype=np.uint8, buffer=shm.buf)[:, :] = pixels.reshape((height, -1))[:, :line_bytes]
+            connection.send((request_id, True))
+        except Exception as e:
+            print(f"Error: Decoder worker cannot decode frame {frame_index}: {e}")
+            frames = None
+            connection.send((request_id, False))
+
+    container.close()
+    shm.close()
+
+
+if __name__ == "__main__":
+    print(f"\033[91mTHIS MODULE FILE IS NOT MEANT TO BE RUN!\033[0m")